@@ -29,3 +29,11 @@ def sanitize_ohlc(open_, high, low, close):
     if high < close:
         high = close
     return open_, high, low, close
+
+
+# Same as sanitize_ohlc but for whole columns of values.
+def sanitize_ohlc_columns(open_, high, low, close):
+    sanitized = [sanitize_ohlc(o, h, l, c) for o, h, l, c in zip(open_, high, low, close)]
+    if len(sanitized) == 0:
+        return open_, high, low, close
+    return tuple(list(column) for column in zip(*sanitized))
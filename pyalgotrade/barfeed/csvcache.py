@@ -0,0 +1,273 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy
+import pytz
+import six
+
+from pyalgotrade.utils import dt
+from pyalgotrade.utils import csvutils
+
+
+# Bump this every time the layout of the cache files changes.
+FORMAT_VERSION = 2
+
+MAGIC = b"PYALGOTRADE-CSV\x00"
+
+# Where parsed CSV files get cached unless a different directory is set in the feed.
+# The cache is disabled by default. Set the PYALGOTRADE_CACHE_DIR environment variable to enable it.
+DEFAULT_CACHE_DIR = os.environ.get("PYALGOTRADE_CACHE_DIR") or None
+
+# Extra columns are stored as floats, strings, or strings that have to go through float_or_string when loaded.
+EXTRA_FLOAT = "f"
+EXTRA_STRING = "s"
+EXTRA_MIXED = "m"
+
+
+def timezone_key(timezone):
+    """Returns a string that identifies a timezone, or None if the timezone can't be rebuilt from its name."""
+    if timezone is None:
+        return ""
+    return getattr(timezone, "zone", None)
+
+
+def bar_class_key(barClass):
+    return "%s.%s" % (barClass.__module__, barClass.__name__)
+
+
+def _get_zone(dateTimes):
+    # Returns "" if all datetimes are naive, the timezone name if all of them share the same pytz timezone, or None.
+    zones = set(timezone_key(dateTime.tzinfo) for dateTime in dateTimes)
+    if len(zones) == 1:
+        return zones.pop()
+    return None
+
+
+def _get_extra_kind(values):
+    if all(isinstance(value, float) for value in values):
+        return EXTRA_FLOAT
+    if all(isinstance(value, six.string_types) for value in values):
+        return EXTRA_STRING
+    if all(isinstance(value, (float, six.string_types)) for value in values):
+        return EXTRA_MIXED
+    return None
+
+
+def to_array(bars):
+    """Returns a header and a numpy structured array with the values of the bars, or None if the bars can't be
+    converted. The header is JSON serializable."""
+    dateTimes = [bar_.getDateTime() for bar_ in bars]
+    zone = _get_zone(dateTimes) if len(dateTimes) else ""
+    if zone is None:
+        return None
+
+    extraNames = []
+    if len(bars):
+        extraNames = sorted(bars[0].getExtraColumns().keys())
+    if any(sorted(bar_.getExtraColumns().keys()) != extraNames for bar_ in bars):
+        return None
+
+    columns = [
+        ("dateTime", numpy.int64, [dt.datetime_to_microseconds(dateTime) for dateTime in dateTimes]),
+        ("open", numpy.float64, [bar_.getOpen() for bar_ in bars]),
+        ("high", numpy.float64, [bar_.getHigh() for bar_ in bars]),
+        ("low", numpy.float64, [bar_.getLow() for bar_ in bars]),
+        ("close", numpy.float64, [bar_.getClose() for bar_ in bars]),
+        ("volume", numpy.float64, [bar_.getVolume() for bar_ in bars]),
+        ("adjClose", numpy.float64, [numpy.nan if bar_.getAdjClose() is None else bar_.getAdjClose() for bar_ in bars]),
+        ("hasAdjClose", numpy.bool_, [bar_.getAdjClose() is not None for bar_ in bars]),
+    ]
+    extras = []
+    for i, name in enumerate(extraNames):
+        values = [bar_.getExtraColumns()[name] for bar_ in bars]
+        kind = _get_extra_kind(values)
+        if kind is None:
+            return None
+        if kind == EXTRA_MIXED:
+            values = [repr(value) if isinstance(value, float) else value for value in values]
+        if kind == EXTRA_FLOAT:
+            dtype = numpy.float64
+        else:
+            dtype = "U%d" % max([1] + [len(value) for value in values])
+        columns.append(("extra%d" % i, dtype, values))
+        extras.append([name, kind])
+
+    ret = numpy.zeros(len(bars), dtype=[(name, dtype) for name, dtype, _ in columns])
+    for name, _, values in columns:
+        ret[name] = values
+    header = {
+        "timezone": zone,
+        "extras": extras,
+        "count": len(bars),
+        "descr": numpy.lib.format.dtype_to_descr(ret.dtype),
+    }
+    return header, ret
+
+
+def _to_datetimes(microseconds, zone):
+    ret = microseconds.astype("datetime64[us]").astype(object).tolist()
+    if zone == "UTC":
+        ret = [dateTime.replace(tzinfo=pytz.utc) for dateTime in ret]
+    elif zone != "":
+        localizer = dt.Localizer(pytz.timezone(zone))
+        ret = [localizer.localize(dateTime.replace(tzinfo=pytz.utc)) for dateTime in ret]
+    return ret
+
+
+def from_array(header, values, rowParser):
+    """Returns the bars built by rowParser from a header and an array returned by :func:`to_array`."""
+    dateTimes = _to_datetimes(values["dateTime"], header["timezone"])
+    adjClose = [
+        adjClose if hasAdjClose else None
+        for adjClose, hasAdjClose in zip(values["adjClose"].tolist(), values["hasAdjClose"].tolist())
+    ]
+    extras = None
+    if len(header["extras"]):
+        extraNames = []
+        extraValues = []
+        for i, (name, kind) in enumerate(header["extras"]):
+            column = values["extra%d" % i].tolist()
+            if kind == EXTRA_MIXED:
+                column = list(map(csvutils.float_or_string, column))
+            extraNames.append(name)
+            extraValues.append(column)
+        extras = [dict(zip(extraNames, row)) for row in zip(*extraValues)]
+
+    return rowParser.buildBars(
+        dateTimes, values["open"].tolist(), values["high"].tolist(), values["low"].tolist(),
+        values["close"].tolist(), values["volume"].tolist(), adjClose, extras
+    )
+
+
+class Cache(object):
+    """Caches the bars parsed from CSV files in a directory.
+
+    Each file holds the values for all the bars in a CSV file in binary form, and is memory-mapped when loaded.
+    Files are keyed by the CSV path and by the row parser settings, and hold the modification time and size of
+    the CSV file. Changing any of these causes the CSV file to be parsed again, and the cache file to be replaced.
+
+    :param cacheDir: The directory where cache files are stored. It gets created if it doesn't exist.
+    :type cacheDir: string.
+    """
+
+    def __init__(self, cacheDir):
+        self.__cacheDir = cacheDir
+
+    def getCacheDir(self):
+        return self.__cacheDir
+
+    def __getCachePath(self, path, key):
+        fileKey = repr((FORMAT_VERSION, os.path.abspath(path), key))
+        return os.path.join(self.__cacheDir, hashlib.sha1(fileKey.encode("utf-8")).hexdigest() + ".bin")
+
+    def __getSourceKey(self, path):
+        stat = os.stat(path)
+        return [stat.st_mtime, stat.st_size]
+
+    # Returns the path to the cache file, the header and the header length, or None if there is nothing cached.
+    def __readHeader(self, path, key):
+        try:
+            cachePath = self.__getCachePath(path, key)
+            with open(cachePath, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                headerLen = struct.unpack("<I", f.read(4))[0]
+                header = json.loads(f.read(headerLen).decode("utf-8"))
+            if header.get("version") != FORMAT_VERSION or header.get("key") != key:
+                return None
+            if header.get("source") != self.__getSourceKey(path):
+                return None
+            # Check that the file was not truncated.
+            dtype = numpy.dtype([tuple(field) for field in header["descr"]])
+            if os.path.getsize(cachePath) < len(MAGIC) + 4 + headerLen + dtype.itemsize * header["count"]:
+                return None
+        except Exception:
+            return None
+        return cachePath, header, headerLen
+
+    def contains(self, path, key):
+        """Returns True if there are cached values for a CSV file."""
+        return self.__readHeader(path, key) is not None
+
+    def load(self, path, key, rowParser):
+        """Returns the bars built by rowParser from the cached values, or None if there is nothing cached."""
+        cached = self.__readHeader(path, key)
+        if cached is None:
+            return None
+        cachePath, header, headerLen = cached
+
+        # Any error reading a cache file is treated as if there was nothing cached.
+        try:
+            dtype = numpy.dtype([tuple(field) for field in header["descr"]])
+            if header["count"]:
+                values = numpy.memmap(
+                    cachePath, dtype=dtype, mode="r", offset=len(MAGIC) + 4 + headerLen, shape=(header["count"],)
+                )
+            else:
+                values = numpy.zeros(0, dtype=dtype)
+            return from_array(header, values, rowParser)
+        except Exception:
+            return None
+
+    def save(self, path, key, bars):
+        """Stores the values of the bars parsed from a CSV file. Returns True on success."""
+        converted = to_array(bars)
+        if converted is None:
+            return False
+        header, values = converted
+        header["version"] = FORMAT_VERSION
+        header["key"] = key
+        try:
+            header["source"] = self.__getSourceKey(path)
+        except (IOError, OSError):
+            return False
+        header = json.dumps(header).encode("utf-8")
+        # Pad the header so that values are aligned.
+        header += b" " * (-(len(MAGIC) + 4 + len(header)) % 16)
+
+        try:
+            if not os.path.isdir(self.__cacheDir):
+                os.makedirs(self.__cacheDir)
+            cachePath = self.__getCachePath(path, key)
+            # Write to a temporary file first so that other processes never see partially written files.
+            fd, tmpPath = tempfile.mkstemp(dir=self.__cacheDir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(MAGIC)
+                    f.write(struct.pack("<I", len(header)))
+                    f.write(header)
+                    f.write(values.tobytes())
+                if os.path.exists(cachePath):
+                    os.remove(cachePath)
+                os.rename(tmpPath, cachePath)
+            except Exception:
+                if os.path.exists(tmpPath):
+                    os.remove(tmpPath)
+                raise
+        except (IOError, OSError):
+            # Caching is best effort. The bars were already parsed.
+            return False
+        return True
@@ -18,7 +18,9 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import csv
 import datetime
+import multiprocessing
 
 import pytz
 import six
@@ -26,6 +28,8 @@ import six
 from pyalgotrade.utils import dt
 from pyalgotrade.utils import csvutils
 from pyalgotrade.barfeed import membf
+from pyalgotrade.barfeed import csvcache
+from pyalgotrade.barfeed import streamfeed
 from pyalgotrade import bar
 
 
@@ -34,12 +38,27 @@ class RowParser(object):
     def parseBar(self, csvRowDict):
         raise NotImplementedError()
 
+    # Parses all the bars at once. columns is a dict that maps field names to the values in that column.
+    # Returning None means that bars should be parsed one row at a time using parseBar.
+    def parseBars(self, columns):
+        return None
+
     def getFieldNames(self):
         raise NotImplementedError()
 
     def getDelimiter(self):
         raise NotImplementedError()
 
+    # Returns a string that identifies the parser settings, used to cache the parsed bars.
+    # Returning None means that parsed bars should not be cached.
+    def getCacheKey(self):
+        return None
+
+    # Builds bars from the values loaded from the cache. adjClose values may be None, and extras is either None or a
+    # list with the dict of extra columns for each bar.
+    def buildBars(self, dateTimes, open_, high, low, close, volume, adjClose, extras):
+        raise NotImplementedError()
+
 
 # Interface for bar filters.
 class BarFilter(object):
@@ -89,6 +108,100 @@ class USEquitiesRTH(DateRangeFilter):
         return ret
 
 
+def parse_rows(rowParser, fieldNames, rows, skipMalformedBars=False):
+    # Try to parse all the bars at once.
+    ret = None
+    if all(len(row) == len(fieldNames) for row in rows):
+        try:
+            ret = rowParser.parseBars(dict(zip(fieldNames, zip(*rows))))
+        except Exception:
+            ret = None
+
+    # Parse row by row so that errors and malformed bars get handled as usual.
+    if ret is None:
+        ret = []
+        for row in rows:
+            assert len(fieldNames) == len(row), "Expected columns: %s. Actual columns: %s" % (fieldNames, row)
+            rowDict = dict(zip(fieldNames, row))
+            if skipMalformedBars:
+                try:
+                    bar_ = rowParser.parseBar(rowDict)
+                except Exception:
+                    bar_ = None
+            else:
+                bar_ = rowParser.parseBar(rowDict)
+            if bar_ is not None:
+                ret.append(bar_)
+    return ret
+
+
+def iter_bar_chunks(path, rowParser, chunkSize, skipMalformedBars=False):
+    """Parses a CSV file lazily and yields lists with the bars for up to chunkSize rows.
+    If chunkSize is None all the bars are parsed at once."""
+    with open(path, "r") as f:
+        reader = csv.reader(f, delimiter=rowParser.getDelimiter())
+        fieldNames = rowParser.getFieldNames()
+        if fieldNames is None:
+            fieldNames = six.next(reader, None)
+            if fieldNames is None:
+                return
+
+        rows = []
+        for row in reader:
+            # Skip empty rows.
+            if row == []:
+                continue
+            rows.append(row)
+            if len(rows) == chunkSize:
+                yield parse_rows(rowParser, fieldNames, rows, skipMalformedBars)
+                rows = []
+        if len(rows):
+            yield parse_rows(rowParser, fieldNames, rows, skipMalformedBars)
+
+
+def parse_csv_file(path, rowParser, skipMalformedBars=False):
+    """Parses all the bars in a CSV file."""
+    ret = []
+    for bars in iter_bar_chunks(path, rowParser, None, skipMalformedBars):
+        ret.extend(bars)
+    return ret
+
+
+def _parse_csv_file_to_array(args):
+    # Runs in a worker process. Returns the values of the bars as an array, which is much cheaper to send back to the
+    # parent process than the pickled bars, or None if they can't be converted or parsing fails. In that case the file
+    # is parsed again in the parent process, so errors get raised there, in the same order as if loaded serially.
+    path, rowParser, skipMalformedBars = args
+    try:
+        return csvcache.to_array(parse_csv_file(path, rowParser, skipMalformedBars))
+    except Exception:
+        return None
+
+
+def iter_ascending_chunks(chunks):
+    """Yields the lists of bars from chunks in ascending order. If bars come in descending order, like in files from
+    Yahoo! Finance, all of them are read and yielded in a single list."""
+    try:
+        head = []
+        for bars in chunks:
+            head.extend(bars)
+            if len(head) >= 2:
+                break
+
+        if len(head) >= 2 and head[1].getDateTime() < head[0].getDateTime():
+            for bars in chunks:
+                head.extend(bars)
+            head.reverse()
+            yield head
+        else:
+            if len(head):
+                yield head
+            for bars in chunks:
+                yield bars
+    finally:
+        chunks.close()
+
+
 class BarFeed(membf.BarFeed):
     """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed`.
 
@@ -101,6 +214,11 @@ class BarFeed(membf.BarFeed):
 
         self.__barFilter = None
         self.__dailyTime = datetime.time(0, 0, 0)
+        self.__cache = None
+        if csvcache.DEFAULT_CACHE_DIR:
+            self.__cache = csvcache.Cache(csvcache.DEFAULT_CACHE_DIR)
+        # Values parsed by loadCSVFiles, keyed by instrument, path and skipMalformedBars.
+        self.__parsedFiles = {}
 
     def getDailyBarTime(self):
         return self.__dailyTime
@@ -114,37 +232,192 @@ class BarFeed(membf.BarFeed):
     def setBarFilter(self, barFilter):
         self.__barFilter = barFilter
 
+    def getCacheDir(self):
+        ret = None
+        if self.__cache is not None:
+            ret = self.__cache.getCacheDir()
+        return ret
+
+    def setCacheDir(self, cacheDir):
+        """Sets the directory where parsed CSV files get cached, so that loading them again is faster.
+        Defaults to the PYALGOTRADE_CACHE_DIR environment variable. The cache is disabled if it is not set.
+
+        :param cacheDir: The cache directory, or None to disable the cache.
+        :type cacheDir: string.
+        """
+        self.__cache = None
+        if cacheDir:
+            self.__cache = csvcache.Cache(cacheDir)
+
+    # Returns the key for the cached bars, or None if the bars should not be cached.
+    def __getCacheKey(self, rowParser, skipMalformedBars):
+        ret = None
+        if self.__cache is not None:
+            ret = rowParser.getCacheKey()
+            if ret is not None:
+                ret = "%s|skipMalformedBars=%s" % (ret, skipMalformedBars)
+        return ret
+
     def addBarsFromCSV(self, instrument, path, rowParser, skipMalformedBars=False):
-        def parse_bar_skip_malformed(row):
-            ret = None
-            try:
-                ret = rowParser.parseBar(row)
-            except Exception:
-                pass
-            return ret
+        loadedBars = None
+        cacheKey = self.__getCacheKey(rowParser, skipMalformedBars)
+        parsed = self.__parsedFiles.pop((instrument, path, skipMalformedBars), None)
+        if parsed is not None:
+            loadedBars = csvcache.from_array(parsed[0], parsed[1], rowParser)
+            if cacheKey is not None:
+                self.__cache.save(path, cacheKey, loadedBars)
+        elif cacheKey is not None:
+            loadedBars = self.__cache.load(path, cacheKey, rowParser)
+
+        if loadedBars is None:
+            loadedBars = parse_csv_file(path, rowParser, skipMalformedBars)
+            if cacheKey is not None:
+                self.__cache.save(path, cacheKey, loadedBars)
+
+        if self.__barFilter is not None:
+            loadedBars = [bar_ for bar_ in loadedBars if self.__barFilter.includeBar(bar_)]
+
+        self.addBarsFromSequence(instrument, loadedBars)
+
+    def createRowParser(self, timezone=None):
+        """Returns the :class:`RowParser` that :meth:`addBarsFromCSV` uses for a timezone, or the default one if
+        timezone is None. Subclasses must override this to support :meth:`loadCSVFiles`."""
+        raise NotImplementedError()
+
+    def loadCSVFiles(self, files, workers=None):
+        """Loads bars from multiple CSV files, parsing them in parallel using a pool of processes.
+        Files are added using addBarsFromCSV with the default arguments, in order, so the result is the same as if
+        they were loaded one after the other.
+
+        :param files: A dict that maps instruments to a path or a list of paths, or a list of (instrument, path) tuples.
+        :param workers: The number of processes to use. If None, the number of CPUs is used.
+        :type workers: int.
+
+        .. note::
+            * Files that are already cached don't get parsed again.
+            * Bars are loaded using the default timezone and with skipMalformedBars=False. Use addBarsFromCSV to
+              load files with other settings.
+            * Feeds that don't implement :meth:`createRowParser` don't support this.
+        """
 
-        if skipMalformedBars:
-            parse_bar = parse_bar_skip_malformed
+        if isinstance(files, dict):
+            files = [
+                (instrument, path)
+                for instrument, paths in six.iteritems(files)
+                for path in ([paths] if isinstance(paths, six.string_types) else paths)
+            ]
         else:
-            parse_bar = rowParser.parseBar
+            files = list(files)
+
+        # Parse the files that are not cached in worker processes.
+        try:
+            rowParser = self.createRowParser()
+        except NotImplementedError:
+            raise Exception("loadCSVFiles is not supported by %s" % type(self).__name__)
+        cacheKey = self.__getCacheKey(rowParser, False)
+        pending = [
+            (instrument, path) for instrument, path in files
+            if cacheKey is None or not self.__cache.contains(path, cacheKey)
+        ]
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers > 1 and len(pending) > 1:
+            pool = multiprocessing.Pool(min(workers, len(pending)))
+            try:
+                parsed = pool.map(_parse_csv_file_to_array, [(path, rowParser, False) for _, path in pending])
+            finally:
+                pool.close()
+                pool.join()
+            for (instrument, path), values in zip(pending, parsed):
+                if values is not None:
+                    self.__parsedFiles[(instrument, path, False)] = values
+
+        # Add the bars in order, from the parsed values or the cache.
+        try:
+            for instrument, path in files:
+                self.addBarsFromCSV(instrument, path)
+        finally:
+            self.__parsedFiles = {}
+
+
+class StreamingBarFeed(streamfeed.BarFeed):
+    """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed` that parse files lazily, as bars are
+    consumed, instead of loading all of them in memory before the first event.
 
-        # Load the csv file
-        loadedBars = []
-        reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
-        for row in reader:
-            bar_ = parse_bar(row)
-            if bar_ is not None and (self.__barFilter is None or self.__barFilter.includeBar(bar_)):
-                loadedBars.append(bar_)
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param chunkSize: The number of rows to parse at once for each instrument.
+    :type chunkSize: int.
+    :param prefetchDepth: If greater than 0, files are parsed from a worker thread for each instrument that keeps up
+        to this many chunks of bars ready.
+    :type prefetchDepth: int.
 
-        self.addBarsFromSequence(instrument, loadedBars)
+    .. note::
+        * Files for the same instrument must be added in chronological order.
+        * Memory usage is proportional to the number of instruments and the chunk size, not to the number of bars.
+          Files with rows in descending order, like the ones from Yahoo! Finance, are the exception: they get parsed
+          completely before their first bar is used. The order of a file is decided using its first two bars.
+        * An exception is raised if the bars for an instrument are not in order when they are read.
+    """
+
+    def __init__(self, frequency, maxLen=None, chunkSize=1000, prefetchDepth=0):
+        super(StreamingBarFeed, self).__init__(frequency, maxLen, prefetchDepth)
+
+        self.__chunkSize = chunkSize
+        self.__files = {}
+        self.__barFilter = None
+        self.__dailyTime = datetime.time(0, 0, 0)
+
+    def getDailyBarTime(self):
+        return self.__dailyTime
+
+    def setDailyBarTime(self, time):
+        self.__dailyTime = time
+
+    def getBarFilter(self):
+        return self.__barFilter
+
+    def setBarFilter(self, barFilter):
+        self.__barFilter = barFilter
+
+    def __iterBarChunks(self, instrument):
+        for path, rowParser, skipMalformedBars, barFilter in self.__files[instrument]:
+            chunks = iter_bar_chunks(path, rowParser, self.__chunkSize, skipMalformedBars)
+            for bars in iter_ascending_chunks(chunks):
+                if barFilter is not None:
+                    bars = [bar_ for bar_ in bars if barFilter.includeBar(bar_)]
+                yield bars
+
+    def addBarsFromCSV(self, instrument, path, rowParser, skipMalformedBars=False):
+        """Adds a CSV file with bars for a given instrument. The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param rowParser: The parser for the rows in the CSV file, like :class:`GenericRowParser`.
+        :param skipMalformedBars: True to skip errors while parsing bars.
+        :type skipMalformedBars: boolean.
+        """
+
+        if instrument not in self.__files:
+            self.addBarSource(instrument, lambda: self.__iterBarChunks(instrument))
+            self.__files[instrument] = []
+        # Like in BarFeed, the bar filter set when the file is added is the one that applies to its bars.
+        self.__files[instrument].append((path, rowParser, skipMalformedBars, self.__barFilter))
 
 
 class GenericRowParser(RowParser):
     def __init__(self, columnNames, dateTimeFormat, dailyBarTime, frequency, timezone, barClass=bar.BasicBar):
         self.__dateTimeFormat = dateTimeFormat
+        self.__parseDateTime = dt.datetime_parser(dateTimeFormat)
         self.__dailyBarTime = dailyBarTime
         self.__frequency = frequency
         self.__timezone = timezone
+        self.__localizer = dt.Localizer(timezone) if timezone else None
         self.__haveAdjClose = False
         self.__barClass = barClass
         # Column names.
@@ -158,13 +431,26 @@ class GenericRowParser(RowParser):
         self.__columnNames = columnNames
 
     def _parseDate(self, dateString):
-        ret = datetime.datetime.strptime(dateString, self.__dateTimeFormat)
+        ret = self.__parseDateTime(dateString)
 
         if self.__dailyBarTime is not None:
             ret = datetime.datetime.combine(ret, self.__dailyBarTime)
         # Localize the datetime if a timezone was given.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer:
+            ret = self.__localizer.localize(ret)
+        return ret
+
+    def _parseDates(self, dateStrings):
+        try:
+            ret = dt.parse_datetimes(dateStrings, self.__dateTimeFormat)
+        except ValueError:
+            ret = list(map(self.__parseDateTime, dateStrings))
+
+        if self.__dailyBarTime is not None:
+            ret = [datetime.datetime.combine(dateTime, self.__dailyBarTime) for dateTime in ret]
+        # Localize the datetimes if a timezone was given.
+        if self.__localizer:
+            ret = list(map(self.__localizer.localize, ret))
         return ret
 
     def barsHaveAdjClose(self):
@@ -201,6 +487,51 @@ class GenericRowParser(RowParser):
             dateTime, open_, high, low, close, volume, adjClose, self.__frequency, extra=extra
         )
 
+    def parseBars(self, columns):
+        dateTimes = self._parseDates(columns[self.__dateTimeColName])
+        open_ = list(map(float, columns[self.__openColName]))
+        high = list(map(float, columns[self.__highColName]))
+        low = list(map(float, columns[self.__lowColName]))
+        close = list(map(float, columns[self.__closeColName]))
+        volume = list(map(float, columns[self.__volumeColName]))
+        adjClose = [None] * len(dateTimes)
+        if self.__adjCloseColName is not None and self.__adjCloseColName in columns:
+            adjClose = [float(value) if len(value) > 0 else None for value in columns[self.__adjCloseColName]]
+
+        # Process extra columns.
+        extraNames = [k for k in columns if k not in self.__columnNames.values()]
+        if len(extraNames):
+            extraValues = [list(map(csvutils.float_or_string, columns[k])) for k in extraNames]
+            extras = [dict(zip(extraNames, values)) for values in zip(*extraValues)]
+        else:
+            extras = None
+
+        return self.buildBars(dateTimes, open_, high, low, close, volume, adjClose, extras)
+
+    def getCacheKey(self):
+        timezone = csvcache.timezone_key(self.__timezone)
+        if timezone is None:
+            return None
+        return repr((
+            "generic", sorted(self.__columnNames.items()), self.__dateTimeFormat, str(self.__dailyBarTime),
+            self.__frequency, timezone, csvcache.bar_class_key(self.__barClass)
+        ))
+
+    def buildBars(self, dateTimes, open_, high, low, close, volume, adjClose, extras):
+        if extras is None:
+            extras = [{} for _ in dateTimes]
+
+        barClass = self.__barClass
+        frequency = self.__frequency
+        ret = [
+            barClass(dateTime, o, h, l, c, v, a, frequency, extra=extra)
+            for dateTime, o, h, l, c, v, a, extra in zip(dateTimes, open_, high, low, close, volume, adjClose, extras)
+        ]
+
+        if any(value is not None for value in adjClose):
+            self.__haveAdjClose = True
+        return ret
+
 
 class GenericBarFeed(BarFeed):
     """A BarFeed that loads bars from CSV files that have the following format:
@@ -269,6 +600,15 @@ class GenericBarFeed(BarFeed):
     def setBarClass(self, barClass):
         self.__barClass = barClass
 
+    def createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return GenericRowParser(
+            self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(),
+            timezone, self.__barClass
+        )
+
     def addBarsFromCSV(self, instrument, path, timezone=None, skipMalformedBars=False):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -283,14 +623,7 @@ class GenericBarFeed(BarFeed):
         :type skipMalformedBars: boolean.
         """
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = GenericRowParser(
-            self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(),
-            timezone, self.__barClass
-        )
-
+        rowParser = self.createRowParser(timezone)
         super(GenericBarFeed, self).addBarsFromCSV(instrument, path, rowParser, skipMalformedBars=skipMalformedBars)
 
         if rowParser.barsHaveAdjClose():
@@ -22,6 +22,7 @@
 
 from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.barfeed import common
+from pyalgotrade.barfeed import csvcache
 from pyalgotrade.utils import dt
 from pyalgotrade import bar
 
@@ -60,6 +61,7 @@ class RowParser(csvfeed.RowParser):
         self.__dailyBarTime = dailyBarTime
         self.__frequency = frequency
         self.__timezone = timezone
+        self.__localizer = dt.Localizer(timezone) if timezone else None
         self.__sanitize = sanitize
 
     def __parseDate(self, dateString):
@@ -68,8 +70,8 @@ class RowParser(csvfeed.RowParser):
         if self.__dailyBarTime is not None:
             ret = datetime.datetime.combine(ret, self.__dailyBarTime)
         # Localize the datetime if a timezone was given.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def getFieldNames(self):
@@ -94,6 +96,34 @@ class RowParser(csvfeed.RowParser):
         return bar.BasicBar(dateTime, open_, high, low, close, volume,
                             adjClose, self.__frequency)
 
+    def parseBars(self, columns):
+        dateTimes = list(map(self.__parseDate, columns["Date"]))
+        close = list(map(float, columns["Close"]))
+        open_ = list(map(float, columns["Open"]))
+        high = list(map(float, columns["High"]))
+        low = list(map(float, columns["Low"]))
+        volume = list(map(float, columns["Volume"]))
+        if self.__sanitize:
+            open_, high, low, close = common.sanitize_ohlc_columns(open_, high, low, close)
+
+        return self.buildBars(dateTimes, open_, high, low, close, volume, [None] * len(dateTimes), None)
+
+    def getCacheKey(self):
+        timezone = csvcache.timezone_key(self.__timezone)
+        if timezone is None:
+            return None
+        # Two digit years are resolved using the current year, so the key changes every year.
+        return repr((
+            "google", str(self.__dailyBarTime), self.__frequency, timezone, self.__sanitize,
+            datetime.datetime.today().year
+        ))
+
+    def buildBars(self, dateTimes, open_, high, low, close, volume, adjClose, extras):
+        return [
+            bar.BasicBar(dateTime, o, h, l, c, v, None, self.__frequency)
+            for dateTime, o, h, l, c, v in zip(dateTimes, open_, high, low, close, volume)
+        ]
+
 
 class Feed(csvfeed.BarFeed):
     """A :class:`pyalgotrade.barfeed.csvfeed.BarFeed` that loads bars from CSV files downloaded from Google Finance.
@@ -129,6 +159,12 @@ class Feed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return False
 
+    def createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
+
     def addBarsFromCSV(self, instrument, path, timezone=None, skipMalformedBars=False):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -143,8 +179,5 @@ class Feed(csvfeed.BarFeed):
         :type skipMalformedBars: boolean.
         """
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
+        rowParser = self.createRowParser(timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser, skipMalformedBars=skipMalformedBars)
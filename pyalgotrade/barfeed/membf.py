@@ -18,11 +18,17 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import heapq
+
 import six
 
 from pyalgotrade import barfeed
 from pyalgotrade import bar
-from pyalgotrade import utils
+
+
+def iter_timeline_keys(instrument, bars):
+    for pos, bar_ in enumerate(bars):
+        yield (bar_.getDateTime(), instrument, pos)
 
 
 # A non real-time BarFeed responsible for:
@@ -31,29 +37,76 @@ from pyalgotrade import utils
 #
 # Subclasses should:
 # - Forward the call to start() if they override it.
+#
+# Since bars can't be added once the feed is started, all the bars are merged once into a timeline holding the unique
+# datetimes and, for each one of those, the position of the first bar in a flat list of (instrument, bar) pairs.
+# Dispatching is then just moving a cursor along the timeline.
 
 class BarFeed(barfeed.BaseBarFeed):
     def __init__(self, frequency, maxLen=None):
         super(BarFeed, self).__init__(frequency, maxLen)
 
         self.__bars = {}
-        self.__nextPos = {}
+        self.__dateTimes = None
+        self.__offsets = None
+        self.__entries = None
+        self.__nextPos = 0
         self.__started = False
         self.__currDateTime = None
 
     def reset(self):
-        self.__nextPos = {}
-        for instrument in self.__bars.keys():
-            self.__nextPos.setdefault(instrument, 0)
+        self.__nextPos = 0
         self.__currDateTime = None
         super(BarFeed, self).reset()
 
+    def __buildTimeline(self):
+        self.__dateTimes = []
+        self.__offsets = []
+        self.__entries = []
+
+        # Bars are already sorted by datetime within each instrument, so they just need to be merged.
+        instrumentBars = [iter_timeline_keys(instrument, bars) for instrument, bars in six.iteritems(self.__bars)]
+        groupDateTime = None
+        group = []
+        for dateTime, instrument, pos in heapq.merge(*instrumentBars):
+            if len(group) and dateTime != groupDateTime:
+                self.__addToTimeline(groupDateTime, group)
+                group = []
+            groupDateTime = dateTime
+            group.append((instrument, self.__bars[instrument][pos]))
+        if len(group):
+            self.__addToTimeline(groupDateTime, group)
+        self.__offsets.append(len(self.__entries))
+
+    def __addToTimeline(self, dateTime, group):
+        # Duplicate bars for an instrument go into additional entries with the same datetime, so getNextBars can
+        # detect them.
+        rounds = [[]]
+        counts = {}
+        for instrument, bar_ in group:
+            count = counts.get(instrument, 0)
+            counts[instrument] = count + 1
+            if count == len(rounds):
+                rounds.append([])
+            rounds[count].append((instrument, bar_))
+
+        for entries in rounds:
+            self.__dateTimes.append(dateTime)
+            self.__offsets.append(len(self.__entries))
+            self.__entries.extend(entries)
+
+    def __getDateTimes(self):
+        if self.__dateTimes is None:
+            self.__buildTimeline()
+        return self.__dateTimes
+
     def getCurrentDateTime(self):
         return self.__currDateTime
 
     def start(self):
         super(BarFeed, self).start()
         self.__started = True
+        self.__getDateTimes()
 
     def stop(self):
         pass
@@ -66,47 +119,34 @@ class BarFeed(barfeed.BaseBarFeed):
             raise Exception("Can't add more bars once you started consuming bars")
 
         self.__bars.setdefault(instrument, [])
-        self.__nextPos.setdefault(instrument, 0)
 
         # Add and sort the bars
         self.__bars[instrument].extend(bars)
         self.__bars[instrument].sort(key=lambda b: b.getDateTime())
+        self.__dateTimes = None
 
         self.registerInstrument(instrument)
 
     def eof(self):
-        ret = True
         # Check if there is at least one more bar to return.
-        for instrument, bars in six.iteritems(self.__bars):
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = False
-                break
-        return ret
+        return self.__nextPos >= len(self.__getDateTimes())
 
     def peekDateTime(self):
         ret = None
-
-        for instrument, bars in six.iteritems(self.__bars):
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = utils.safe_min(ret, bars[nextPos].getDateTime())
+        dateTimes = self.__getDateTimes()
+        if self.__nextPos < len(dateTimes):
+            ret = dateTimes[self.__nextPos]
         return ret
 
     def getNextBars(self):
         # All bars must have the same datetime. We will return all the ones with the smallest datetime.
-        smallestDateTime = self.peekDateTime()
-
-        if smallestDateTime is None:
+        dateTimes = self.__getDateTimes()
+        if self.__nextPos >= len(dateTimes):
             return None
 
-        # Make a second pass to get all the bars that had the smallest datetime.
-        ret = {}
-        for instrument, bars in six.iteritems(self.__bars):
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars) and bars[nextPos].getDateTime() == smallestDateTime:
-                ret[instrument] = bars[nextPos]
-                self.__nextPos[instrument] += 1
+        smallestDateTime = dateTimes[self.__nextPos]
+        ret = dict(self.__entries[self.__offsets[self.__nextPos]:self.__offsets[self.__nextPos + 1]])
+        self.__nextPos += 1
 
         if self.__currDateTime == smallestDateTime:
             raise Exception("Duplicate bars found for %s on %s" % (list(ret.keys()), smallestDateTime))
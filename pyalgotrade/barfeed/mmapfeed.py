@@ -0,0 +1,420 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import json
+import math
+import os
+import shutil
+
+import numpy
+import pytz
+from six.moves.urllib.parse import quote
+
+from pyalgotrade import barfeed
+from pyalgotrade import bar
+from pyalgotrade.barfeed import dbfeed
+from pyalgotrade.barfeed import sqlitefeed
+from pyalgotrade.utils import dt
+
+
+# Each column is stored in a separate file. Timestamps are microseconds since the epoch, in UTC.
+# The column files for an instrument and frequency live in a generation directory, and a manifest file holds the
+# current generation and the number of bars. Writes are committed by atomically replacing the manifest, so an
+# interrupted write leaves the previous values in place.
+COLUMNS = [
+    ("timestamp", numpy.dtype("<i8")),
+    ("open", numpy.dtype("<f8")),
+    ("high", numpy.dtype("<f8")),
+    ("low", numpy.dtype("<f8")),
+    ("close", numpy.dtype("<f8")),
+    ("volume", numpy.dtype("<f8")),
+    ("adj_close", numpy.dtype("<f8")),
+]
+
+# How many bars per instrument to buffer when adding bars from a feed.
+FEED_BATCH_SIZE = 100000
+
+
+MANIFEST = "manifest.json"
+
+
+# Atomically replaces dst with src.
+def _replace_file(src, dst):
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:
+        # Python 2. os.rename is atomic on POSIX, but it fails on Windows if dst exists.
+        if os.name == "nt" and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def _get_generation_dir(path, generation):
+    return os.path.join(path, "gen-%d" % generation)
+
+
+def _bars_to_columns(bars):
+    return {
+        "timestamp": numpy.array([dt.datetime_to_microseconds(bar_.getDateTime()) for bar_ in bars], dtype="<i8"),
+        "open": numpy.array([bar_.getOpen() for bar_ in bars], dtype="<f8"),
+        "high": numpy.array([bar_.getHigh() for bar_ in bars], dtype="<f8"),
+        "low": numpy.array([bar_.getLow() for bar_ in bars], dtype="<f8"),
+        "close": numpy.array([bar_.getClose() for bar_ in bars], dtype="<f8"),
+        "volume": numpy.array([bar_.getVolume() for bar_ in bars], dtype="<f8"),
+        # Missing adjusted close values are stored as NaN.
+        "adj_close": numpy.array(
+            [numpy.nan if bar_.getAdjClose() is None else bar_.getAdjClose() for bar_ in bars], dtype="<f8"
+        ),
+    }
+
+
+def _build_bar(columns, pos, frequency, localizer):
+    dateTime = dt.microseconds_to_datetime(int(columns["timestamp"][pos]), pytz.utc)
+    if localizer is not None:
+        dateTime = localizer.localize(dateTime)
+    adjClose = float(columns["adj_close"][pos])
+    if math.isnan(adjClose):
+        adjClose = None
+    return bar.BasicBar(
+        dateTime, float(columns["open"][pos]), float(columns["high"][pos]), float(columns["low"][pos]),
+        float(columns["close"][pos]), float(columns["volume"][pos]), adjClose, frequency
+    )
+
+
+class Database(dbfeed.Database):
+    """A bar database that stores the values for each instrument and frequency in contiguous arrays on disk, one file
+    per column, that get memory-mapped when loaded.
+
+    :param rootDir: The directory where files are stored. It gets created if it doesn't exist.
+    :type rootDir: string.
+
+    .. note::
+        * Datetimes are stored in UTC. Naive datetimes are treated as if they were in UTC.
+        * If writing bars gets interrupted, the values stored before are kept.
+    """
+
+    def __init__(self, rootDir):
+        self.__rootDir = rootDir
+        if not os.path.isdir(rootDir):
+            os.makedirs(rootDir)
+
+    def __getPath(self, instrument, frequency):
+        instrument = sqlitefeed.normalize_instrument(instrument)
+        return os.path.join(self.__rootDir, quote(instrument, safe=""), str(frequency))
+
+    # Returns the current generation and number of bars.
+    def __readManifest(self, path):
+        manifestPath = os.path.join(path, MANIFEST)
+        if not os.path.exists(manifestPath):
+            return 0, 0
+        with open(manifestPath, "r") as f:
+            manifest = json.load(f)
+        return manifest["generation"], manifest["count"]
+
+    def __writeManifest(self, path, generation, count):
+        tmpPath = os.path.join(path, MANIFEST + ".tmp")
+        with open(tmpPath, "w") as f:
+            json.dump({"generation": generation, "count": count}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace_file(tmpPath, os.path.join(path, MANIFEST))
+
+    # Returns the directory with the column files and the number of bars, after checking that the column files hold
+    # that many values. They may hold more if an append was interrupted, but those values get ignored.
+    def __open(self, path):
+        generation, count = self.__readManifest(path)
+        genDir = _get_generation_dir(path, generation)
+        for name, dtype in COLUMNS:
+            colPath = os.path.join(genDir, name + ".bin")
+            size = os.path.getsize(colPath) if os.path.exists(colPath) else 0
+            if size < count * dtype.itemsize:
+                raise Exception("Column %s in %s has %d values but %d were expected" % (
+                    name, genDir, size // dtype.itemsize, count
+                ))
+        return genDir, count
+
+    def __append(self, path, genDir, count, columns):
+        generation = self.__readManifest(path)[0]
+        if not os.path.isdir(genDir):
+            os.makedirs(genDir)
+        for name, dtype in COLUMNS:
+            with open(os.path.join(genDir, name + ".bin"), "ab") as f:
+                # Drop the values from an interrupted append.
+                f.truncate(count * dtype.itemsize)
+                f.write(columns[name].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.__writeManifest(path, generation, count + len(columns["timestamp"]))
+
+    def __rewrite(self, path, columns):
+        generation = self.__readManifest(path)[0] + 1
+        genDir = _get_generation_dir(path, generation)
+        # A previous rewrite may have been interrupted.
+        if os.path.exists(genDir):
+            shutil.rmtree(genDir)
+        os.makedirs(genDir)
+        for name, dtype in COLUMNS:
+            with open(os.path.join(genDir, name + ".bin"), "wb") as f:
+                f.write(columns[name].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.__writeManifest(path, generation, len(columns["timestamp"]))
+        # Readers may still have the previous generation memory-mapped, and on some platforms it can't be removed.
+        shutil.rmtree(_get_generation_dir(path, generation - 1), ignore_errors=True)
+
+    def getColumns(self, instrument, frequency, fromDateTime=None, toDateTime=None):
+        """Returns a dict that maps column names to read-only numpy arrays with the stored values.
+        Arrays are memory-mapped, so no values are read until they are used.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param frequency: The frequency of the bars.
+        :param fromDateTime: If not None, only bars with this datetime or after it are returned.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: If not None, only bars with this datetime or before it are returned.
+        :type toDateTime: datetime.datetime.
+
+        The columns are **timestamp** (microseconds since the epoch, in UTC), **open**, **high**, **low**, **close**,
+        **volume** and **adj_close** (NaN if missing).
+        """
+
+        genDir, count = self.__open(self.__getPath(instrument, frequency))
+        ret = {}
+        for name, dtype in COLUMNS:
+            if count:
+                ret[name] = numpy.memmap(os.path.join(genDir, name + ".bin"), dtype=dtype, mode="r", shape=(count,))
+            else:
+                ret[name] = numpy.zeros(0, dtype=dtype)
+
+        # Timestamps are sorted, so date ranges are found using binary search.
+        begin = 0
+        end = count
+        if fromDateTime is not None:
+            begin = numpy.searchsorted(ret["timestamp"], dt.datetime_to_microseconds(fromDateTime), side="left")
+        if toDateTime is not None:
+            end = numpy.searchsorted(ret["timestamp"], dt.datetime_to_microseconds(toDateTime), side="right")
+        if begin != 0 or end != count:
+            ret = dict((name, values[begin:end]) for name, values in ret.items())
+        return ret
+
+    def appendBars(self, instrument, frequency, bars):
+        """Stores bars for an instrument. Stored bars with the same datetime get replaced.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param frequency: The frequency of the bars.
+        :param bars: The bars to store.
+        :type bars: list of :class:`pyalgotrade.bar.Bar`.
+
+        .. note::
+            Appending bars that are newer than the ones already stored, like daily updates, only writes the new values.
+            Otherwise all the values for the instrument get rewritten.
+        """
+
+        if len(bars) == 0:
+            return
+
+        path = self.__getPath(instrument, frequency)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        genDir, count = self.__open(path)
+
+        columns = _bars_to_columns(bars)
+        timestamps = columns["timestamp"]
+        inOrder = (numpy.diff(timestamps) > 0).all()
+        if inOrder and count:
+            stored = self.getColumns(instrument, frequency)
+            inOrder = stored["timestamp"][-1] < timestamps[0]
+            del stored
+
+        if inOrder:
+            self.__append(path, genDir, count, columns)
+        else:
+            stored = self.getColumns(instrument, frequency)
+            merged = dict((name, numpy.concatenate([stored[name], columns[name]])) for name, _ in COLUMNS)
+            del stored
+            # Sort by timestamp, leaving new values after stored ones, and keep the last value for each timestamp.
+            order = numpy.argsort(merged["timestamp"], kind="mergesort")
+            merged = dict((name, values[order]) for name, values in merged.items())
+            timestamps = merged["timestamp"]
+            keep = numpy.append(timestamps[1:] != timestamps[:-1], True)
+            merged = dict((name, values[keep]) for name, values in merged.items())
+            self.__rewrite(path, merged)
+
+    def addBar(self, instrument, bar, frequency):
+        self.appendBars(instrument, frequency, [bar])
+
+    def addBarsFromFeed(self, feed):
+        # Bars are buffered per instrument so that they get written in batches.
+        frequency = feed.getFrequency()
+        pending = {}
+        for dateTime, bars in feed:
+            if bars:
+                for instrument in bars.getInstruments():
+                    instrumentBars = pending.setdefault(instrument, [])
+                    instrumentBars.append(bars.getBar(instrument))
+                    if len(instrumentBars) >= FEED_BATCH_SIZE:
+                        self.appendBars(instrument, frequency, instrumentBars)
+                        pending[instrument] = []
+        for instrument, instrumentBars in pending.items():
+            self.appendBars(instrument, frequency, instrumentBars)
+
+    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+        columns = self.getColumns(instrument, frequency, fromDateTime, toDateTime)
+        localizer = dt.Localizer(timezone) if timezone else None
+        return [_build_bar(columns, pos, frequency, localizer) for pos in range(len(columns["timestamp"]))]
+
+
+class Feed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BarFeed` that loads bars from a :class:`Database`.
+
+    Bars are built from the memory-mapped values as they are dispatched, so loading is cheap regardless of how many
+    bars are stored.
+
+    :param rootDir: The directory where the database files are stored.
+    :type rootDir: string.
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    """
+
+    def __init__(self, rootDir, frequency, maxLen=None):
+        super(Feed, self).__init__(frequency, maxLen)
+
+        self.__db = Database(rootDir)
+        # Tuples of (instrument, columns, localizer).
+        self.__sources = []
+        self.__timeline = None
+        # Position in self.__entries where the bars for each timestamp in the timeline start. None if there is only
+        # one instrument.
+        self.__offsets = None
+        self.__entries = None
+        self.__nextPos = 0
+        self.__started = False
+        self.__currDateTime = None
+
+    def reset(self):
+        self.__nextPos = 0
+        self.__currDateTime = None
+        super(Feed, self).reset()
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def getDatabase(self):
+        return self.__db
+
+    def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
+        """Loads bars for a given instrument from the database. The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: If not None, only bars with this datetime or after it are loaded.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: If not None, only bars with this datetime or before it are loaded.
+        :type toDateTime: datetime.datetime.
+        """
+
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+        if instrument in [source[0] for source in self.__sources]:
+            raise Exception("Bars for %s were already loaded" % instrument)
+
+        columns = self.__db.getColumns(instrument, self.getFrequency(), fromDateTime, toDateTime)
+        localizer = dt.Localizer(timezone) if timezone else None
+        self.__sources.append((instrument, columns, localizer))
+        self.__timeline = None
+        self.registerInstrument(instrument)
+
+    def __buildTimeline(self):
+        self.__offsets = None
+        self.__entries = None
+        if len(self.__sources) == 0:
+            self.__timeline = numpy.zeros(0, dtype="<i8")
+        elif len(self.__sources) == 1:
+            self.__timeline = self.__sources[0][1]["timestamp"]
+        else:
+            timestamps = [source[1]["timestamp"] for source in self.__sources]
+            sources = [numpy.full(len(values), i, dtype=numpy.int64) for i, values in enumerate(timestamps)]
+            positions = [numpy.arange(len(values), dtype=numpy.int64) for values in timestamps]
+            # Stable sort so that bars with the same timestamp keep the order in which instruments were loaded.
+            timestamps = numpy.concatenate(timestamps)
+            order = numpy.argsort(timestamps, kind="mergesort")
+            self.__entries = (numpy.concatenate(sources)[order], numpy.concatenate(positions)[order])
+            self.__timeline, offsets = numpy.unique(timestamps[order], return_index=True)
+            self.__offsets = numpy.append(offsets, len(order))
+
+    def __getTimeline(self):
+        if self.__timeline is None:
+            self.__buildTimeline()
+        return self.__timeline
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def start(self):
+        super(Feed, self).start()
+        self.__started = True
+        self.__getTimeline()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__nextPos >= len(self.__getTimeline())
+
+    def peekDateTime(self):
+        ret = None
+        timeline = self.__getTimeline()
+        if self.__nextPos < len(timeline):
+            ret = dt.microseconds_to_datetime(int(timeline[self.__nextPos]), pytz.utc)
+        return ret
+
+    def getNextBars(self):
+        timeline = self.__getTimeline()
+        if self.__nextPos >= len(timeline):
+            return None
+
+        if self.__offsets is None:
+            entries = [(0, self.__nextPos)]
+        else:
+            begin = self.__offsets[self.__nextPos]
+            end = self.__offsets[self.__nextPos + 1]
+            entries = zip(self.__entries[0][begin:end].tolist(), self.__entries[1][begin:end].tolist())
+        self.__nextPos += 1
+
+        barDict = {}
+        for source, pos in entries:
+            instrument, columns, localizer = self.__sources[source]
+            barDict[instrument] = _build_bar(columns, pos, self.getFrequency(), localizer)
+        ret = bar.Bars(barDict)
+        self.__currDateTime = ret.getDateTime()
+        return ret
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
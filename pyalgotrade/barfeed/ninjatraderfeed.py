@@ -20,6 +20,7 @@
 
 import pyalgotrade.barfeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import csvcache
 from pyalgotrade import bar
 from pyalgotrade.utils import dt
 
@@ -53,6 +54,10 @@ def parse_datetime(dateTime):
     return datetime.datetime(year, month, day, hour, minute, sec)
 
 
+# Sample: 20081231
+parse_date = dt.datetime_parser("%Y%m%d")
+
+
 class Frequency(object):
     MINUTE = pyalgotrade.bar.Frequency.MINUTE
     DAILY = pyalgotrade.bar.Frequency.DAY
@@ -63,13 +68,14 @@ class RowParser(csvfeed.RowParser):
         self.__frequency = frequency
         self.__dailyBarTime = dailyBarTime
         self.__timezone = timezone
+        self.__localizer = dt.Localizer(timezone) if timezone else None
 
     def __parseDateTime(self, dateTime):
         ret = None
         if self.__frequency == pyalgotrade.bar.Frequency.MINUTE:
             ret = parse_datetime(dateTime)
         elif self.__frequency == pyalgotrade.bar.Frequency.DAY:
-            ret = datetime.datetime.strptime(dateTime, "%Y%m%d")
+            ret = parse_date(dateTime)
             # Time on CSV files is empty. If told to set one, do it.
             if self.__dailyBarTime is not None:
                 ret = datetime.datetime.combine(ret, self.__dailyBarTime)
@@ -80,8 +86,8 @@ class RowParser(csvfeed.RowParser):
         ret = pytz.utc.localize(ret)
 
         # Localize bars if a market session was set.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def getFieldNames(self):
@@ -99,6 +105,49 @@ class RowParser(csvfeed.RowParser):
         volume = float(csvRowDict["Volume"])
         return bar.BasicBar(dateTime, open_, high, low, close, volume, None, self.__frequency)
 
+    def parseBars(self, columns):
+        if self.__frequency == pyalgotrade.bar.Frequency.MINUTE:
+            try:
+                dateTimes = dt.parse_datetimes(columns["Date Time"], "%Y%m%d %H%M%S")
+            except ValueError:
+                dateTimes = list(map(parse_datetime, columns["Date Time"]))
+        elif self.__frequency == pyalgotrade.bar.Frequency.DAY:
+            try:
+                dateTimes = dt.parse_datetimes(columns["Date Time"], "%Y%m%d")
+            except ValueError:
+                dateTimes = list(map(parse_date, columns["Date Time"]))
+            # Time on CSV files is empty. If told to set one, do it.
+            if self.__dailyBarTime is not None:
+                dateTimes = [datetime.datetime.combine(dateTime, self.__dailyBarTime) for dateTime in dateTimes]
+        else:
+            assert(False)
+
+        # According to NinjaTrader documentation the exported data will be in UTC.
+        dateTimes = [pytz.utc.localize(dateTime) for dateTime in dateTimes]
+
+        # Localize bars if a market session was set.
+        if self.__localizer:
+            dateTimes = list(map(self.__localizer.localize, dateTimes))
+
+        close = list(map(float, columns["Close"]))
+        open_ = list(map(float, columns["Open"]))
+        high = list(map(float, columns["High"]))
+        low = list(map(float, columns["Low"]))
+        volume = list(map(float, columns["Volume"]))
+        return self.buildBars(dateTimes, open_, high, low, close, volume, [None] * len(dateTimes), None)
+
+    def getCacheKey(self):
+        timezone = csvcache.timezone_key(self.__timezone)
+        if timezone is None:
+            return None
+        return repr(("ninjatrader", self.__frequency, str(self.__dailyBarTime), timezone))
+
+    def buildBars(self, dateTimes, open_, high, low, close, volume, adjClose, extras):
+        return [
+            bar.BasicBar(dateTime, o, h, l, c, v, None, self.__frequency)
+            for dateTime, o, h, l, c, v in zip(dateTimes, open_, high, low, close, volume)
+        ]
+
 
 class Feed(csvfeed.BarFeed):
     """A :class:`pyalgotrade.barfeed.csvfeed.BarFeed` that loads bars from CSV files exported from NinjaTrader.
@@ -127,6 +176,12 @@ class Feed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return False
 
+    def createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
+
     def addBarsFromCSV(self, instrument, path, timezone=None):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -142,8 +197,5 @@ class Feed(csvfeed.BarFeed):
         if isinstance(timezone, int):
             raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
+        rowParser = self.createRowParser(timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
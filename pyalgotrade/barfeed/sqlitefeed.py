@@ -18,23 +18,44 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+from pyalgotrade import barfeed
 from pyalgotrade.barfeed import dbfeed
 from pyalgotrade.barfeed import membf
+from pyalgotrade.barfeed import streamfeed
 from pyalgotrade import bar
 from pyalgotrade.utils import dt
 
+import heapq
 import sqlite3
 import os
 
+import six
+
+
+# The number of rows that addBarsFromFeed writes in each transaction.
+FEED_BATCH_SIZE = 100000
+
+JOURNAL_MODES = ["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]
+SYNCHRONOUS_LEVELS = ["OFF", "NORMAL", "FULL", "EXTRA"]
+
 
 def normalize_instrument(instrument):
     return instrument.upper()
 
 
+def _iter_rows(cursor, chunkSize):
+    rows = cursor.fetchmany(chunkSize)
+    while len(rows):
+        for row in rows:
+            yield row
+        rows = cursor.fetchmany(chunkSize)
+
+
 # SQLite DB.
 # Timestamps are stored in UTC.
 class Database(dbfeed.Database):
     def __init__(self, dbFilePath):
+        self.__dbFilePath = dbFilePath
         self.__instrumentIds = {}
 
         # If the file doesn't exist, we'll create it and initialize it.
@@ -108,7 +129,89 @@ class Database(dbfeed.Database):
             params = [bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose(), instrumentId, frequency, timeStamp]
             self.__connection.execute(sql, params)
 
-    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+    def __getBarRow(self, instrumentId, bar, frequency):
+        return (
+            instrumentId, frequency, dt.datetime_to_timestamp(bar.getDateTime()), bar.getOpen(), bar.getHigh(),
+            bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose()
+        )
+
+    # Inserts the rows in a single transaction. Rows that are already stored get replaced.
+    def __writeBarRows(self, rows):
+        sql = "insert or replace into bar (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close)" \
+            " values (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        self.__connection.execute("begin")
+        try:
+            self.__connection.executemany(sql, rows)
+        except Exception:
+            self.__connection.execute("rollback")
+            raise
+        self.__connection.execute("commit")
+
+    def appendBars(self, instrument, frequency, bars):
+        """Stores bars for an instrument using a single transaction. Stored bars with the same datetime get replaced.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param frequency: The frequency of the bars.
+        :param bars: The bars to store.
+        :type bars: list of :class:`pyalgotrade.bar.Bar`.
+        """
+
+        if len(bars) == 0:
+            return
+        instrumentId = self.__getOrCreateInstrument(normalize_instrument(instrument))
+        self.__writeBarRows([self.__getBarRow(instrumentId, bar, frequency) for bar in bars])
+
+    def addBars(self, bars, frequency):
+        rows = []
+        for instrument in bars.getInstruments():
+            instrumentId = self.__getOrCreateInstrument(normalize_instrument(instrument))
+            rows.append(self.__getBarRow(instrumentId, bars.getBar(instrument), frequency))
+        self.__writeBarRows(rows)
+
+    def addBarsFromFeed(self, feed):
+        # Rows are buffered so that they get written in batches, one transaction per batch.
+        frequency = feed.getFrequency()
+        rows = []
+        for dateTime, bars in feed:
+            if bars:
+                for instrument in bars.getInstruments():
+                    instrumentId = self.__getOrCreateInstrument(normalize_instrument(instrument))
+                    rows.append(self.__getBarRow(instrumentId, bars.getBar(instrument), frequency))
+                if len(rows) >= FEED_BATCH_SIZE:
+                    self.__writeBarRows(rows)
+                    rows = []
+        if len(rows):
+            self.__writeBarRows(rows)
+
+    def setJournalMode(self, journalMode):
+        """Sets the journal mode of the database. WAL speeds up writing bars, and lets other connections read while
+        bars are being written. Returns the journal mode in use, since some modes are not available for all databases.
+
+        :param journalMode: One of DELETE, TRUNCATE, PERSIST, MEMORY, WAL or OFF.
+        :type journalMode: string.
+        """
+
+        journalMode = journalMode.upper()
+        if journalMode not in JOURNAL_MODES:
+            raise Exception("Invalid journal mode %s" % journalMode)
+        # Pragma values can't be bound as parameters, but they were validated above.
+        return self.__connection.execute("pragma journal_mode = %s" % journalMode).fetchone()[0].upper()
+
+    def setSynchronous(self, synchronous):
+        """Sets how often SQLite waits for data to reach the disk. OFF and NORMAL speed up writing bars, at the risk
+        of losing the latest transactions (OFF may also corrupt the database) if the OS crashes or the power fails.
+
+        :param synchronous: One of OFF, NORMAL, FULL or EXTRA.
+        :type synchronous: string.
+        """
+
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise Exception("Invalid synchronous level %s" % synchronous)
+        self.__connection.execute("pragma synchronous = %s" % synchronous)
+
+    def __getBarsQuery(self, instrument, frequency, fromDateTime, toDateTime):
         instrument = normalize_instrument(instrument)
         sql = "select bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.adj_close, bar.frequency" \
             " from bar join instrument on (bar.instrument_id = instrument.instrument_id)" \
@@ -123,17 +226,108 @@ class Database(dbfeed.Database):
             args.append(dt.datetime_to_timestamp(toDateTime))
 
         sql += " order by bar.timestamp asc"
+        return sql, args
+
+    def __buildBar(self, row, timezone):
+        dateTime = dt.timestamp_to_datetime(row[0])
+        if timezone:
+            dateTime = dt.localize(dateTime, timezone)
+        return bar.BasicBar(dateTime, row[1], row[2], row[3], row[4], row[5], row[6], row[7])
+
+    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+        sql, args = self.__getBarsQuery(instrument, frequency, fromDateTime, toDateTime)
         cursor = self.__connection.cursor()
         cursor.execute(sql, args)
         ret = []
         for row in cursor:
-            dateTime = dt.timestamp_to_datetime(row[0])
-            if timezone:
-                dateTime = dt.localize(dateTime, timezone)
-            ret.append(bar.BasicBar(dateTime, row[1], row[2], row[3], row[4], row[5], row[6], row[7]))
+            ret.append(self.__buildBar(row, timezone))
         cursor.close()
         return ret
 
+    def iterBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None, chunkSize=1000):
+        """Like getBars, but yields lists with up to chunkSize bars as they are fetched.
+        A separate connection is used, so the bars can be read from any thread."""
+        sql, args = self.__getBarsQuery(instrument, frequency, fromDateTime, toDateTime)
+        connection = sqlite3.connect(self.__dbFilePath)
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, args)
+            rows = cursor.fetchmany(chunkSize)
+            while len(rows):
+                yield [self.__buildBar(row, timezone) for row in rows]
+                rows = cursor.fetchmany(chunkSize)
+            cursor.close()
+        finally:
+            connection.close()
+
+    def iterBarGroups(self, requests, frequency, chunkSize=1000):
+        """Yields dicts that map instruments to bars with the same datetime, in chronological order.
+        Bars for each instrument are read with a query that walks the primary key index in timestamp order, fetching
+        chunkSize rows at a time, and the results get merged. A separate connection is used, so the bars can be read
+        from any thread.
+
+        :param requests: A list of (instrument, timezone, fromDateTime, toDateTime) tuples, one for each instrument.
+            timezone, fromDateTime and toDateTime may be None.
+        :param frequency: The frequency of the bars.
+        :param chunkSize: The number of rows to fetch at once for each instrument.
+        :type chunkSize: int.
+        """
+
+        connection = sqlite3.connect(self.__dbFilePath)
+        cursors = []
+        try:
+            cursor = connection.cursor()
+            # Resolve the instrument ids upfront so that the bar queries don't have to join with the instrument table.
+            names = [normalize_instrument(request[0]) for request in requests]
+            cursor.execute(
+                "select name, instrument_id from instrument where name in (%s)" % ", ".join(["?"] * len(names)), names
+            )
+            instrumentIds = dict(cursor.fetchall())
+            cursor.close()
+
+            instruments = []
+            rowIterators = []
+            for (instrument, timezone, fromDateTime, toDateTime), name in zip(requests, names):
+                instrumentId = instrumentIds.get(name)
+                if instrumentId is None:
+                    continue
+                sql = "select timestamp, ?, open, high, low, close, volume, adj_close from bar" \
+                    " where instrument_id = ? and frequency = ?"
+                args = [len(instruments), instrumentId, frequency]
+                if fromDateTime is not None:
+                    sql += " and timestamp >= ?"
+                    args.append(dt.datetime_to_timestamp(fromDateTime))
+                if toDateTime is not None:
+                    sql += " and timestamp <= ?"
+                    args.append(dt.datetime_to_timestamp(toDateTime))
+                sql += " order by timestamp asc"
+                cursor = connection.cursor()
+                cursors.append(cursor)
+                cursor.execute(sql, args)
+                instruments.append((instrument, dt.Localizer(timezone) if timezone else None))
+                rowIterators.append(_iter_rows(cursor, chunkSize))
+
+            group = {}
+            groupTimeStamp = None
+            dateTime = None
+            # Rows are (timestamp, position in instruments, ...), so they get merged in timestamp order.
+            for timeStamp, pos, open_, high, low, close, volume, adjClose in heapq.merge(*rowIterators):
+                if timeStamp != groupTimeStamp:
+                    if len(group):
+                        yield group
+                    group = {}
+                    groupTimeStamp = timeStamp
+                    dateTime = dt.timestamp_to_datetime(timeStamp)
+                instrument, localizer = instruments[pos]
+                barDateTime = dateTime if localizer is None else localizer.localize(dateTime)
+                group[instrument] = bar.BasicBar(barDateTime, open_, high, low, close, volume, adjClose, frequency)
+            if len(group):
+                yield group
+        finally:
+            for cursor in cursors:
+                cursor.close()
+            connection.close()
+
     def disconnect(self):
         self.__connection.close()
         self.__connection = None
@@ -154,3 +348,155 @@ class Feed(membf.BarFeed):
     def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
         bars = self.__db.getBars(instrument, self.getFrequency(), timezone, fromDateTime, toDateTime)
         self.addBarsFromSequence(instrument, bars)
+
+
+class StreamingFeed(streamfeed.BarFeed):
+    """Like Feed, but bars are read from the database lazily, as they are consumed, instead of loading all of them in
+    memory before the first event.
+
+    :param dbFilePath: The path to the SQLite database.
+    :type dbFilePath: string.
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param chunkSize: The number of bars to fetch at once for each instrument.
+    :type chunkSize: int.
+    :param prefetchDepth: If greater than 0, bars are fetched from a worker thread for each instrument that keeps up
+        to this many chunks of bars ready.
+    :type prefetchDepth: int.
+    """
+
+    def __init__(self, dbFilePath, frequency, maxLen=None, chunkSize=1000, prefetchDepth=0):
+        super(StreamingFeed, self).__init__(frequency, maxLen, prefetchDepth)
+
+        self.__db = Database(dbFilePath)
+        self.__chunkSize = chunkSize
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def getDatabase(self):
+        return self.__db
+
+    def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
+        def source():
+            return self.__db.iterBars(instrument, self.getFrequency(), timezone, fromDateTime, toDateTime, self.__chunkSize)
+
+        self.addBarSource(instrument, source)
+
+
+class MultiInstrumentStreamingFeed(barfeed.BaseBarFeed):
+    """Like StreamingFeed, but the bars for all the instruments are read from the database and grouped by datetime
+    as they are consumed, instead of being merged by the base class. Bars for each instrument are read in index order,
+    so memory usage doesn't depend on the number of bars, and the first bars are available right away.
+
+    :param dbFilePath: The path to the SQLite database.
+    :type dbFilePath: string.
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param chunkSize: The number of rows to fetch at once for each instrument.
+    :type chunkSize: int.
+    """
+
+    def __init__(self, dbFilePath, frequency, maxLen=None, chunkSize=1000):
+        super(MultiInstrumentStreamingFeed, self).__init__(frequency, maxLen)
+
+        self.__db = Database(dbFilePath)
+        self.__chunkSize = chunkSize
+        self.__requests = []
+        self.__groups = None
+        self.__nextBars = None
+        self.__started = False
+        self.__currDateTime = None
+
+    def __close(self):
+        if self.__groups is not None:
+            self.__groups.close()
+
+    def reset(self):
+        self.__close()
+        self.__groups = None
+        self.__nextBars = None
+        self.__currDateTime = None
+        super(MultiInstrumentStreamingFeed, self).reset()
+
+    # Returns the next bars without consuming them, or None if there are no more bars.
+    def __peekBars(self):
+        if self.__groups is None:
+            self.__groups = self.__db.iterBarGroups(self.__requests, self.getFrequency(), self.__chunkSize)
+        if self.__nextBars is None:
+            group = six.next(self.__groups, None)
+            if group is not None:
+                self.__nextBars = bar.Bars(group)
+        return self.__nextBars
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def getDatabase(self):
+        return self.__db
+
+    def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
+        """Registers an instrument whose bars will be read from the database.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: If not None, only bars with this datetime or after it are loaded.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: If not None, only bars with this datetime or before it are loaded.
+        :type toDateTime: datetime.datetime.
+        """
+
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+        if instrument in [request[0] for request in self.__requests]:
+            raise Exception("Bars for %s were already loaded" % instrument)
+
+        self.__requests.append((instrument, timezone, fromDateTime, toDateTime))
+        # Restart the query to include the new instrument.
+        self.__close()
+        self.__groups = None
+        self.__nextBars = None
+        self.registerInstrument(instrument)
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def start(self):
+        super(MultiInstrumentStreamingFeed, self).start()
+        self.__started = True
+
+    def stop(self):
+        # Bars that were already fetched are kept, but no more rows are read since closed generators are exhausted.
+        self.__close()
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__peekBars() is None
+
+    def peekDateTime(self):
+        ret = None
+        nextBars = self.__peekBars()
+        if nextBars is not None:
+            ret = nextBars.getDateTime()
+        return ret
+
+    def getNextBars(self):
+        ret = self.__peekBars()
+        if ret is not None:
+            self.__nextBars = None
+            self.__currDateTime = ret.getDateTime()
+        return ret
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
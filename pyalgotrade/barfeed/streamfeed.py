@@ -0,0 +1,271 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import collections
+import heapq
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+from pyalgotrade import barfeed
+from pyalgotrade import bar
+
+
+class PrefetchIterator(object):
+    """Iterates over the values from another iterator, which gets consumed from a worker thread that keeps up to
+    queueDepth values ready. Exceptions raised by the iterator are raised again when the failing value is reached.
+
+    :param iterator: The iterator to consume from the worker thread.
+    :param queueDepth: The maximum number of values to read ahead.
+    :type queueDepth: int.
+    """
+
+    VALUE = 0
+    END = 1
+    ERROR = 2
+
+    def __init__(self, iterator, queueDepth):
+        self.__queue = queue.Queue(maxsize=queueDepth)
+        self.__stopped = threading.Event()
+        self.__finished = False
+        self.__thread = threading.Thread(target=self.__run, args=(iterator,))
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self, iterator):
+        try:
+            for value in iterator:
+                if self.__stopped.is_set():
+                    break
+                self.__queue.put((PrefetchIterator.VALUE, value))
+                # close() drains the queue after setting the stop flag, so this put won't block if closed.
+                if self.__stopped.is_set():
+                    break
+            else:
+                self.__queue.put((PrefetchIterator.END, None))
+        except Exception:
+            self.__queue.put((PrefetchIterator.ERROR, sys.exc_info()))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.__finished:
+            raise StopIteration()
+
+        kind, value = self.__queue.get()
+        if kind == PrefetchIterator.END:
+            self.__finished = True
+            raise StopIteration()
+        elif kind == PrefetchIterator.ERROR:
+            self.__finished = True
+            six.reraise(*value)
+        return value
+
+    def next(self):
+        return self.__next__()
+
+    def close(self):
+        """Stops the worker thread and waits for it to finish."""
+        self.__finished = True
+        self.__stopped.set()
+        # Unblock the worker thread if it is waiting for room in the queue.
+        while self.__thread.is_alive():
+            try:
+                self.__queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self.__thread.join()
+
+
+# A non real-time BarFeed that reads bars lazily.
+#
+# Each instrument has a source, which is a callable that returns an iterator of lists of bars sorted by datetime.
+# Only the current list of bars for each instrument is kept in memory, and instruments are merged using a heap of
+# (next bar datetime, instrument) pairs, just like membf.BarFeed does.
+#
+# If prefetchDepth is greater than 0, each source is consumed from a worker thread that keeps up to prefetchDepth lists
+# of bars ready, so reading and parsing overlap with event processing.
+#
+# Subclasses should:
+# - Forward the call to start(), stop() and reset() if they override them.
+
+class BarFeed(barfeed.BaseBarFeed):
+    def __init__(self, frequency, maxLen=None, prefetchDepth=0):
+        super(BarFeed, self).__init__(frequency, maxLen)
+
+        self.__prefetchDepth = prefetchDepth
+        self.__sources = {}
+        self.__iterators = {}
+        self.__pending = {}
+        # The datetime for the last bar read for each instrument, used to check that bars come in order.
+        self.__lastDateTimes = {}
+        self.__haveAdjClose = {}
+        self.__heap = None
+        self.__started = False
+        self.__currDateTime = None
+
+    # Closes the sources. Bars that were already read are kept.
+    def __close(self):
+        for instrument in self.__sources:
+            iterator = self.__iterators.get(instrument)
+            if hasattr(iterator, "close"):
+                iterator.close()
+            self.__iterators[instrument] = None
+            self.__pending.setdefault(instrument, collections.deque())
+
+    def reset(self):
+        self.__close()
+        self.__iterators = {}
+        self.__pending = {}
+        self.__lastDateTimes = {}
+        self.__heap = None
+        self.__currDateTime = None
+        super(BarFeed, self).reset()
+
+    # Returns the deque with the pending bars for an instrument, reading more bars from the source if it is empty.
+    def __getPending(self, instrument):
+        pending = self.__pending.get(instrument)
+        if pending is None:
+            pending = collections.deque()
+            self.__pending[instrument] = pending
+            iterator = iter(self.__sources[instrument]())
+            if self.__prefetchDepth > 0:
+                iterator = PrefetchIterator(iterator, self.__prefetchDepth)
+            self.__iterators[instrument] = iterator
+
+        iterator = self.__iterators[instrument]
+        while len(pending) == 0 and iterator is not None:
+            bars = six.next(iterator, None)
+            if bars is None:
+                self.__iterators[instrument] = iterator = None
+            else:
+                self.__checkOrder(instrument, bars)
+                pending.extend(bars)
+                if len(bars) and instrument not in self.__haveAdjClose:
+                    self.__haveAdjClose[instrument] = bars[0].getAdjClose() is not None
+        return pending
+
+    # Bars are merged assuming that they come sorted by datetime, so this is checked as they are read.
+    def __checkOrder(self, instrument, bars):
+        lastDateTime = self.__lastDateTimes.get(instrument)
+        for bar_ in bars:
+            dateTime = bar_.getDateTime()
+            if lastDateTime is not None and dateTime < lastDateTime:
+                raise Exception(
+                    "Bar date times are not in order for %s. Previous datetime was %s and current datetime is %s" % (
+                        instrument, lastDateTime, dateTime
+                    )
+                )
+            lastDateTime = dateTime
+        if lastDateTime is not None:
+            self.__lastDateTimes[instrument] = lastDateTime
+
+    def __getHeap(self):
+        if self.__heap is None:
+            self.__heap = []
+            for instrument in self.__sources:
+                pending = self.__getPending(instrument)
+                if len(pending):
+                    self.__heap.append((pending[0].getDateTime(), instrument))
+            heapq.heapify(self.__heap)
+        return self.__heap
+
+    def addBarSource(self, instrument, source):
+        """Registers the bars for an instrument.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param source: A callable that returns an iterator of lists of :class:`pyalgotrade.bar.Bar` sorted by datetime.
+            It gets called every time the feed starts reading bars for the instrument, including after a reset.
+        """
+
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+        if instrument in self.__sources:
+            raise Exception("A source for %s was already added" % instrument)
+
+        self.__sources[instrument] = source
+        self.__heap = None
+        self.registerInstrument(instrument)
+
+    def barsHaveAdjClose(self):
+        # Check the first bar for each instrument.
+        for instrument in self.__sources:
+            if instrument not in self.__haveAdjClose:
+                self.__getPending(instrument)
+        return len(self.__haveAdjClose) > 0 and all(six.itervalues(self.__haveAdjClose))
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def start(self):
+        super(BarFeed, self).start()
+        self.__started = True
+
+    def stop(self):
+        self.__close()
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return len(self.__getHeap()) == 0
+
+    def peekDateTime(self):
+        ret = None
+        heap = self.__getHeap()
+        if len(heap):
+            ret = heap[0][0]
+        return ret
+
+    def getNextBars(self):
+        # All bars must have the same datetime. We will return all the ones with the smallest datetime.
+        heap = self.__getHeap()
+        if len(heap) == 0:
+            return None
+
+        smallestDateTime = heap[0][0]
+        ret = {}
+        while len(heap) and heap[0][0] == smallestDateTime:
+            instrument = heapq.heappop(heap)[1]
+            ret[instrument] = self.__pending[instrument].popleft()
+
+        # Push the instruments back once all the bars were collected. Pushing them in the loop above would pick
+        # duplicate bars for the same instrument.
+        for instrument in ret:
+            pending = self.__getPending(instrument)
+            if len(pending):
+                heapq.heappush(heap, (pending[0].getDateTime(), instrument))
+
+        if self.__currDateTime == smallestDateTime:
+            raise Exception("Duplicate bars found for %s on %s" % (list(ret.keys()), smallestDateTime))
+
+        self.__currDateTime = smallestDateTime
+        return bar.Bars(ret)
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
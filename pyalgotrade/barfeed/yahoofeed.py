@@ -20,6 +20,7 @@
 
 from pyalgotrade.barfeed import csvfeed
 from pyalgotrade.barfeed import common
+from pyalgotrade.barfeed import csvcache
 from pyalgotrade.utils import dt
 from pyalgotrade import bar
 
@@ -51,6 +52,7 @@ class RowParser(csvfeed.RowParser):
         self.__dailyBarTime = dailyBarTime
         self.__frequency = frequency
         self.__timezone = timezone
+        self.__localizer = dt.Localizer(timezone) if timezone else None
         self.__sanitize = sanitize
         self.__barClass = barClass
 
@@ -60,8 +62,8 @@ class RowParser(csvfeed.RowParser):
         if self.__dailyBarTime is not None:
             ret = datetime.datetime.combine(ret, self.__dailyBarTime)
         # Localize the datetime if a timezone was given.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def getFieldNames(self):
@@ -85,6 +87,43 @@ class RowParser(csvfeed.RowParser):
 
         return self.__barClass(dateTime, open_, high, low, close, volume, adjClose, self.__frequency)
 
+    def parseBars(self, columns):
+        try:
+            dateTimes = dt.parse_datetimes(columns["Date"], "%Y-%m-%d")
+        except ValueError:
+            dateTimes = list(map(parse_date, columns["Date"]))
+        # Time on Yahoo! Finance CSV files is empty. If told to set one, do it.
+        if self.__dailyBarTime is not None:
+            dateTimes = [datetime.datetime.combine(dateTime, self.__dailyBarTime) for dateTime in dateTimes]
+        # Localize the datetimes if a timezone was given.
+        if self.__localizer:
+            dateTimes = list(map(self.__localizer.localize, dateTimes))
+        close = list(map(float, columns["Close"]))
+        open_ = list(map(float, columns["Open"]))
+        high = list(map(float, columns["High"]))
+        low = list(map(float, columns["Low"]))
+        volume = list(map(float, columns["Volume"]))
+        adjClose = list(map(float, columns["Adj Close"]))
+        if self.__sanitize:
+            open_, high, low, close = common.sanitize_ohlc_columns(open_, high, low, close)
+
+        return self.buildBars(dateTimes, open_, high, low, close, volume, adjClose, None)
+
+    def getCacheKey(self):
+        timezone = csvcache.timezone_key(self.__timezone)
+        if timezone is None:
+            return None
+        return repr((
+            "yahoo", str(self.__dailyBarTime), self.__frequency, timezone, self.__sanitize,
+            csvcache.bar_class_key(self.__barClass)
+        ))
+
+    def buildBars(self, dateTimes, open_, high, low, close, volume, adjClose, extras):
+        return [
+            self.__barClass(dateTime, o, h, l, c, v, a, self.__frequency)
+            for dateTime, o, h, l, c, v, a in zip(dateTimes, open_, high, low, close, volume, adjClose)
+        ]
+
 
 class Feed(csvfeed.BarFeed):
     """A :class:`pyalgotrade.barfeed.csvfeed.BarFeed` that loads bars from CSV files downloaded from Yahoo! Finance.
@@ -128,6 +167,14 @@ class Feed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return True
 
+    def createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return RowParser(
+            self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars, self.__barClass
+        )
+
     def addBarsFromCSV(self, instrument, path, timezone=None):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -143,10 +190,5 @@ class Feed(csvfeed.BarFeed):
         if isinstance(timezone, int):
             raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = RowParser(
-            self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars, self.__barClass
-        )
+        rowParser = self.createRowParser(timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
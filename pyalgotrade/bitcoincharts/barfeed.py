@@ -153,6 +153,10 @@ class CSVTradeFeed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return False
 
+    def loadCSVFiles(self, files, workers=None):
+        # Timestamps are fixed up while parsing, using state that is shared by all the files.
+        raise Exception("loadCSVFiles is not supported by CSVTradeFeed. Use addBarsFromCSV instead")
+
     def addBarsFromCSV(self, path, instrument="BTC", timezone=None, fromDateTime=None, toDateTime=None):
         """Loads bars from a trades CSV formatted file.
 
@@ -186,3 +190,70 @@ class CSVTradeFeed(csvfeed.BarFeed):
             super(CSVTradeFeed, self).addBarsFromCSV(instrument, path, rowParser)
         finally:
             self.setBarFilter(prevBarFilter)
+
+
+class StreamingCSVTradeFeed(csvfeed.StreamingBarFeed):
+    """Like :class:`CSVTradeFeed` but trades are parsed lazily, as bars are consumed, instead of loading all of them in
+    memory before the first event.
+
+    :param timezone: An optional default timezone to use to localize bars. By default bars are loaded in UTC.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        If not None, it must be greater than 0.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param chunkSize: The number of trades to parse at once for each instrument.
+    :type chunkSize: int.
+    :param prefetchDepth: If greater than 0, files are parsed from a worker thread for each instrument that keeps up
+        to this many chunks of bars ready.
+    :type prefetchDepth: int.
+
+    .. note::
+        * Files must be sorted with the **unixtime** column in ascending order.
+        * Files for the same instrument must be added in chronological order.
+    """
+
+    def __init__(self, timezone=None, maxLen=None, chunkSize=1000, prefetchDepth=0):
+        super(StreamingCSVTradeFeed, self).__init__(barfeed.Frequency.TRADE, maxLen, chunkSize, prefetchDepth)
+        self.__timezone = timezone
+        # Instruments may be parsed from different threads, so each one gets its own fix.
+        self.__unixTimeFixes = {}
+
+    def barsHaveAdjClose(self):
+        return False
+
+    def addBarsFromCSV(self, path, instrument="BTC", timezone=None, fromDateTime=None, toDateTime=None):
+        """Adds a trades CSV formatted file.
+
+        :param path: The path to the file.
+        :type path: string.
+        :param instrument: The instrument identifier.
+        :type instrument: string.
+        :param timezone: An optional timezone to use to localize bars. By default bars are loaded in UTC.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is greater than or equal to fromDateTime are loaded.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is lower than or equal to toDateTime are loaded.
+        :type toDateTime: datetime.datetime.
+
+        .. note::
+            * Every file that you load bars from must have trades in the same currency.
+            * If fromDateTime or toDateTime are naive, they are treated as UTC.
+        """
+
+        if timezone is None:
+            timezone = self.__timezone
+        unixTimeFix = self.__unixTimeFixes.setdefault(instrument, UnixTimeFix())
+        rowParser = RowParser(unixTimeFix, timezone)
+
+        # Save the barfilter to restore it later.
+        prevBarFilter = self.getBarFilter()
+        try:
+            if fromDateTime or toDateTime:
+                self.setBarFilter(csvfeed.DateRangeFilter(to_utc_if_naive(fromDateTime), to_utc_if_naive(toDateTime)))
+            super(StreamingCSVTradeFeed, self).addBarsFromCSV(instrument, path, rowParser)
+        finally:
+            self.setBarFilter(prevBarFilter)
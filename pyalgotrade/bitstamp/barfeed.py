@@ -23,3 +23,4 @@ from pyalgotrade.bitstamp import livefeed
 
 
 LiveTradeFeed = livefeed.LiveTradeFeed
+AsyncLiveTradeFeed = livefeed.AsyncLiveTradeFeed
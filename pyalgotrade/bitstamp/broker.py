@@ -26,6 +26,7 @@ from pyalgotrade.bitstamp import livebroker
 
 
 LiveBroker = livebroker.LiveBroker
+AsyncLiveBroker = livebroker.AsyncLiveBroker
 
 # In a backtesting or paper-trading scenario the BacktestingBroker dispatches events while processing events from the
 # BarFeed.
@@ -22,8 +22,11 @@ import threading
 import time
 
 from six.moves import queue
+import tornado.gen
+import tornado.ioloop
 
 from pyalgotrade import broker
+from pyalgotrade import dispatcher
 from pyalgotrade.bitstamp import httpclient
 from pyalgotrade.bitstamp import common
 
@@ -42,6 +45,16 @@ def build_order_from_open_order(openOrder, instrumentTraits):
     return ret
 
 
+def get_new_trades(httpClient, lastTradeId):
+    userTrades = httpClient.getUserTransactions(httpclient.HTTPClient.UserTransactionType.MARKET_TRADE)
+
+    # Get the new trades only.
+    ret = [t for t in userTrades if t.getId() > lastTradeId]
+
+    # Sort by id, so older trades first.
+    return sorted(ret, key=lambda t: t.getId())
+
+
 class TradeMonitor(threading.Thread):
     POLL_FREQUENCY = 2
 
@@ -52,17 +65,11 @@ class TradeMonitor(threading.Thread):
         super(TradeMonitor, self).__init__()
         self.__lastTradeId = -1
         self.__httpClient = httpClient
-        self.__queue = queue.Queue()
+        self.__queue = dispatcher.WakeUpQueue()
         self.__stop = False
 
     def _getNewTrades(self):
-        userTrades = self.__httpClient.getUserTransactions(httpclient.HTTPClient.UserTransactionType.MARKET_TRADE)
-
-        # Get the new trades only.
-        ret = [t for t in userTrades if t.getId() > self.__lastTradeId]
-
-        # Sort by id, so older trades first.
-        return sorted(ret, key=lambda t: t.getId())
+        return get_new_trades(self.__httpClient, self.__lastTradeId)
 
     def getQueue(self):
         return self.__queue
@@ -93,6 +100,57 @@ class TradeMonitor(threading.Thread):
         self.__stop = True
 
 
+# Same as TradeMonitor, but polling from the event loop instead of from a thread of its own.
+# HTTP requests are blocking, so those run on the event loop's executor. start() can be called from the executor as
+# well, and startPolling() has to be called from the event loop afterwards.
+class AsyncTradeMonitor(object):
+    def __init__(self, httpClient):
+        self.__lastTradeId = -1
+        self.__httpClient = httpClient
+        self.__queue = dispatcher.WakeUpQueue()
+        self.__stop = False
+        self.__future = None
+
+    def _getNewTrades(self):
+        return get_new_trades(self.__httpClient, self.__lastTradeId)
+
+    def getQueue(self):
+        return self.__queue
+
+    def start(self):
+        trades = self._getNewTrades()
+        # Store the last trade id since we'll start processing new ones only.
+        if len(trades):
+            self.__lastTradeId = trades[-1].getId()
+            common.logger.info("Last trade found: %d" % (self.__lastTradeId))
+
+    def startPolling(self):
+        self.__future = self.__run()
+
+    @tornado.gen.coroutine
+    def __run(self):
+        ioLoop = tornado.ioloop.IOLoop.current()
+        while not self.__stop:
+            try:
+                trades = yield ioLoop.run_in_executor(None, self._getNewTrades)
+                if len(trades):
+                    self.__lastTradeId = trades[-1].getId()
+                    common.logger.info("%d new trade/s found" % (len(trades)))
+                    self.__queue.put((TradeMonitor.ON_USER_TRADE, trades))
+            except Exception as e:
+                common.logger.critical("Error retrieving user transactions", exc_info=e)
+
+            yield tornado.gen.sleep(TradeMonitor.POLL_FREQUENCY)
+
+    def stop(self):
+        self.__stop = True
+
+    @tornado.gen.coroutine
+    def joinAsync(self):
+        if self.__future is not None:
+            yield self.__future
+
+
 class LiveBroker(broker.Broker):
     """A Bitstamp live broker.
 
@@ -125,7 +183,8 @@ class LiveBroker(broker.Broker):
         super(LiveBroker, self).__init__()
         self.__stop = False
         self.__httpClient = self.buildHTTPClient(clientId, key, secret)
-        self.__tradeMonitor = TradeMonitor(self.__httpClient)
+        self.__tradeMonitor = self.buildTradeMonitor(self.__httpClient)
+        self.__dispatcher = None
         self.__cash = 0
         self.__shares = {}
         self.__activeOrders = {}
@@ -144,6 +203,13 @@ class LiveBroker(broker.Broker):
     def buildHTTPClient(self, clientId, key, secret):
         return httpclient.HTTPClient(clientId, key, secret)
 
+    # Factory method for the object that polls for new user trades.
+    def buildTradeMonitor(self, httpClient):
+        return TradeMonitor(httpClient)
+
+    def _getTradeMonitor(self):
+        return self.__tradeMonitor
+
     def refreshAccountBalance(self):
         """Refreshes cash and BTC balance."""
 
@@ -234,7 +300,7 @@ class LiveBroker(broker.Broker):
 
         # Dispatch events from the trade monitor.
         try:
-            eventType, eventData = self.__tradeMonitor.getQueue().get(True, LiveBroker.QUEUE_TIMEOUT)
+            eventType, eventData = self.__tradeMonitor.getQueue().get(self.__dispatcher is None, LiveBroker.QUEUE_TIMEOUT)
 
             if eventType == TradeMonitor.ON_USER_TRADE:
                 self._onUserTrades(eventData)
@@ -247,6 +313,14 @@ class LiveBroker(broker.Broker):
         # Return None since this is a realtime subject.
         return None
 
+    def onDispatcherRegistered(self, dispatcher):
+        super(LiveBroker, self).onDispatcherRegistered(dispatcher)
+        self.__dispatcher = dispatcher
+        self.__tradeMonitor.getQueue().setDispatcher(dispatcher)
+
+    def notifiesDispatcher(self):
+        return self.__dispatcher is not None
+
     # END observer.Subject interface
 
     # BEGIN broker.Broker interface
@@ -283,6 +357,9 @@ class LiveBroker(broker.Broker):
             # IMPORTANT: Do not emit an event for this switch because when using the position interface
             # the order is not yet mapped to the position and Position.onOrderUpdated will get called.
             order.switchState(broker.Order.State.SUBMITTED)
+            # Wake up the dispatcher so the order gets accepted right away.
+            if self.__dispatcher is not None:
+                self.__dispatcher.wakeUp()
         else:
             raise Exception("The order was already processed")
 
@@ -330,3 +407,32 @@ class LiveBroker(broker.Broker):
         self.notifyOrderEvent(broker.OrderEvent(order, broker.OrderEvent.Type.CANCELED, "User requested cancellation"))
 
     # END broker.Broker interface
+
+
+class AsyncLiveBroker(LiveBroker):
+    """A :class:`LiveBroker` that runs on the dispatcher's asyncio event loop, instead of using a thread to poll for
+    user trades. This requires Python 3.
+
+    :param clientId: Client id.
+    :type clientId: string.
+    :param key: API key.
+    :type key: string.
+    :param secret: API secret.
+    :type secret: string.
+    """
+
+    def buildTradeMonitor(self, httpClient):
+        return AsyncTradeMonitor(httpClient)
+
+    def runsOnEventLoop(self):
+        return True
+
+    @tornado.gen.coroutine
+    def startAsync(self):
+        # Retrieving the balance, the open orders and the last trade requires blocking HTTP requests, so those run on
+        # the event loop's executor. Nothing else uses the broker until it is started.
+        yield tornado.ioloop.IOLoop.current().run_in_executor(None, self.start)
+        self._getTradeMonitor().startPolling()
+
+    def joinAsync(self):
+        return self._getTradeMonitor().joinAsync()
@@ -22,9 +22,11 @@ import datetime
 import time
 
 from six.moves import queue
+import tornado.gen
 
 from pyalgotrade import bar
 from pyalgotrade import barfeed
+from pyalgotrade import dispatcher
 from pyalgotrade import observer
 from pyalgotrade.bitstamp import common
 from pyalgotrade.bitstamp import wsclient
@@ -94,7 +96,120 @@ class TradeBar(bar.Bar):
         return not self.__buy
 
 
-class LiveTradeFeed(barfeed.BaseBarFeed):
+# Base class for the real-time BarFeeds that build bars from live trades.
+class BaseLiveTradeFeed(barfeed.BaseBarFeed):
+    def __init__(self, maxLen=None):
+        super(BaseLiveTradeFeed, self).__init__(bar.Frequency.TRADE, maxLen)
+        self.__barDicts = []
+        self.registerInstrument(common.btc_symbol)
+        self.__prevTradeDateTime = None
+        self.__dispatcher = None
+        self.__enableReconnection = True
+        self.__stopped = False
+        self.__orderBookUpdateEvent = observer.Event()
+
+    def getCurrentDateTime(self):
+        return wsclient.get_current_datetime()
+
+    def enableReconection(self, enableReconnection):
+        self.__enableReconnection = enableReconnection
+
+    def _isReconnectionEnabled(self):
+        return self.__enableReconnection
+
+    def _getDispatcher(self):
+        return self.__dispatcher
+
+    def _isStopped(self):
+        return self.__stopped
+
+    def _setStopped(self):
+        self.__stopped = True
+
+    # Returns True if the event was processed.
+    def _processEvent(self, eventType, eventData):
+        ret = True
+        if eventType == wsclient.WebSocketClient.Event.TRADE:
+            self.__onTrade(eventData)
+        elif eventType == wsclient.WebSocketClient.Event.ORDER_BOOK_UPDATE:
+            self.__orderBookUpdateEvent.emit(eventData)
+        elif eventType == wsclient.WebSocketClient.Event.CONNECTED:
+            self._onConnected()
+        elif eventType == wsclient.WebSocketClient.Event.DISCONNECTED:
+            self._onDisconnected()
+        else:
+            ret = False
+            common.logger.error("Invalid event received to dispatch: %s - %s" % (eventType, eventData))
+        return ret
+
+    # Process the events received from the websocket client, and return True if any was processed.
+    def _dispatchEvents(self):
+        raise NotImplementedError()
+
+    def _onConnected(self):
+        pass
+
+    def _onDisconnected(self):
+        pass
+
+    # Bar datetimes should not duplicate. In case trade object datetimes conflict, we just move one slightly forward.
+    def __getTradeDateTime(self, trade):
+        ret = trade.getDateTime()
+        if ret == self.__prevTradeDateTime:
+            ret += datetime.timedelta(microseconds=1)
+        self.__prevTradeDateTime = ret
+        return ret
+
+    def __onTrade(self, trade):
+        # Build a bar for each trade.
+        barDict = {
+            common.btc_symbol: TradeBar(self.__getTradeDateTime(trade), trade)
+            }
+        self.__barDicts.append(barDict)
+
+    def barsHaveAdjClose(self):
+        return False
+
+    def getNextBars(self):
+        ret = None
+        if len(self.__barDicts):
+            ret = bar.Bars(self.__barDicts.pop(0))
+        return ret
+
+    def peekDateTime(self):
+        # Return None since this is a realtime subject.
+        return None
+
+    def dispatch(self):
+        # Note that we may return True even if we didn't dispatch any Bar
+        # event.
+        ret = False
+        if self._dispatchEvents():
+            ret = True
+        if super(BaseLiveTradeFeed, self).dispatch():
+            ret = True
+        return ret
+
+    def eof(self):
+        return self.__stopped
+
+    def onDispatcherRegistered(self, dispatcher):
+        super(BaseLiveTradeFeed, self).onDispatcherRegistered(dispatcher)
+        self.__dispatcher = dispatcher
+
+    def getOrderBookUpdateEvent(self):
+        """
+        Returns the event that will be emitted when the orderbook gets updated.
+
+        Eventh handlers should receive one parameter:
+         1. A :class:`pyalgotrade.bitstamp.wsclient.OrderBookUpdate` instance.
+
+        :rtype: :class:`pyalgotrade.observer.Event`.
+        """
+        return self.__orderBookUpdateEvent
+
+
+class LiveTradeFeed(BaseLiveTradeFeed):
 
     """A real-time BarFeed that builds bars from live trades.
 
@@ -110,26 +225,15 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
     QUEUE_TIMEOUT = 0.01
 
     def __init__(self, maxLen=None):
-        super(LiveTradeFeed, self).__init__(bar.Frequency.TRADE, maxLen)
-        self.__barDicts = []
-        self.registerInstrument(common.btc_symbol)
-        self.__prevTradeDateTime = None
+        super(LiveTradeFeed, self).__init__(maxLen)
         self.__thread = None
+        self.__eventDriven = False
         self.__wsClientConnected = False
-        self.__enableReconnection = True
-        self.__stopped = False
-        self.__orderBookUpdateEvent = observer.Event()
 
     # Factory method for testing purposes.
     def buildWebSocketClientThread(self):
         return wsclient.WebSocketClientThread()
 
-    def getCurrentDateTime(self):
-        return wsclient.get_current_datetime()
-
-    def enableReconection(self, enableReconnection):
-        self.__enableReconnection = enableReconnection
-
     def __initializeClient(self):
         common.logger.info("Initializing websocket client.")
         assert self.__wsClientConnected is False, "Websocket client already connected"
@@ -137,13 +241,14 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         try:
             # Start the thread that runs the client.
             self.__thread = self.buildWebSocketClientThread()
+            self.__bindQueue()
             self.__thread.start()
         except Exception as e:
             common.logger.exception("Error connecting : %s" % str(e))
 
         # Wait for initialization to complete.
         while not self.__wsClientConnected and self.__thread.is_alive():
-            self.__dispatchImpl([wsclient.WebSocketClient.Event.CONNECTED])
+            self.__dispatchImpl([wsclient.WebSocketClient.Event.CONNECTED], True)
 
         if self.__wsClientConnected:
             common.logger.info("Initialization ok.")
@@ -151,72 +256,43 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
             common.logger.error("Initialization failed.")
         return self.__wsClientConnected
 
-    def __onConnected(self):
+    # If the thread's queue can wake up the dispatcher we don't need to block while dispatching.
+    def __bindQueue(self):
+        threadQueue = self.__thread.getQueue()
+        dispatcher_ = self._getDispatcher()
+        self.__eventDriven = dispatcher_ is not None and isinstance(threadQueue, dispatcher.WakeUpQueue)
+        if self.__eventDriven:
+            threadQueue.setDispatcher(dispatcher_)
+
+    def _onConnected(self):
         self.__wsClientConnected = True
 
-    def __onDisconnected(self):
+    def _onDisconnected(self):
         self.__wsClientConnected = False
 
-        if self.__enableReconnection:
+        if self._isReconnectionEnabled():
             initialized = False
-            while not self.__stopped and not initialized:
+            while not self._isStopped() and not initialized:
                 common.logger.info("Reconnecting")
                 initialized = self.__initializeClient()
                 if not initialized:
                     time.sleep(5)
         else:
-            self.__stopped = True
+            self._setStopped()
 
-    def __dispatchImpl(self, eventFilter):
+    def __dispatchImpl(self, eventFilter, block):
         ret = False
         try:
-            eventType, eventData = self.__thread.getQueue().get(True, LiveTradeFeed.QUEUE_TIMEOUT)
+            eventType, eventData = self.__thread.getQueue().get(block, LiveTradeFeed.QUEUE_TIMEOUT)
             if eventFilter is not None and eventType not in eventFilter:
                 return False
-
-            ret = True
-            if eventType == wsclient.WebSocketClient.Event.TRADE:
-                self.__onTrade(eventData)
-            elif eventType == wsclient.WebSocketClient.Event.ORDER_BOOK_UPDATE:
-                self.__orderBookUpdateEvent.emit(eventData)
-            elif eventType == wsclient.WebSocketClient.Event.CONNECTED:
-                self.__onConnected()
-            elif eventType == wsclient.WebSocketClient.Event.DISCONNECTED:
-                self.__onDisconnected()
-            else:
-                ret = False
-                common.logger.error("Invalid event received to dispatch: %s - %s" % (eventType, eventData))
+            ret = self._processEvent(eventType, eventData)
         except queue.Empty:
             pass
         return ret
 
-    # Bar datetimes should not duplicate. In case trade object datetimes conflict, we just move one slightly forward.
-    def __getTradeDateTime(self, trade):
-        ret = trade.getDateTime()
-        if ret == self.__prevTradeDateTime:
-            ret += datetime.timedelta(microseconds=1)
-        self.__prevTradeDateTime = ret
-        return ret
-
-    def __onTrade(self, trade):
-        # Build a bar for each trade.
-        barDict = {
-            common.btc_symbol: TradeBar(self.__getTradeDateTime(trade), trade)
-            }
-        self.__barDicts.append(barDict)
-
-    def barsHaveAdjClose(self):
-        return False
-
-    def getNextBars(self):
-        ret = None
-        if len(self.__barDicts):
-            ret = bar.Bars(self.__barDicts.pop(0))
-        return ret
-
-    def peekDateTime(self):
-        # Return None since this is a realtime subject.
-        return None
+    def _dispatchEvents(self):
+        return self.__dispatchImpl(None, not self.__eventDriven)
 
     # This may raise.
     def start(self):
@@ -224,23 +300,13 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         if self.__thread is not None:
             raise Exception("Already running")
         elif not self.__initializeClient():
-            self.__stopped = True
+            self._setStopped()
             raise Exception("Initialization failed")
 
-    def dispatch(self):
-        # Note that we may return True even if we didn't dispatch any Bar
-        # event.
-        ret = False
-        if self.__dispatchImpl(None):
-            ret = True
-        if super(LiveTradeFeed, self).dispatch():
-            ret = True
-        return ret
-
     # This should not raise.
     def stop(self):
         try:
-            self.__stopped = True
+            self._setStopped()
             if self.__thread is not None and self.__thread.is_alive():
                 common.logger.info("Shutting down websocket client.")
                 self.__thread.stop()
@@ -252,16 +318,128 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         if self.__thread is not None:
             self.__thread.join()
 
-    def eof(self):
-        return self.__stopped
+    def notifiesDispatcher(self):
+        return self.__eventDriven
 
-    def getOrderBookUpdateEvent(self):
-        """
-        Returns the event that will be emitted when the orderbook gets updated.
 
-        Eventh handlers should receive one parameter:
-         1. A :class:`pyalgotrade.bitstamp.wsclient.OrderBookUpdate` instance.
+class AsyncLiveTradeFeed(BaseLiveTradeFeed):
+    """A real-time BarFeed that builds bars from live trades, just like :class:`LiveTradeFeed`, but running on the
+    dispatcher's asyncio event loop instead of in a thread of its own, so trades get dispatched as soon as they are
+    received. This requires Python 3.
 
-        :rtype: :class:`pyalgotrade.observer.Event`.
-        """
-        return self.__orderBookUpdateEvent
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        Note that a Bar will be created for every trade, so open, high, low and close values will all be the same.
+    """
+
+    RECONNECT_WAIT = 5
+
+    def __init__(self, maxLen=None):
+        super(AsyncLiveTradeFeed, self).__init__(maxLen)
+        self.__queue = dispatcher.WakeUpQueue()
+        self.__wsClient = None
+        self.__runFuture = None
+
+    # Factory method for testing purposes.
+    def buildWebSocketClient(self, eventQueue):
+        return wsclient.AsyncWebSocketClient(eventQueue)
+
+    # Returns the connected client, or None if the connection failed.
+    @tornado.gen.coroutine
+    def __connect(self):
+        common.logger.info("Initializing websocket client.")
+        ret = None
+        try:
+            wsClient = self.buildWebSocketClient(self.__queue)
+            yield wsClient.connect()
+            self.__wsClient = ret = wsClient
+            common.logger.info("Initialization ok.")
+            if self._isStopped():
+                wsClient.stopClient()
+        except Exception as e:
+            common.logger.error("Initialization failed: %s" % (e))
+        raise tornado.gen.Return(ret)
+
+    # Process messages until the connection is closed, and reconnect if necessary.
+    @tornado.gen.coroutine
+    def __run(self, wsClient):
+        while wsClient is not None:
+            try:
+                yield wsClient.startClient()
+            except Exception as e:
+                common.logger.error("Error running websocket client: %s" % (e))
+                wsClient.stopClient()
+
+            wsClient = None
+            while wsClient is None and self._isReconnectionEnabled() and not self._isStopped():
+                common.logger.info("Reconnecting")
+                wsClient = yield self.__connect()
+                if wsClient is None:
+                    yield tornado.gen.sleep(AsyncLiveTradeFeed.RECONNECT_WAIT)
+
+        self._setStopped()
+        if self._getDispatcher() is not None:
+            self._getDispatcher().wakeUp()
+
+    # Connection events are handled in __run, so they are processed by the base class as no-ops.
+    def _dispatchEvents(self):
+        ret = False
+        try:
+            eventType, eventData = self.__queue.get(False)
+            ret = self._processEvent(eventType, eventData)
+        except queue.Empty:
+            pass
+        return ret
+
+    def runsOnEventLoop(self):
+        return True
+
+    def notifiesDispatcher(self):
+        return True
+
+    def onDispatcherRegistered(self, dispatcher):
+        super(AsyncLiveTradeFeed, self).onDispatcherRegistered(dispatcher)
+        self.__queue.setDispatcher(dispatcher)
+
+    def start(self):
+        raise Exception("This feed has to be started using startAsync")
+
+    # This may raise.
+    @tornado.gen.coroutine
+    def startAsync(self):
+        if self.__runFuture is not None:
+            raise Exception("Already running")
+
+        # The websocket connection is established asynchronously, so this doesn't block the event loop.
+        wsClient = yield self.__connect()
+        if wsClient is None:
+            self._setStopped()
+            raise Exception("Initialization failed")
+        self.__runFuture = self.__run(wsClient)
+
+    # This should not raise.
+    def stop(self):
+        try:
+            self._setStopped()
+            if self.__wsClient is not None:
+                common.logger.info("Shutting down websocket client.")
+                self.__wsClient.stopClient()
+        except Exception as e:
+            common.logger.error("Error shutting down client: %s" % (str(e)))
+
+    def join(self):
+        pass
+
+    # This should not raise.
+    @tornado.gen.coroutine
+    def joinAsync(self):
+        if self.__runFuture is not None:
+            yield self.__runFuture
+
+    def eof(self):
+        # Events received before the connection was closed still need to be dispatched.
+        return super(AsyncLiveTradeFeed, self).eof() and self.__queue.empty()
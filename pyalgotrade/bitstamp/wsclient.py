@@ -20,8 +20,7 @@
 
 import datetime
 
-from six.moves import queue
-
+from pyalgotrade import dispatcher
 from pyalgotrade.websocket import pusher
 from pyalgotrade.websocket import client
 from pyalgotrade.bitstamp import common
@@ -93,12 +92,8 @@ class OrderBookUpdate(pusher.Event):
         return [float(ask[1]) for ask in self.getData()["asks"]]
 
 
-class WebSocketClient(pusher.WebSocketClient):
-    """
-    This websocket client class is designed to be running in a separate thread and for that reason
-    events are pushed into a queue.
-    """
-
+# Bitstamp protocol handling. Events are pushed into a queue.
+class WebSocketClientMixin(object):
     PUSHER_APP_KEY = "de504dc5763aeef9ff52"
 
     class Event:
@@ -108,7 +103,7 @@ class WebSocketClient(pusher.WebSocketClient):
         DISCONNECTED = 4
 
     def __init__(self, queue):
-        super(WebSocketClient, self).__init__(WebSocketClient.PUSHER_APP_KEY, 5)
+        super(WebSocketClientMixin, self).__init__(WebSocketClientMixin.PUSHER_APP_KEY, 5)
         self.__queue = queue
 
     def onMessage(self, msg):
@@ -119,14 +114,14 @@ class WebSocketClient(pusher.WebSocketClient):
         elif event == "data" and msg.get("channel") == "order_book":
             self.onOrderBookUpdate(OrderBookUpdate(get_current_datetime(), msg))
         else:
-            super(WebSocketClient, self).onMessage(msg)
+            super(WebSocketClientMixin, self).onMessage(msg)
 
     ######################################################################
     # WebSocketClientBase events.
 
     def onClosed(self, code, reason):
         common.logger.info("Closed. Code: %s. Reason: %s." % (code, reason))
-        self.__queue.put((WebSocketClient.Event.DISCONNECTED, None))
+        self.__queue.put((WebSocketClientMixin.Event.DISCONNECTED, None))
 
     def onDisconnectionDetected(self):
         common.logger.warning("Disconnection detected.")
@@ -134,14 +129,14 @@ class WebSocketClient(pusher.WebSocketClient):
             self.stopClient()
         except Exception as e:
             common.logger.error("Error stopping websocket client: %s." % (str(e)))
-        self.__queue.put((WebSocketClient.Event.DISCONNECTED, None))
+        self.__queue.put((WebSocketClientMixin.Event.DISCONNECTED, None))
 
     ######################################################################
     # Pusher specific events.
 
     def onConnectionEstablished(self, event):
         common.logger.info("Connection established.")
-        self.__queue.put((WebSocketClient.Event.CONNECTED, None))
+        self.__queue.put((WebSocketClientMixin.Event.CONNECTED, None))
 
         channels = ["live_trades", "order_book"]
         common.logger.info("Subscribing to channels %s." % channels)
@@ -158,10 +153,24 @@ class WebSocketClient(pusher.WebSocketClient):
     # Bitstamp specific
 
     def onTrade(self, trade):
-        self.__queue.put((WebSocketClient.Event.TRADE, trade))
+        self.__queue.put((WebSocketClientMixin.Event.TRADE, trade))
 
     def onOrderBookUpdate(self, orderBookUpdate):
-        self.__queue.put((WebSocketClient.Event.ORDER_BOOK_UPDATE, orderBookUpdate))
+        self.__queue.put((WebSocketClientMixin.Event.ORDER_BOOK_UPDATE, orderBookUpdate))
+
+
+class WebSocketClient(WebSocketClientMixin, pusher.WebSocketClient):
+    """
+    This websocket client class is designed to be running in a separate thread and for that reason
+    events are pushed into a queue.
+    """
+
+
+class AsyncWebSocketClient(WebSocketClientMixin, pusher.AsyncWebSocketClient):
+    """
+    This websocket client class is designed to be running on the dispatcher's event loop.
+    Events are pushed into a queue as soon as they are decoded.
+    """
 
 
 class WebSocketClientThread(client.WebSocketClientThreadBase):
@@ -171,7 +180,7 @@ class WebSocketClientThread(client.WebSocketClientThreadBase):
 
     def __init__(self):
         super(WebSocketClientThread, self).__init__()
-        self.__queue = queue.Queue()
+        self.__queue = dispatcher.WakeUpQueue()
         self.__wsClient = None
 
     def getQueue(self):
@@ -560,6 +560,19 @@ class Broker(observer.Subject):
         """
         raise NotImplementedError()
 
+    def submitOrders(self, orders):
+        """Submits multiple orders, in the given order. Brokers that support it may submit them using a single request.
+
+        :param orders: The orders to submit.
+        :type orders: list of :class:`Order`.
+
+        .. note::
+            * Order events are notified one at a time, just like when calling submitOrder for each order.
+        """
+
+        for order in orders:
+            self.submitOrder(order)
+
     @abc.abstractmethod
     def createMarketOrder(self, action, instrument, quantity, onClose=False):
         """Creates a Market order.
@@ -19,6 +19,7 @@
 """
 
 import abc
+import bisect
 
 import six
 
@@ -165,6 +166,131 @@ class StopLimitOrder(broker.StopLimitOrder, BacktestingOrder):
         return broker_.getFillStrategy().fillStopLimitOrder(broker_, self, bar_)
 
 
+######################################################################
+# Order book
+
+# Returns the index in OrderBook where a resting order should be kept, and its trigger price, or None if the order
+# has to be processed on every bar.
+def get_resting_order_key(order):
+    # Orders that are not GTC may expire, and submitted orders have to be accepted.
+    if not order.getGoodTillCanceled() or not (order.isAccepted() or order.isPartiallyFilled()):
+        return None
+
+    ret = None
+    if isinstance(order, StopLimitOrder):
+        # Once the stop price is hit, this behaves like a limit order.
+        if order.getStopHit():
+            ret = (OrderBook.LIMIT, order.getLimitPrice())
+        else:
+            ret = (OrderBook.STOP, order.getStopPrice())
+    elif isinstance(order, StopOrder):
+        # Once the stop price is hit, this behaves like a market order.
+        if not order.getStopHit():
+            ret = (OrderBook.STOP, order.getStopPrice())
+    elif isinstance(order, LimitOrder):
+        ret = (OrderBook.LIMIT, order.getLimitPrice())
+
+    if ret is not None:
+        ret = (ret[0] + (OrderBook.BUY if order.isBuy() else OrderBook.SELL), ret[1])
+    return ret
+
+
+# Order ids sorted by price.
+class PriceIndex(object):
+    def __init__(self):
+        self.__prices = []
+        self.__orderIds = []
+
+    def add(self, price, orderId):
+        pos = bisect.bisect_right(self.__prices, price)
+        self.__prices.insert(pos, price)
+        self.__orderIds.insert(pos, orderId)
+
+    def remove(self, price, orderId):
+        begin = bisect.bisect_left(self.__prices, price)
+        end = bisect.bisect_right(self.__prices, price)
+        pos = begin + self.__orderIds[begin:end].index(orderId)
+        del self.__prices[pos]
+        del self.__orderIds[pos]
+
+    # Returns the ids for orders with a price <= price.
+    def getAtOrBelow(self, price):
+        return self.__orderIds[:bisect.bisect_right(self.__prices, price)]
+
+    # Returns the ids for orders with a price >= price.
+    def getAtOrAbove(self, price):
+        return self.__orderIds[bisect.bisect_left(self.__prices, price):]
+
+
+# The active orders for an instrument.
+# GTC limit and stop orders that were already accepted are kept sorted by trigger price, by side, so that the ones that
+# can be filled with a bar can be found using bisection. The rest of the orders are processed on every bar.
+class OrderBook(object):
+    LIMIT = 0
+    STOP = 2
+    BUY = 0
+    SELL = 1
+
+    def __init__(self):
+        self.__orders = {}
+        self.__unindexed = {}
+        # Map order ids to their key in the indexes.
+        self.__keys = {}
+        self.__indexes = [PriceIndex() for _ in range(4)]
+
+    def isEmpty(self):
+        return len(self.__orders) == 0
+
+    def getOrders(self):
+        return list(self.__orders.values())
+
+    def add(self, order):
+        self.__orders[order.getId()] = order
+        self.__unindexed[order.getId()] = order
+
+    def remove(self, order):
+        orderId = order.getId()
+        del self.__orders[orderId]
+        key = self.__keys.pop(orderId, None)
+        if key is None:
+            del self.__unindexed[orderId]
+        else:
+            self.__indexes[key[0]].remove(key[1], orderId)
+
+    # Moves an order to the right place after its state changed.
+    def update(self, order):
+        orderId = order.getId()
+        oldKey = self.__keys.get(orderId)
+        newKey = get_resting_order_key(order)
+        if oldKey == newKey:
+            return
+
+        if oldKey is None:
+            del self.__unindexed[orderId]
+        else:
+            del self.__keys[orderId]
+            self.__indexes[oldKey[0]].remove(oldKey[1], orderId)
+
+        if newKey is None:
+            self.__unindexed[orderId] = order
+        else:
+            self.__keys[orderId] = newKey
+            self.__indexes[newKey[0]].add(newKey[1], orderId)
+
+    # Returns the orders that have to be processed with a bar, skipping resting orders that can't be triggered.
+    def getOrdersToProcess(self, bar_, useAdjustedValues):
+        low = bar_.getLow(useAdjustedValues)
+        high = bar_.getHigh(useAdjustedValues)
+        ret = list(self.__unindexed.values())
+        # Check get_limit_price_trigger and get_stop_price_trigger in fillstrategy for the conditions.
+        orderIds = self.__indexes[OrderBook.LIMIT + OrderBook.BUY].getAtOrAbove(low)
+        orderIds += self.__indexes[OrderBook.LIMIT + OrderBook.SELL].getAtOrBelow(high)
+        orderIds += self.__indexes[OrderBook.STOP + OrderBook.BUY].getAtOrBelow(high)
+        orderIds += self.__indexes[OrderBook.STOP + OrderBook.SELL].getAtOrAbove(low)
+        ret.extend(self.__orders[orderId] for orderId in orderIds)
+        return ret
+
+
 ######################################################################
 # Broker
 
@@ -192,7 +318,14 @@ class Broker(broker.Broker):
             self.__commission = commission
         self.__shares = {}
         self.__instrumentPrice = {}  # Used by setShares
+        # The value of each position, and the running total, updated as bars arrive and shares change.
+        self.__positionValues = {}
+        self.__positionsValue = 0
+        # The last bars used to value positions.
+        self.__valuedBars = None
         self.__activeOrders = {}
+        # Active orders indexed by instrument, so that processing bars only visits the orders that can be affected.
+        self.__orderBooks = {}
         self.__useAdjustedValues = False
         self.__fillStrategy = fillstrategy.DefaultStrategy()
         self.__logger = logger.getLogger(Broker.LOGGER_NAME)
@@ -219,11 +352,20 @@ class Broker(broker.Broker):
         assert(order.getId() not in self.__activeOrders)
         assert(order.getId() is not None)
         self.__activeOrders[order.getId()] = order
+        orderBook = self.__orderBooks.get(order.getInstrument())
+        if orderBook is None:
+            orderBook = OrderBook()
+            self.__orderBooks[order.getInstrument()] = orderBook
+        orderBook.add(order)
 
     def _unregisterOrder(self, order):
         assert(order.getId() in self.__activeOrders)
         assert(order.getId() is not None)
         del self.__activeOrders[order.getId()]
+        orderBook = self.__orderBooks[order.getInstrument()]
+        orderBook.remove(order)
+        if orderBook.isEmpty():
+            del self.__orderBooks[order.getInstrument()]
 
     def getLogger(self):
         return self.__logger
@@ -281,7 +423,8 @@ class Broker(broker.Broker):
         if instrument is None:
             ret = list(self.__activeOrders.values())
         else:
-            ret = [order for order in self.__activeOrders.values() if order.getInstrument() == instrument]
+            orderBook = self.__orderBooks.get(instrument)
+            ret = [] if orderBook is None else orderBook.getOrders()
         return ret
 
     def _getCurrentDateTime(self):
@@ -305,6 +448,7 @@ class Broker(broker.Broker):
         assert not self.__started, "Can't setShares once the strategy started executing"
         self.__shares[instrument] = quantity
         self.__instrumentPrice[instrument] = price
+        self.__revaluePosition(instrument, self._getPriceForInstrument(instrument))
 
     def getPositions(self):
         return self.__shares
@@ -325,15 +469,45 @@ class Broker(broker.Broker):
 
         return ret
 
+    # Updates the value of a position and the running total. Called when shares change or a new bar arrives.
+    def __revaluePosition(self, instrument, price):
+        oldValue = self.__positionValues.pop(instrument, 0)
+        shares = self.__shares.get(instrument, 0)
+        if shares != 0:
+            assert price is not None, "Price for %s is missing" % instrument
+            newValue = price * shares
+            self.__positionValues[instrument] = newValue
+            self.__positionsValue += newValue - oldValue
+        elif len(self.__positionValues):
+            self.__positionsValue -= oldValue
+        else:
+            # Start from scratch once there are no positions so that rounding errors don't build up.
+            self.__positionsValue = 0
+
+    # Revalues the positions for the instruments that got a bar.
+    def __revaluePositions(self, bars):
+        if bars is self.__valuedBars:
+            return
+        self.__valuedBars = bars
+
+        if len(self.__shares) < len(bars.getInstruments()):
+            for instrument in self.__shares:
+                bar_ = bars.getBar(instrument)
+                if bar_ is not None:
+                    self.__revaluePosition(instrument, bar_.getPrice())
+        else:
+            for instrument in bars.getInstruments():
+                if instrument in self.__shares:
+                    self.__revaluePosition(instrument, bars.getBar(instrument).getPrice())
+
     def getEquity(self):
         """Returns the portfolio value (cash + shares * price)."""
 
-        ret = self.getCash()
-        for instrument, shares in six.iteritems(self.__shares):
-            instrumentPrice = self._getPriceForInstrument(instrument)
-            assert instrumentPrice is not None, "Price for %s is missing" % instrument
-            ret += instrumentPrice * shares
-        return ret
+        # Positions get revalued in onBars, but this may be called by someone that got the bars first.
+        bars = self.__barFeed.getCurrentBars()
+        if bars is not None:
+            self.__revaluePositions(bars)
+        return self.getCash() + self.__positionsValue
 
     # Tries to commit an order execution.
     def commitOrderExecution(self, order, dateTime, fillInfo):
@@ -372,6 +546,7 @@ class Broker(broker.Broker):
                 del self.__shares[order.getInstrument()]
             else:
                 self.__shares[order.getInstrument()] = updatedShares
+            self.__revaluePosition(order.getInstrument(), self._getPriceForInstrument(order.getInstrument()))
 
             # Let the strategy know that the order was filled.
             self.__fillStrategy.onOrderFilled(self, order)
@@ -403,6 +578,12 @@ class Broker(broker.Broker):
         else:
             raise Exception("The order was already processed")
 
+    def submitOrders(self, orders):
+        # Check all the orders before submitting any of them.
+        if len(set(id(order) for order in orders)) != len(orders) or not all(order.isInitial() for order in orders):
+            raise Exception("The order was already processed")
+        super(Broker, self).submitOrders(orders)
+
     # Return True if further processing is needed.
     def __preProcessOrder(self, order, bar_):
         ret = True
@@ -467,16 +648,43 @@ class Broker(broker.Broker):
                 assert(order not in self.__activeOrders)
 
     def onBars(self, dateTime, bars):
+        # Only the positions for the instruments that got a bar change value.
+        self.__revaluePositions(bars)
+
         # Let the fill strategy know that new bars are being processed.
         self.__fillStrategy.onBars(self, bars)
 
         # This is to froze the orders that will be processed in this event, to avoid new getting orders introduced
         # and processed on this very same event.
-        ordersToProcess = list(self.__activeOrders.values())
+        # Only orders for instruments with a bar get processed, so there is no need to look at the rest.
+        if len(self.__orderBooks) < len(bars.getInstruments()):
+            orderBooks = [
+                (orderBook, bars.getBar(instrument)) for instrument, orderBook in six.iteritems(self.__orderBooks)
+                if bars.getBar(instrument) is not None
+            ]
+        else:
+            orderBooks = [
+                (self.__orderBooks[instrument], bars.getBar(instrument)) for instrument in bars.getInstruments()
+                if instrument in self.__orderBooks
+            ]
+        ordersToProcess = []
+        skipUntriggered = self.__fillStrategy.onlyFillsTriggeredOrders()
+        for orderBook, bar_ in orderBooks:
+            if skipUntriggered:
+                ordersToProcess.extend(orderBook.getOrdersToProcess(bar_, self.getUseAdjustedValues()))
+            else:
+                ordersToProcess.extend(orderBook.getOrders())
+        # Order ids are assigned on submission, so this processes orders in the order they were submitted, regardless
+        # of the instrument. This matters when orders compete for cash.
+        if len(ordersToProcess) > 1:
+            ordersToProcess.sort(key=lambda order: order.getId())
 
         for order in ordersToProcess:
             # This may trigger orders to be added/removed from __activeOrders.
             self.__onBarsImpl(order, bars)
+            # Resting orders may have to be moved in the order book, for example when the stop price gets hit.
+            if order.isActive():
+                self.__orderBooks[order.getInstrument()].update(order)
 
     def start(self):
         super(Broker, self).start()
@@ -500,6 +708,10 @@ class Broker(broker.Broker):
     def peekDateTime(self):
         return None
 
+    def notifiesDispatcher(self):
+        # We have no events of our own, so the dispatcher doesn't need to poll us.
+        return True
+
     def createMarketOrder(self, action, instrument, quantity, onClose=False):
         # In order to properly support market-on-close with intraday feeds I'd need to know about different
         # exchange/market trading hours and support specifying routing an order to a specific exchange/market.
@@ -130,6 +130,15 @@ class FillStrategy(object):
         """
         pass
 
+    def onlyFillsTriggeredOrders(self):
+        """
+        Override (optional) to return True if limit and stop orders can't be filled, and their state doesn't change,
+        unless the limit or stop price was penetrated as described by :class:`DefaultStrategy`.
+        The broker can then skip GTC limit and stop orders with prices out of the bar range without calling
+        the fill methods for them. Returns False by default.
+        """
+        return False
+
     @abc.abstractmethod
     def fillMarketOrder(self, broker_, order, bar):
         """Override to return the fill price and quantity for a market order or None if the order can't be filled
@@ -229,36 +238,68 @@ class DefaultStrategy(FillStrategy):
         * If using trade bars, then all the volume from that bar can be used.
     """
 
+    # Methods that subclasses can override to change whether a limit or stop order gets filled.
+    TRIGGER_DEPENDENT_METHODS = ["onBars", "onOrderFilled", "fillLimitOrder", "fillStopOrder", "fillStopLimitOrder"]
+
     def __init__(self, volumeLimit=0.25):
         super(DefaultStrategy, self).__init__()
+        self.__bars = None
+        # Instruments whose volume was already reset for the current bars.
+        self.__volumeReset = set()
         self.__volumeLeft = {}
         self.__volumeUsed = {}
         self.setVolumeLimit(volumeLimit)
         self.setSlippageModel(slippage.NoSlippage())
 
     def onBars(self, broker_, bars):
-        volumeLeft = {}
-
-        for instrument in bars.getInstruments():
-            bar = bars[instrument]
-            # Reset the volume available for each instrument.
-            if bar.getFrequency() == pyalgotrade.bar.Frequency.TRADE:
-                volumeLeft[instrument] = bar.getVolume()
-            elif self.__volumeLimit is not None:
-                # We can't round here because there is no order to request the instrument traits.
-                volumeLeft[instrument] = bar.getVolume() * self.__volumeLimit
-            # Reset the volume used for each instrument.
-            self.__volumeUsed[instrument] = 0.0
+        # Volume is reset lazily, the first time an instrument is used with these bars, since most instruments don't
+        # have active orders.
+        self.__bars = bars
+        self.__volumeReset = set()
+        self.__volumeLeft = {}
 
-        self.__volumeLeft = volumeLeft
+    def __resetVolume(self, instrument):
+        if instrument in self.__volumeReset or self.__bars is None:
+            return
+        self.__volumeReset.add(instrument)
+
+        bar = self.__bars.getBar(instrument)
+        if bar is None:
+            return
+        # Reset the volume available for the instrument.
+        if bar.getFrequency() == pyalgotrade.bar.Frequency.TRADE:
+            self.__volumeLeft[instrument] = bar.getVolume()
+        elif self.__volumeLimit is not None:
+            # We can't round here because there is no order to request the instrument traits.
+            self.__volumeLeft[instrument] = bar.getVolume() * self.__volumeLimit
+        # Reset the volume used for the instrument.
+        self.__volumeUsed[instrument] = 0.0
+
+    def __resetAllVolume(self):
+        if self.__bars is not None and len(self.__volumeReset) < len(self.__bars.getInstruments()):
+            for instrument in self.__bars.getInstruments():
+                self.__resetVolume(instrument)
+
+    def onlyFillsTriggeredOrders(self):
+        # Subclasses that change how orders get filled may fill untriggered orders, so they opt out unless they
+        # override this method.
+        cls = type(self)
+        return all(
+            six.get_unbound_function(getattr(cls, name)) is six.get_unbound_function(getattr(DefaultStrategy, name))
+            for name in DefaultStrategy.TRIGGER_DEPENDENT_METHODS
+        )
 
     def getVolumeLeft(self):
+        self.__resetAllVolume()
         return self.__volumeLeft
 
     def getVolumeUsed(self):
+        self.__resetAllVolume()
         return self.__volumeUsed
 
     def onOrderFilled(self, broker_, order):
+        self.__resetVolume(order.getInstrument())
+
         # Update the volume left.
         if self.__volumeLimit is not None:
             # We round the volume left here becuase it was not rounded when it was initialized.
@@ -300,6 +341,7 @@ class DefaultStrategy(FillStrategy):
 
     def __calculateFillSize(self, broker_, order, bar):
         ret = 0
+        self.__resetVolume(order.getInstrument())
 
         # If self.__volumeLimit is None then allow all the order to get filled.
         if self.__volumeLimit is not None:
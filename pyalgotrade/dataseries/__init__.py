@@ -73,9 +73,51 @@ class DataSeries(object):
 
     @abc.abstractmethod
     def getDateTimes(self):
-        """Returns a list of :class:`datetime.datetime` associated with each value."""
+        """Returns a sequence of :class:`datetime.datetime` associated with each value."""
         raise NotImplementedError()
 
+    # Returns a (collections.DateTimeDeque, end) tuple with the datetimes for this dataseries, if any, where end is the
+    # absolute position that follows the datetime for the last value. The deque should not be modified.
+    def _getSharedDateTimes(self):
+        return None
+
+
+# A read-only sequence with the datetimes for the values in a SequenceDataSeries. Datetimes are built when accessed.
+class _DateTimes(object):
+    def __init__(self, dataSeries):
+        self.__dataSeries = dataSeries
+
+    def __len__(self):
+        return len(self.__dataSeries)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in xrange(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if key >= len(self) or key < 0:
+            raise IndexError("Index out of range")
+        return self.__dataSeries._getDateTimeAbsolute(key)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self.__dataSeries._getDateTimeAbsolute(i)
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        if ret is not NotImplemented:
+            ret = not ret
+        return ret
+
+    def __repr__(self):
+        return repr(list(self))
+
 
 class SequenceDataSeries(DataSeries):
     """A DataSeries that holds values in a sequence in memory.
@@ -91,8 +133,18 @@ class SequenceDataSeries(DataSeries):
         maxLen = get_checked_max_len(maxLen)
 
         self.__newValueEvent = observer.Event()
-        self.__values = collections.ListDeque(maxLen)
-        self.__dateTimes = collections.ListDeque(maxLen)
+        self.__values = self._buildValues(maxLen)
+        # The deque has an extra slot so that dataseries reading the datetimes from this one (check _shareDateTimes)
+        # can still read theirs after this one appends a new datetime, and before they do.
+        self.__dateTimes = collections.DateTimeDeque(maxLen + 1)
+        # The absolute position, in self.__dateTimes, that follows the datetime for the last value.
+        self.__dateTimesEnd = 0
+        # True if self.__dateTimes belongs to another dataseries.
+        self.__dateTimesShared = False
+
+    # Builds the container used to hold the values.
+    def _buildValues(self, maxLen):
+        return collections.ListDeque(maxLen)
 
     def __len__(self):
         return len(self.__values)
@@ -103,7 +155,39 @@ class SequenceDataSeries(DataSeries):
     def setMaxLen(self, maxLen):
         """Sets the maximum number of values to hold and resizes accordingly if necessary."""
         self.__values.resize(maxLen)
-        self.__dateTimes.resize(maxLen)
+        if self.__dateTimesShared:
+            if self.__dateTimes.getMaxLen() < maxLen + 1:
+                self.__copyDateTimes()
+        elif self.__dateTimes.getMaxLen() < maxLen + 1:
+            self.__dateTimes.resize(maxLen + 1)
+        elif self.__dateTimes.getMaxLen() > maxLen + 1:
+            # Other dataseries may be reading these datetimes, so they are not dropped from the deque.
+            self.__copyDateTimes()
+
+    def _getSharedDateTimes(self):
+        return self.__dateTimes, self.__dateTimesEnd
+
+    def _shareDateTimes(self, dataSeries):
+        # Read the datetimes from a dataseries that this one will get its values appended in lockstep with, like the
+        # one being filtered. Once a datetime doesn't match, this dataseries will get a copy of its datetimes.
+        sharedDateTimes = dataSeries._getSharedDateTimes()
+        if sharedDateTimes is not None and len(self.__values) == 0 and \
+                sharedDateTimes[0].getMaxLen() >= self.getMaxLen() + 1:
+            self.__dateTimes, self.__dateTimesEnd = sharedDateTimes
+            self.__dateTimesShared = True
+
+    # Stops reading the datetimes from another dataseries. This should be called before that dataseries appends a
+    # datetime that this one won't.
+    def _unshareDateTimes(self):
+        if self.__dateTimesShared:
+            self.__copyDateTimes()
+
+    # Uses a copy of the datetimes for the current values.
+    def __copyDateTimes(self):
+        maxLen = self.getMaxLen() + 1
+        self.__dateTimes = self.__dateTimes.copy(self.__dateTimesEnd - len(self.__values), self.__dateTimesEnd, maxLen)
+        self.__dateTimesEnd = self.__dateTimes.getCount()
+        self.__dateTimesShared = False
 
     def getMaxLen(self):
         """Returns the maximum number of values to hold."""
@@ -134,14 +218,79 @@ class SequenceDataSeries(DataSeries):
             If dateTime is not None, it must be greater than the last one.
         """
 
-        if dateTime is not None and len(self.__dateTimes) != 0 and self.__dateTimes[-1] >= dateTime:
-            raise Exception("Invalid datetime. It must be bigger than that last one")
+        dateTimes = self.__dateTimes
+        if self.__dateTimesShared and (self.__dateTimesEnd != dateTimes.getCount() - 1 or dateTime is not dateTimes.getLast()):
+            self.__copyDateTimes()
+            dateTimes = self.__dateTimes
+
+        if self.__dateTimesShared:
+            # The dataseries the datetimes belong to already appended (and checked) this one.
+            self.__dateTimesEnd += 1
+        else:
+            dateTimeValue = dateTimes.toValue(dateTime)
+            if dateTime is not None and len(self.__values) != 0 and dateTimes.getValue(self.__dateTimesEnd - 1) >= dateTimeValue:
+                raise Exception("Invalid datetime. It must be bigger than that last one")
+            dateTimes.append(dateTimeValue, dateTime)
+            self.__dateTimesEnd += 1
 
-        assert(len(self.__values) == len(self.__dateTimes))
-        self.__dateTimes.append(dateTime)
         self.__values.append(value)
 
         self.getNewValueEvent().emit(self, dateTime, value)
 
+    def _getDateTimeAbsolute(self, pos):
+        return self.__dateTimes.getDateTime(self.__dateTimesEnd - len(self.__values) + pos)
+
     def getDateTimes(self):
-        return self.__dateTimes.data()
+        """Returns a sequence with the :class:`datetime.datetime` associated with each value.
+        Datetimes are not copied, so the sequence reflects values appended after this call."""
+        return _DateTimes(self)
+
+
+def nan_to_none(value):
+    if value != value:
+        return None
+    return float(value)
+
+
+class FloatDataSeries(SequenceDataSeries):
+    """A :class:`SequenceDataSeries` that holds float values in a numpy.array.
+
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        None values are stored as NaN, and NaN values are returned as None.
+    """
+
+    def _buildValues(self, maxLen):
+        self.__values = collections.NumPyDeque(maxLen, float)
+        return self.__values
+
+    def __getitem__(self, key):
+        ret = self.__values[key]
+        if isinstance(key, slice):
+            ret = [nan_to_none(value) for value in ret.tolist()]
+        else:
+            ret = nan_to_none(ret)
+        return ret
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__values):
+            ret = nan_to_none(self.__values[pos])
+        return ret
+
+    def asarray(self, lastN=None):
+        """Returns a numpy.array with the values, or with the last lastN values if lastN is not None.
+        None values are returned as NaN.
+
+        .. note::
+            The array is a view of the underlying storage, so it should not be modified and it is only valid until
+            the next value gets appended.
+        """
+        ret = self.__values.data()
+        if lastN is not None and lastN < len(ret):
+            ret = ret[len(ret) - lastN:]
+        return ret
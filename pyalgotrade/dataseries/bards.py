@@ -19,10 +19,92 @@
 """
 
 from pyalgotrade import dataseries
+from pyalgotrade import observer
+from pyalgotrade.utils import collections
 
 import six
 
 
+# Returns the values for the columns in a BarDataSeries.
+def get_column_values(bar):
+    return (bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose())
+
+
+class BarColumnDataSeries(dataseries.DataSeries):
+    """A DataSeries with the values for one of the columns in a :class:`BarDataSeries`.
+    Values are not copied, they are read from the :class:`BarDataSeries`.
+    It supports the same methods as :class:`pyalgotrade.dataseries.SequenceDataSeries`, but values can only be
+    appended through the :class:`BarDataSeries`.
+
+    .. note::
+        This class should not be instantiated directly.
+    """
+
+    def __init__(self, barDataSeries, columns, column):
+        super(BarColumnDataSeries, self).__init__()
+        self.__barDataSeries = barDataSeries
+        self.__columns = columns
+        self.__column = column
+        self.__newValueEvent = observer.Event()
+
+    def __len__(self):
+        return len(self.__columns)
+
+    def __getitem__(self, key):
+        ret = self.__columns.column(self.__column)[key]
+        if isinstance(key, slice):
+            ret = [dataseries.nan_to_none(value) for value in ret.tolist()]
+        else:
+            ret = dataseries.nan_to_none(ret)
+        return ret
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__columns):
+            ret = dataseries.nan_to_none(self.__columns.column(self.__column)[pos])
+        return ret
+
+    def getDateTimes(self):
+        return self.__barDataSeries.getDateTimes()
+
+    def _getSharedDateTimes(self):
+        return self.__barDataSeries._getSharedDateTimes()
+
+    def getMaxLen(self):
+        """Returns the maximum number of values to hold."""
+        return self.__barDataSeries.getMaxLen()
+
+    def setMaxLen(self, maxLen):
+        """Sets the maximum number of values to hold in the :class:`BarDataSeries`, and in all its columns."""
+        self.__barDataSeries.setMaxLen(maxLen)
+
+    # Event handler receives:
+    # 1: Dataseries generating the event
+    # 2: The datetime for the new value
+    # 3: The new value
+    def getNewValueEvent(self):
+        return self.__newValueEvent
+
+    def append(self, value):
+        self.appendWithDateTime(None, value)
+
+    def appendWithDateTime(self, dateTime, value):
+        raise Exception("Values can't be appended to a BarDataSeries column. Append bars to the BarDataSeries instead")
+
+    def asarray(self, lastN=None):
+        """Returns a numpy.array with the values, or with the last lastN values if lastN is not None.
+        None values are returned as NaN.
+
+        .. note::
+            The array is a view of the underlying storage, so it should not be modified and it is only valid until
+            the next value gets appended.
+        """
+        ret = self.__columns.column(self.__column)
+        if lastN is not None and lastN < len(ret):
+            ret = ret[len(ret) - lastN:]
+        return ret
+
+
 class BarDataSeries(dataseries.SequenceDataSeries):
     """A DataSeries of :class:`pyalgotrade.bar.Bar` instances.
 
@@ -30,26 +112,58 @@ class BarDataSeries(dataseries.SequenceDataSeries):
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
         opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
     :type maxLen: int.
+
+    .. note::
+        Open, high, low, close, volume and adjusted close values are stored column by column, and the dataseries
+        returned by getOpenDataSeries, getCloseDataSeries, etc. are views on those columns. Those dataseries only emit
+        new value events if there are subscribers.
+        Columns, and dataseries for extra columns, are not built until they're first requested. At that point they get
+        filled with the values from the bars being held.
     """
 
+    OPEN = 0
+    HIGH = 1
+    LOW = 2
+    CLOSE = 3
+    VOLUME = 4
+    ADJ_CLOSE = 5
+    # The order in which the column dataseries emit new value events.
+    EVENT_ORDER = (OPEN, CLOSE, HIGH, LOW, VOLUME, ADJ_CLOSE)
+
     def __init__(self, maxLen=None):
         super(BarDataSeries, self).__init__(maxLen)
-        self.__openDS = dataseries.SequenceDataSeries(maxLen)
-        self.__closeDS = dataseries.SequenceDataSeries(maxLen)
-        self.__highDS = dataseries.SequenceDataSeries(maxLen)
-        self.__lowDS = dataseries.SequenceDataSeries(maxLen)
-        self.__volumeDS = dataseries.SequenceDataSeries(maxLen)
-        self.__adjCloseDS = dataseries.SequenceDataSeries(maxLen)
+        self.__columns = None
+        self.__columnDS = None
         self.__extraDS = {}
         self.__useAdjustedValues = False
 
+    def __getColumnDS(self, column):
+        if self.__columnDS is None:
+            self.__columns = collections.NumPyColumnDeque(self.getMaxLen(), 6)
+            for bar in self[:]:
+                self.__columns.append(get_column_values(bar))
+            self.__columnDS = [BarColumnDataSeries(self, self.__columns, i) for i in range(6)]
+        return self.__columnDS[column]
+
     def __getOrCreateExtraDS(self, name):
         ret = self.__extraDS.get(name)
         if ret is None:
             ret = dataseries.SequenceDataSeries(self.getMaxLen())
+            if len(self) == 0:
+                ret._shareDateTimes(self)
+            else:
+                for bar in self[:]:
+                    extraColumns = bar.getExtraColumns()
+                    if name in extraColumns:
+                        ret.appendWithDateTime(bar.getDateTime(), extraColumns[name])
             self.__extraDS[name] = ret
         return ret
 
+    def setMaxLen(self, maxLen):
+        super(BarDataSeries, self).setMaxLen(maxLen)
+        if self.__columns is not None:
+            self.__columns.resize(maxLen)
+
     def setUseAdjustedValues(self, useAdjusted):
         self.__useAdjustedValues = useAdjusted
 
@@ -61,50 +175,60 @@ class BarDataSeries(dataseries.SequenceDataSeries):
         assert(bar is not None)
         bar.setUseAdjustedValue(self.__useAdjustedValues)
 
+        if self.__extraDS:
+            extraColumns = bar.getExtraColumns()
+            for name, extraDS in six.iteritems(self.__extraDS):
+                if name not in extraColumns:
+                    # The dataseries for this column won't get a value for this datetime, so it can't keep reading
+                    # the datetimes from this one.
+                    extraDS._unshareDateTimes()
+
         super(BarDataSeries, self).appendWithDateTime(dateTime, bar)
 
-        self.__openDS.appendWithDateTime(dateTime, bar.getOpen())
-        self.__closeDS.appendWithDateTime(dateTime, bar.getClose())
-        self.__highDS.appendWithDateTime(dateTime, bar.getHigh())
-        self.__lowDS.appendWithDateTime(dateTime, bar.getLow())
-        self.__volumeDS.appendWithDateTime(dateTime, bar.getVolume())
-        self.__adjCloseDS.appendWithDateTime(dateTime, bar.getAdjClose())
+        if self.__columnDS is not None:
+            row = get_column_values(bar)
+            self.__columns.append(row)
+            for column in BarDataSeries.EVENT_ORDER:
+                newValueEvent = self.__columnDS[column].getNewValueEvent()
+                if newValueEvent.hasSubscribers():
+                    newValueEvent.emit(self.__columnDS[column], dateTime, row[column])
 
         # Process extra columns.
-        for name, value in six.iteritems(bar.getExtraColumns()):
-            extraDS = self.__getOrCreateExtraDS(name)
-            extraDS.appendWithDateTime(dateTime, value)
+        if self.__extraDS:
+            for name, extraDS in six.iteritems(self.__extraDS):
+                if name in extraColumns:
+                    extraDS.appendWithDateTime(dateTime, extraColumns[name])
 
     def getOpenDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the open prices."""
-        return self.__openDS
+        return self.__getColumnDS(BarDataSeries.OPEN)
 
     def getCloseDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the close prices."""
-        return self.__closeDS
+        return self.__getColumnDS(BarDataSeries.CLOSE)
 
     def getHighDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the high prices."""
-        return self.__highDS
+        return self.__getColumnDS(BarDataSeries.HIGH)
 
     def getLowDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the low prices."""
-        return self.__lowDS
+        return self.__getColumnDS(BarDataSeries.LOW)
 
     def getVolumeDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the volume."""
-        return self.__volumeDS
+        return self.__getColumnDS(BarDataSeries.VOLUME)
 
     def getAdjCloseDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the adjusted close prices."""
-        return self.__adjCloseDS
+        return self.__getColumnDS(BarDataSeries.ADJ_CLOSE)
 
     def getPriceDataSeries(self):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` with the close or adjusted close prices."""
         if self.__useAdjustedValues:
-            return self.__adjCloseDS
+            return self.getAdjCloseDataSeries()
         else:
-            return self.__closeDS
+            return self.getCloseDataSeries()
 
     def getExtraDataSeries(self, name):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` for an extra column."""
@@ -18,16 +18,66 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
-from pyalgotrade import utils
+import heapq
+import itertools
+import sys
+import threading
+
+import six
+from six.moves import queue
+if six.PY3:
+    import asyncio
+
 from pyalgotrade import observer
 from pyalgotrade import dispatchprio
 
 
+# A queue that wakes up a dispatcher every time an item is put, so subjects consuming from it don't need to block
+# waiting for events.
+class WakeUpQueue(queue.Queue):
+    def __init__(self):
+        queue.Queue.__init__(self)
+        self.__dispatcher = None
+
+    def setDispatcher(self, dispatcher):
+        self.__dispatcher = dispatcher
+
+    def put(self, item, block=True, timeout=None):
+        queue.Queue.put(self, item, block, timeout)
+        dispatcher = self.__dispatcher
+        if dispatcher is not None:
+            dispatcher.wakeUp()
+
+
 # This class is responsible for dispatching events from multiple subjects, synchronizing them if necessary.
+#
+# Subjects that know the datetime for their next event are kept in a heap keyed by that datetime, so only the ones
+# that have an event for the smallest datetime are visited. The rest of the subjects (realtime subjects, subjects that
+# hit eof, or that can't tell when their next event will be) are checked on every dispatch.
+# Subjects get peeked again after they had a chance to dispatch, so a subject's next event datetime may move later
+# without dispatching, but never earlier (see observer.Subject.peekDateTime).
+#
+# When nothing gets dispatched and every subject that may still generate events calls wakeUp() as soon as it has
+# something new, the dispatcher sleeps until woken up instead of polling the subjects.
+#
+# If any subject runs on an asyncio event loop, the dispatcher runs on one as well and every subject shares it.
 class Dispatcher(object):
+    # Upper bound on how long to sleep while idle, so idle handlers (resampling checks, for example) still run regularly.
+    MAX_IDLE_WAIT = 0.1
+
     def __init__(self):
         self.__subjects = []
+        self.__subjectOrder = {}
+        self.__scheduled = []
+        self.__unscheduled = []
+        self.__scheduleSeq = itertools.count()
         self.__stop = False
+        self.__wakeUpEvent = threading.Event()
+        self.__loop = None
+        self.__loopThread = None
+        self.__loopHandle = None
+        self.__loopError = None
+        self.__sleeping = False
         self.__startEvent = observer.Event()
         self.__idleEvent = observer.Event()
         self.__currDateTime = None
@@ -44,6 +94,21 @@ class Dispatcher(object):
 
     def stop(self):
         self.__stop = True
+        self.wakeUp()
+
+    # Signal that there are new events to dispatch, or that a subject hit eof. This can be called from any thread.
+    def wakeUp(self):
+        loop = self.__loop
+        if loop is None:
+            self.__wakeUpEvent.set()
+        elif threading.current_thread() is self.__loopThread:
+            self.__onLoopWakeUp()
+        else:
+            try:
+                loop.call_soon_threadsafe(self.__onLoopWakeUp)
+            except RuntimeError:
+                # The event loop was already closed.
+                pass
 
     def getSubjects(self):
         return self.__subjects
@@ -65,6 +130,8 @@ class Dispatcher(object):
                 pos += 1
             self.__subjects.insert(pos, subject)
 
+        self.__subjectOrder = dict((s, i) for i, s in enumerate(self.__subjects))
+        self.__unscheduled.append(subject)
         subject.onDispatcherRegistered(self)
 
     # Return True if events were dispatched.
@@ -75,30 +142,96 @@ class Dispatcher(object):
             ret = subject.dispatch() is True
         return ret
 
+    # Move the subjects that can tell the datetime for their next event into the heap.
+    # Returns True if all subjects hit eof.
+    def __schedule(self):
+        eof = len(self.__scheduled) == 0
+        unscheduled = []
+        for subject in self.__unscheduled:
+            if not subject.eof():
+                eof = False
+                dateTime = subject.peekDateTime()
+                if dateTime is not None:
+                    heapq.heappush(self.__scheduled, (dateTime, next(self.__scheduleSeq), subject))
+                    continue
+            unscheduled.append(subject)
+        self.__unscheduled = unscheduled
+        return eof
+
     # Returns a tuple with booleans
     # 1: True if all subjects hit eof
     # 2: True if at least one subject dispatched events.
     def __dispatch(self):
         smallestDateTime = None
-        eof = True
         eventsDispatched = False
-
-        # Scan for the lowest datetime.
-        for subject in self.__subjects:
-            if not subject.eof():
-                eof = False
-                smallestDateTime = utils.safe_min(smallestDateTime, subject.peekDateTime())
+        eof = self.__schedule()
 
         # Dispatch realtime subjects and those subjects with the lowest datetime.
         if not eof:
+            popped = []
+            if len(self.__scheduled):
+                smallestDateTime = self.__scheduled[0][0]
+                while len(self.__scheduled) and self.__scheduled[0][0] == smallestDateTime:
+                    popped.append(heapq.heappop(self.__scheduled)[2])
             self.__currDateTime = smallestDateTime
 
-            for subject in self.__subjects:
+            subjects = sorted(self.__unscheduled + popped, key=self.__subjectOrder.get)
+            for subject in subjects:
                 if self.__dispatchSubject(subject, smallestDateTime):
                     eventsDispatched = True
+
+            # Subjects taken from the heap will get rescheduled, if necessary, on the next dispatch.
+            self.__unscheduled.extend(popped)
         return eof, eventsDispatched
 
-    def run(self):
+    # Dispatch events once. Returns True if there was nothing to dispatch.
+    def __step(self):
+        ret = False
+        eof, eventsDispatched = self.__dispatch()
+        if eof:
+            self.__stop = True
+        elif not eventsDispatched:
+            self.__idleEvent.emit()
+            ret = True
+        return ret
+
+    # Returns True if there is nothing scheduled and every subject that may generate events will wake us up.
+    # Otherwise, subjects are expected to block while waiting for events, as they used to.
+    def __canSleep(self):
+        return len(self.__scheduled) == 0 and all(s.eof() or s.notifiesDispatcher() for s in self.__unscheduled)
+
+    def __waitForEvents(self):
+        if self.__canSleep():
+            self.__wakeUpEvent.wait(Dispatcher.MAX_IDLE_WAIT)
+        self.__wakeUpEvent.clear()
+
+    def __runLoopStep(self):
+        self.__loopHandle = None
+        self.__sleeping = False
+        try:
+            if not self.__stop and self.__step():
+                # Nothing was dispatched. Subjects can't block waiting for events on the event loop, so wait before
+                # polling them again. Subjects that notify the dispatcher will cut the wait short.
+                self.__sleeping = True
+                self.__loopHandle = self.__loop.call_later(Dispatcher.MAX_IDLE_WAIT, self.__runLoopStep)
+            elif not self.__stop:
+                # Yield to the event loop, so pending I/O gets processed, before dispatching again.
+                self.__loopHandle = self.__loop.call_soon(self.__runLoopStep)
+        except Exception:
+            self.__loopError = sys.exc_info()
+            self.__stop = True
+
+        if self.__stop:
+            self.__loop.stop()
+
+    def __onLoopWakeUp(self):
+        # Dispatch right away if sleeping.
+        if self.__sleeping:
+            self.__loopHandle.cancel()
+            self.__sleeping = False
+            self.__loopHandle = self.__loop.call_soon(self.__runLoopStep)
+
+    def __run(self):
         try:
             for subject in self.__subjects:
                 subject.start()
@@ -106,11 +239,8 @@ class Dispatcher(object):
             self.__startEvent.emit()
 
             while not self.__stop:
-                eof, eventsDispatched = self.__dispatch()
-                if eof:
-                    self.__stop = True
-                elif not eventsDispatched:
-                    self.__idleEvent.emit()
+                if self.__step():
+                    self.__waitForEvents()
         finally:
             # There are no more events.
             self.__currDateTime = None
@@ -119,3 +249,53 @@ class Dispatcher(object):
                 subject.stop()
             for subject in self.__subjects:
                 subject.join()
+
+    # Subjects driven by the event loop share it with the dispatcher, so their events get dispatched as soon as they
+    # are processed, without going through other threads.
+    def __runOnEventLoop(self):
+        if not six.PY3:
+            raise Exception("Running subjects on an event loop requires Python 3")
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.__loop = loop
+        self.__loopThread = threading.current_thread()
+        self.__loopError = None
+        try:
+            for subject in self.__subjects:
+                if subject.runsOnEventLoop():
+                    loop.run_until_complete(subject.startAsync())
+                else:
+                    subject.start()
+
+            self.__startEvent.emit()
+
+            self.__loopHandle = loop.call_soon(self.__runLoopStep)
+            loop.run_forever()
+            if self.__loopError is not None:
+                six.reraise(*self.__loopError)
+        finally:
+            # There are no more events.
+            self.__currDateTime = None
+            if self.__loopHandle is not None:
+                self.__loopHandle.cancel()
+                self.__loopHandle = None
+            self.__sleeping = False
+
+            for subject in self.__subjects:
+                subject.stop()
+            for subject in self.__subjects:
+                if subject.runsOnEventLoop():
+                    loop.run_until_complete(subject.joinAsync())
+                else:
+                    subject.join()
+
+            self.__loop = None
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def run(self):
+        if any(subject.runsOnEventLoop() for subject in self.__subjects):
+            self.__runOnEventLoop()
+        else:
+            self.__run()
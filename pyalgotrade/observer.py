@@ -58,6 +58,9 @@ class Event(object):
         else:
             self.__unsubscribeImpl(handler)
 
+    def hasSubscribers(self):
+        return len(self.__handlers) > 0
+
     def emit(self, *args, **kwargs):
         try:
             self.__emitting += 1
@@ -105,6 +108,8 @@ class Subject(object):
         # Return the datetime for the next event.
         # This is needed to properly synchronize non-realtime subjects.
         # Return None since this is a realtime subject.
+        # The dispatcher only peeks again after the subject gets a chance to dispatch, so once a datetime is returned
+        # it should not move to an earlier one until dispatch() is called. Moving it to a later one is fine.
         raise NotImplementedError()
 
     def getDispatchPriority(self):
@@ -118,3 +123,24 @@ class Subject(object):
     def onDispatcherRegistered(self, dispatcher):
         # Called when the subject is registered with a dispatcher.
         pass
+
+    def notifiesDispatcher(self):
+        # Return True if the subject calls dispatcher.wakeUp() as soon as it has new events to dispatch or hits eof,
+        # so the dispatcher can sleep while idle. Subjects that return False should block for a short while in
+        # dispatch() when they have nothing to dispatch, to avoid busy waiting.
+        return False
+
+    def runsOnEventLoop(self):
+        # Return True if the subject is driven by coroutines running on the dispatcher's asyncio event loop.
+        # Such subjects get started with startAsync() instead of start(), and joined with joinAsync() instead of join().
+        return False
+
+    # This may raise.
+    def startAsync(self):
+        # Return an awaitable that completes once the subject is started.
+        raise NotImplementedError()
+
+    # This should not raise.
+    def joinAsync(self):
+        # Return an awaitable that completes once the subject is done.
+        raise NotImplementedError()
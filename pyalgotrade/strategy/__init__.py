@@ -175,6 +175,54 @@ class BaseStrategy(object):
             self.getBroker().submitOrder(ret)
         return ret
 
+    def submitOrders(self, orders):
+        """Submits multiple orders, in the given order.
+
+        :param orders: The orders to submit.
+        :type orders: list of :class:`pyalgotrade.broker.Order`.
+        """
+
+        self.getBroker().submitOrders(orders)
+
+    def rebalance(self, targets, onClose=False, goodTillCanceled=False, allOrNone=False):
+        """Submits the market orders needed to reach a number of shares for each instrument.
+        Sell orders are submitted before buy orders, so cash from sales is available first.
+
+        :param targets: A dictionary that maps instruments to the target number of shares.
+        :type targets: dict.
+        :param onClose: True if the orders should be filled as close to the closing price as possible (Market-On-Close order). Default is False.
+        :type onClose: boolean.
+        :param goodTillCanceled: True if the orders are good till canceled. If False then the orders get automatically canceled when the session closes.
+        :type goodTillCanceled: boolean.
+        :param allOrNone: True if the orders should be completely filled or not at all.
+        :type allOrNone: boolean.
+        :rtype: A list with the :class:`pyalgotrade.broker.MarketOrder` submitted.
+
+        .. note::
+            * Only the current number of shares is taken into account, not the active orders.
+        """
+
+        sellOrders = []
+        buyOrders = []
+        for instrument in sorted(targets):
+            quantity = targets[instrument] - self.getBroker().getShares(instrument)
+            quantity = self.getBroker().getInstrumentTraits(instrument).roundQuantity(quantity)
+            if quantity > 0:
+                order = self.getBroker().createMarketOrder(pyalgotrade.broker.Order.Action.BUY, instrument, quantity, onClose)
+                buyOrders.append(order)
+            elif quantity < 0:
+                order = self.getBroker().createMarketOrder(pyalgotrade.broker.Order.Action.SELL, instrument, quantity*-1, onClose)
+                sellOrders.append(order)
+            else:
+                continue
+            order.setGoodTillCanceled(goodTillCanceled)
+            order.setAllOrNone(allOrNone)
+
+        ret = sellOrders + buyOrders
+        if len(ret):
+            self.submitOrders(ret)
+        return ret
+
     def limitOrder(self, instrument, limitPrice, quantity, goodTillCanceled=False, allOrNone=False):
         """Submits a limit order.
 
@@ -21,9 +21,19 @@
 import talib
 import numpy
 
+from pyalgotrade import dataseries
+from pyalgotrade.dataseries import bards
+
 
 # Returns the last values of a dataseries as a numpy.array, or None if not enough values could be retrieved from the dataseries.
 def value_ds_to_numpy(ds, count):
+    # FloatDataSeries already hold the values in a numpy.array, so there is no need to copy them.
+    if isinstance(ds, (dataseries.FloatDataSeries, bards.BarColumnDataSeries)):
+        ret = ds.asarray(count)
+        if numpy.isnan(ret).any():
+            ret = None
+        return ret
+
     ret = None
     try:
         values = ds[count*-1:]
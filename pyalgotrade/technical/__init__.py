@@ -79,6 +79,7 @@ class EventBasedFilter(dataseries.SequenceDataSeries):
 
     def __init__(self, dataSeries, eventWindow, maxLen=None):
         super(EventBasedFilter, self).__init__(maxLen)
+        self._shareDateTimes(dataSeries)
         self.__dataSeries = dataSeries
         self.__dataSeries.getNewValueEvent().subscribe(self.__onNewValue)
         self.__eventWindow = eventWindow
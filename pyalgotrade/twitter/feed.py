@@ -28,6 +28,7 @@ import tweepy
 # https://github.com/tweepy/tweepy/issues/1064
 from tweepy import streaming
 
+from pyalgotrade import dispatcher
 from pyalgotrade import observer
 import pyalgotrade.logger
 
@@ -96,7 +97,8 @@ class TwitterFeed(observer.Subject):
         super(TwitterFeed, self).__init__()
 
         self.__event = observer.Event()
-        self.__queue = queue.Queue()
+        self.__queue = dispatcher.WakeUpQueue()
+        self.__dispatcher = None
         self.__thread = None
         self.__running = False
 
@@ -115,11 +117,14 @@ class TwitterFeed(observer.Subject):
         finally:
             logger.info("Client finished.")
             self.__running = False
+            # Let the dispatcher know that we hit eof.
+            if self.__dispatcher is not None:
+                self.__dispatcher.wakeUp()
 
     def __dispatchImpl(self):
         ret = False
         try:
-            nextTweet = json.loads(self.__queue.get(True, TwitterFeed.QUEUE_TIMEOUT))
+            nextTweet = json.loads(self.__queue.get(self.__dispatcher is None, TwitterFeed.QUEUE_TIMEOUT))
             ret = True
             self.__event.emit(nextTweet)
         except queue.Empty:
@@ -168,3 +173,11 @@ class TwitterFeed(observer.Subject):
 
     def peekDateTime(self):
         return None
+
+    def onDispatcherRegistered(self, dispatcher):
+        super(TwitterFeed, self).onDispatcherRegistered(dispatcher)
+        self.__dispatcher = dispatcher
+        self.__queue.setDispatcher(dispatcher)
+
+    def notifiesDispatcher(self):
+        return self.__dispatcher is not None
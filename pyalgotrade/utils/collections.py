@@ -20,6 +20,8 @@
 
 import numpy as np
 
+from pyalgotrade.utils import dt
+
 
 def lt(v1, v2):
     if v1 is None:
@@ -57,85 +59,272 @@ def intersect(values1, values2, skipNone=False):
 
 
 # Like a collections.deque but using a numpy.array.
+# Values are stored in a ring buffer that is twice as long as maxLen, and every value is written twice, at pos and at
+# pos + maxLen. That way appending is O(1) and the values in the window are always available as a contiguous slice of
+# the underlying array, so data() doesn't need to shift or copy anything.
 class NumPyDeque(object):
     def __init__(self, maxLen, dtype=float):
         assert maxLen > 0, "Invalid maximum length"
 
-        self.__values = np.empty(maxLen, dtype=dtype)
+        self.__values = np.empty(maxLen * 2, dtype=dtype)
         self.__maxLen = maxLen
-        self.__nextPos = 0
+        self.__start = 0
+        self.__len = 0
 
     def getMaxLen(self):
         return self.__maxLen
 
     def append(self, value):
-        if self.__nextPos < self.__maxLen:
-            self.__values[self.__nextPos] = value
-            self.__nextPos += 1
+        if self.__len < self.__maxLen:
+            pos = self.__len
+            self.__len += 1
         else:
-            # Shift items to the left and put the last value.
-            # I'm not using np.roll to avoid creating a new array.
-            self.__values[0:-1] = self.__values[1:]
-            self.__values[self.__nextPos - 1] = value
+            # Overwrite the oldest value and move the window one position to the right.
+            pos = self.__start
+            self.__start += 1
+            if self.__start == self.__maxLen:
+                self.__start = 0
+        self.__values[pos] = value
+        self.__values[pos + self.__maxLen] = value
 
     def data(self):
-        # If all values are not initialized, return a portion of the array.
-        if self.__nextPos < self.__maxLen:
-            ret = self.__values[0:self.__nextPos]
-        else:
-            ret = self.__values
-        return ret
+        return self.__values[self.__start:self.__start + self.__len]
 
     def resize(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
         # Create empty, copy last values and swap.
-        values = np.empty(maxLen, dtype=self.__values.dtype)
-        lastValues = self.__values[0:self.__nextPos]
-        values[0:min(maxLen, len(lastValues))] = lastValues[-1*min(maxLen, len(lastValues)):]
+        lastValues = self.data()[-1*min(maxLen, self.__len):]
+        values = np.empty(maxLen * 2, dtype=self.__values.dtype)
+        values[0:len(lastValues)] = lastValues
+        values[maxLen:maxLen + len(lastValues)] = lastValues
         self.__values = values
 
         self.__maxLen = maxLen
-        if self.__nextPos >= self.__maxLen:
-            self.__nextPos = self.__maxLen
+        self.__start = 0
+        self.__len = len(lastValues)
 
     def __len__(self):
-        return self.__nextPos
+        return self.__len
 
     def __getitem__(self, key):
         return self.data()[key]
 
 
+# Like a NumPyDeque but each value is a row with a fixed number of columns.
+# Values are stored column by column so each column is available as a contiguous slice of the underlying array.
+class NumPyColumnDeque(object):
+    def __init__(self, maxLen, columns, dtype=float):
+        assert maxLen > 0, "Invalid maximum length"
+
+        self.__values = np.empty((columns, maxLen * 2), dtype=dtype)
+        self.__maxLen = maxLen
+        self.__start = 0
+        self.__len = 0
+
+    def getMaxLen(self):
+        return self.__maxLen
+
+    def append(self, row):
+        if self.__len < self.__maxLen:
+            pos = self.__len
+            self.__len += 1
+        else:
+            pos = self.__start
+            self.__start += 1
+            if self.__start == self.__maxLen:
+                self.__start = 0
+        self.__values[:, pos] = row
+        self.__values[:, pos + self.__maxLen] = row
+
+    # Returns a 2D array with one row per column.
+    def data(self):
+        return self.__values[:, self.__start:self.__start + self.__len]
+
+    def column(self, column):
+        return self.__values[column, self.__start:self.__start + self.__len]
+
+    def resize(self, maxLen):
+        assert maxLen > 0, "Invalid maximum length"
+
+        lastValues = self.data()[:, -1*min(maxLen, self.__len):]
+        length = lastValues.shape[1]
+        values = np.empty((self.__values.shape[0], maxLen * 2), dtype=self.__values.dtype)
+        values[:, 0:length] = lastValues
+        values[:, maxLen:maxLen + length] = lastValues
+        self.__values = values
+
+        self.__maxLen = maxLen
+        self.__start = 0
+        self.__len = length
+
+    def __len__(self):
+        return self.__len
+
+
+# Holds datetimes as int64 microseconds since the epoch instead of datetime.datetime instances.
+# Positions are absolute, that is, they are counted from the first value ever appended, so many dataseries that get
+# their values appended with the same datetimes can read them from a single instance.
+# Datetimes are rebuilt using the timezone of the first one appended. If a datetime with a different timezone gets
+# appended, the datetimes are also kept as they were appended from then on, so they are returned unchanged.
+class DateTimeDeque(object):
+    # Used to store None.
+    NONE = np.iinfo(np.int64).min
+
+    def __init__(self, maxLen):
+        self.__values = NumPyDeque(maxLen, np.int64)
+        self.__dateTimes = None
+        self.__count = 0
+        self.__tzInfo = None
+        self.__tzKey = None
+        self.__naive = None
+        self.__last = self
+
+    def getMaxLen(self):
+        return self.__values.getMaxLen()
+
+    def resize(self, maxLen):
+        self.__values.resize(maxLen)
+        if self.__dateTimes is not None:
+            self.__dateTimes.resize(maxLen)
+
+    # Returns the number of datetimes ever appended.
+    def getCount(self):
+        return self.__count
+
+    # Returns the last datetime appended, as it was appended.
+    def getLast(self):
+        return self.__last
+
+    # Converts a datetime to the value that gets stored.
+    def toValue(self, dateTime):
+        if dateTime is None:
+            return DateTimeDeque.NONE
+
+        naive = dateTime.tzinfo is None
+        if self.__naive is None:
+            self.__naive = naive
+            self.__tzInfo = dateTime.tzinfo
+            self.__tzKey = get_tz_key(dateTime.tzinfo)
+        elif self.__naive != naive:
+            raise TypeError("can't mix offset-naive and offset-aware datetimes")
+        return dt.datetime_to_microseconds(dateTime)
+
+    # value should be the result of calling toValue(dateTime).
+    def append(self, value, dateTime):
+        if self.__dateTimes is None and dateTime is not None and dateTime.tzinfo is not self.__tzInfo and \
+                get_tz_key(dateTime.tzinfo) != self.__tzKey:
+            self.__dateTimes = ListDeque(self.getMaxLen())
+            for prevValue in self.__values.data().tolist():
+                self.__dateTimes.append(self.__toDateTime(prevValue))
+        self.__values.append(value)
+        if self.__dateTimes is not None:
+            self.__dateTimes.append(dateTime)
+        self.__count += 1
+        self.__last = dateTime
+
+    def __toDateTime(self, value):
+        if value == DateTimeDeque.NONE:
+            return None
+        return dt.microseconds_to_datetime(value, self.__tzInfo)
+
+    # Returns the value at absolute position pos.
+    def getValue(self, pos):
+        return self.__values[pos - self.__count]
+
+    # Returns the values in the absolute range [begin, end).
+    def getValues(self, begin, end):
+        offset = self.__count - len(self.__values)
+        assert begin >= offset and end <= self.__count, "Values are no longer available"
+        return self.__values.data()[begin - offset:end - offset]
+
+    # Returns the datetime at absolute position pos.
+    def getDateTime(self, pos):
+        if pos == self.__count - 1:
+            return self.__last
+        if self.__dateTimes is not None:
+            return self.__dateTimes[pos - self.__count]
+        return self.__toDateTime(int(self.getValue(pos)))
+
+    # Returns a new instance holding the values in the absolute range [begin, end), starting at position 0.
+    def copy(self, begin, end, maxLen):
+        ret = DateTimeDeque(maxLen)
+        ret.__tzInfo = self.__tzInfo
+        ret.__tzKey = self.__tzKey
+        ret.__naive = self.__naive
+        begin = max(begin, end - maxLen)
+        for pos, value in enumerate(self.getValues(begin, end).tolist(), begin):
+            if self.__dateTimes is None:
+                ret.__values.append(value)
+                ret.__count += 1
+            else:
+                ret.append(value, self.getDateTime(pos))
+        if ret.__count:
+            ret.__last = self.getDateTime(end - 1)
+        return ret
+
+
+# Returns a value that tells timezones apart. pytz uses a different tzinfo instance for each UTC offset in a
+# timezone, but datetimes get rebuilt properly from any of them.
+def get_tz_key(tzInfo):
+    return getattr(tzInfo, "zone", tzInfo)
+
+
 # I'm not using collections.deque because:
 # 1: Random access is slower.
 # 2: Slicing is not supported.
+# Values that fall out of the window are not removed one at a time, since list.pop(0) is O(n). Instead, the list is
+# allowed to grow up to twice maxLen and then the values that are no longer in the window are removed in bulk.
 class ListDeque(object):
     def __init__(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
         self.__values = []
+        self.__start = 0
         self.__maxLen = maxLen
 
+    def __compact(self):
+        if self.__start:
+            del self.__values[0:self.__start]
+            self.__start = 0
+
     def getMaxLen(self):
         return self.__maxLen
 
     def append(self, value):
         self.__values.append(value)
         # Check bounds
-        if len(self.__values) > self.__maxLen:
-            self.__values.pop(0)
+        if len(self.__values) - self.__start > self.__maxLen:
+            self.__start += 1
+            if self.__start >= self.__maxLen:
+                self.__compact()
 
     def data(self):
+        self.__compact()
         return self.__values
 
     def resize(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
         self.__maxLen = maxLen
-        self.__values = self.__values[-1*maxLen:]
+        self.__values = self.__values[max(self.__start, len(self.__values) - maxLen):]
+        self.__start = 0
 
     def __len__(self):
-        return len(self.__values)
+        return len(self.__values) - self.__start
 
     def __getitem__(self, key):
-        return self.__values[key]
+        if self.__start == 0:
+            return self.__values[key]
+        elif isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step > 0:
+                return self.__values[self.__start + start:self.__start + max(start, stop):step]
+            return self.data()[key]
+        else:
+            length = len(self)
+            if key < 0:
+                key += length
+            if key < 0 or key >= length:
+                raise IndexError("Index out of range")
+            return self.__values[self.__start + key]
@@ -19,6 +19,9 @@
 """
 
 import datetime
+import re
+
+import numpy
 import pytz
 
 
@@ -66,6 +69,27 @@ def timestamp_to_datetime(timeStamp, localized=True):
     return ret
 
 
+def datetime_to_microseconds(dateTime):
+    """ Converts a datetime.datetime to the number of microseconds since the epoch.
+    Naive datetimes are treated as if they were in UTC."""
+    if dateTime.tzinfo is None:
+        diff = dateTime - epoch_naive
+    else:
+        diff = dateTime - epoch_utc
+    return (diff.days * 86400 + diff.seconds) * 1000000 + diff.microseconds
+
+
+def microseconds_to_datetime(microseconds, tzInfo=None):
+    """ Converts the number of microseconds since the epoch to a datetime.datetime.
+    If tzInfo is None a naive datetime is returned."""
+    delta = datetime.timedelta(microseconds=microseconds)
+    if tzInfo is None:
+        ret = epoch_naive + delta
+    else:
+        ret = (epoch_utc + delta).astimezone(tzInfo)
+    return ret
+
+
 def get_first_monday(year):
     ret = datetime.date(year, 1, 1)
     if ret.weekday() != 0:
@@ -82,4 +106,193 @@ def get_last_monday(year):
     return ret
 
 
-epoch_utc = as_utc(datetime.datetime(1970, 1, 1))
+# Widths of the strptime directives supported by parse_datetimes.
+FIXED_WIDTH_DIRECTIVES = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+
+
+# Splits a strptime format into (directive, offset, width) fields and (offset, character) literals.
+def _parse_fixed_width_format(dateTimeFormat):
+    fields = {}
+    literals = []
+    offset = 0
+    i = 0
+    while i < len(dateTimeFormat):
+        if dateTimeFormat[i] == "%":
+            directive = dateTimeFormat[i+1:i+2]
+            width = FIXED_WIDTH_DIRECTIVES.get(directive)
+            if width is None or directive in fields:
+                raise ValueError("Unsupported format: %s" % dateTimeFormat)
+            fields[directive] = (offset, width)
+            offset += width
+            i += 2
+        else:
+            literals.append((offset, ord(dateTimeFormat[i])))
+            offset += 1
+            i += 1
+    for directive in ("Y", "m", "d"):
+        if directive not in fields:
+            raise ValueError("Unsupported format: %s" % dateTimeFormat)
+    return fields, literals, offset
+
+
+def parse_datetimes(values, dateTimeFormat):
+    """Parses a sequence of strings into naive datetimes in one pass.
+    Only fixed width formats built with %Y, %m, %d, %H, %M and %S are supported.
+    Raises ValueError if the format is not supported or if any of the values doesn't match it exactly."""
+
+    fields, literals, width = _parse_fixed_width_format(dateTimeFormat)
+    # One extra byte to detect values that are longer than expected.
+    chars = numpy.array(values, dtype="S%d" % (width + 1))
+    chars = chars.view(numpy.uint8).reshape(len(chars), width + 1)
+    if chars[:, width].any():
+        raise ValueError("Values don't match %s" % dateTimeFormat)
+    for offset, char in literals:
+        if (chars[:, offset] != char).any():
+            raise ValueError("Values don't match %s" % dateTimeFormat)
+
+    digits = chars[:, :width].astype(numpy.int64) - ord("0")
+    numbers = {}
+    for directive in ("Y", "m", "d", "H", "M", "S"):
+        number = numpy.zeros(len(chars), dtype=numpy.int64)
+        if directive in fields:
+            offset, fieldWidth = fields[directive]
+            fieldDigits = digits[:, offset:offset+fieldWidth]
+            if ((fieldDigits < 0) | (fieldDigits > 9)).any():
+                raise ValueError("Values don't match %s" % dateTimeFormat)
+            for i in range(fieldWidth):
+                number = number * 10 + fieldDigits[:, i]
+        numbers[directive] = number
+
+    # Same ranges that datetime.datetime checks.
+    months = (numbers["Y"] - 1970) * 12 + numbers["m"] - 1
+    months = months.astype("datetime64[M]")
+    daysInMonth = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(numpy.int64)
+    if (
+        (numbers["Y"] < 1).any() or
+        ((numbers["m"] < 1) | (numbers["m"] > 12)).any() or
+        ((numbers["d"] < 1) | (numbers["d"] > daysInMonth)).any() or
+        (numbers["H"] > 23).any() or (numbers["M"] > 59).any() or (numbers["S"] > 59).any()
+    ):
+        raise ValueError("Values out of range for %s" % dateTimeFormat)
+
+    seconds = ((numbers["d"] - 1) * 24 + numbers["H"]) * 3600 + numbers["M"] * 60 + numbers["S"]
+    ret = months.astype("datetime64[s]") + seconds.astype("timedelta64[s]")
+    return ret.astype(object).tolist()
+
+
+class DateTimeParser(object):
+    """Parses strings like datetime.datetime.strptime(value, dateTimeFormat) does. Fixed width formats supported by
+    :func:`parse_datetimes` get a faster path that falls back to strptime for values that don't match the format
+    exactly. Instances can be pickled, so they can be sent to other processes.
+
+    :param dateTimeFormat: The format, as used by datetime.datetime.strptime.
+    :type dateTimeFormat: string.
+    """
+
+    def __init__(self, dateTimeFormat):
+        self.__dateTimeFormat = dateTimeFormat
+        self.__regex = None
+        self.__groupIndexes = None
+
+        try:
+            fields, literals, width = _parse_fixed_width_format(dateTimeFormat)
+        except ValueError:
+            return
+        # Fields are passed to datetime.datetime positionally, so they have to be a prefix of year, month, day, etc.
+        directives = [directive for directive in ("Y", "m", "d", "H", "M", "S") if directive in fields]
+        if directives != ["Y", "m", "d", "H", "M", "S"][:len(directives)]:
+            return
+
+        # Build a regex that only matches values with the exact width of each field.
+        regex = ""
+        groups = []
+        offset = 0
+        literals = dict(literals)
+        fieldsByOffset = dict((fields[directive][0], directive) for directive in directives)
+        while offset < width:
+            if offset in literals:
+                regex += re.escape(chr(literals[offset]))
+                offset += 1
+            else:
+                directive = fieldsByOffset[offset]
+                regex += "(\\d{%d})" % fields[directive][1]
+                groups.append(directive)
+                offset += fields[directive][1]
+        self.__regex = re.compile(regex + "\\Z")
+        groupIndexes = [groups.index(directive) for directive in directives]
+        # None means that groups are already in the order that datetime.datetime expects.
+        if groupIndexes != list(range(len(groupIndexes))):
+            self.__groupIndexes = groupIndexes
+
+    def getDateTimeFormat(self):
+        return self.__dateTimeFormat
+
+    def __call__(self, value):
+        if self.__regex is not None:
+            match = self.__regex.match(value)
+            if match is not None:
+                try:
+                    if self.__groupIndexes is None:
+                        return datetime.datetime(*map(int, match.groups()))
+                    values = match.groups()
+                    return datetime.datetime(*[int(values[i]) for i in self.__groupIndexes])
+                except ValueError:
+                    pass
+        return datetime.datetime.strptime(value, self.__dateTimeFormat)
+
+
+def datetime_parser(dateTimeFormat):
+    """Returns a :class:`DateTimeParser` for dateTimeFormat."""
+    return DateTimeParser(dateTimeFormat)
+
+
+class Localizer(object):
+    """Localizes datetimes to a timezone like :func:`localize` does, but caches the timezone information for each
+    day so that localizing datetimes that fall on the same day is cheap.
+
+    :param timeZone: The timezone to use to localize datetimes.
+    :type timeZone: A pytz timezone.
+    """
+
+    def __init__(self, timeZone):
+        self.__timeZone = timeZone
+        # Map dates to the tzinfo for that day, or None if the UTC offset changes during the day.
+        self.__localTzInfos = {}
+        # Map UTC dates to the UTC offset and tzinfo for that day, or None if the UTC offset changes during the day.
+        self.__utcOffsets = {}
+
+    def __getLocalTzInfo(self, date):
+        try:
+            ret = self.__localTzInfos[date]
+        except KeyError:
+            begin = self.__timeZone.localize(datetime.datetime.combine(date, datetime.time.min))
+            end = self.__timeZone.localize(datetime.datetime.combine(date, datetime.time.max))
+            ret = begin.tzinfo if begin.tzinfo is end.tzinfo else None
+            self.__localTzInfos[date] = ret
+        return ret
+
+    def __getUTCOffset(self, date):
+        try:
+            ret = self.__utcOffsets[date]
+        except KeyError:
+            begin = pytz.utc.localize(datetime.datetime.combine(date, datetime.time.min)).astimezone(self.__timeZone)
+            end = pytz.utc.localize(datetime.datetime.combine(date, datetime.time.max)).astimezone(self.__timeZone)
+            ret = (begin.utcoffset(), begin.tzinfo) if begin.tzinfo is end.tzinfo else None
+            self.__utcOffsets[date] = ret
+        return ret
+
+    def localize(self, dateTime):
+        tzInfo = dateTime.tzinfo
+        if tzInfo is None:
+            localTzInfo = self.__getLocalTzInfo(dateTime.date())
+            if localTzInfo is not None:
+                return dateTime.replace(tzinfo=localTzInfo)
+        elif tzInfo is pytz.utc:
+            utcOffset = self.__getUTCOffset(dateTime.date())
+            if utcOffset is not None:
+                return (dateTime + utcOffset[0]).replace(tzinfo=utcOffset[1])
+        return localize(dateTime, self.__timeZone)
+
+
+epoch_naive = datetime.datetime(1970, 1, 1)
+epoch_utc = as_utc(epoch_naive)
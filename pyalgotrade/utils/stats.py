@@ -24,12 +24,12 @@ import numpy
 def mean(values):
     ret = None
     if len(values):
-        ret = numpy.array(values).mean()
+        ret = numpy.asarray(values).mean()
     return ret
 
 
 def stddev(values, ddof=1):
     ret = None
     if len(values):
-        ret = numpy.array(values).std(ddof=ddof)
+        ret = numpy.asarray(values).std(ddof=ddof)
     return ret
@@ -25,6 +25,8 @@ import threading
 import six
 from ws4py.client import tornadoclient
 import tornado
+import tornado.gen
+import tornado.websocket
 if six.PY3:
     import asyncio
     import tornado.platform.asyncio
@@ -187,6 +189,103 @@ class WebSocketClientBase(tornadoclient.TornadoWebSocketClient):
         pass
 
 
+# Base class for websocket clients that run on the current IOLoop, which may be shared with other clients and the
+# dispatcher, instead of in a thread of their own. It has the same overrides as WebSocketClientBase.
+# To use it wait for connect, then call startClient which returns a future that completes when the connection is closed,
+# and stopClient.
+class AsyncWebSocketClientBase(object):
+    def __init__(self, url):
+        self.__url = url
+        self.__conn = None
+        self.__keepAliveMgr = None
+        self.__connected = False
+
+    def getIOLoop(self):
+        return tornado.ioloop.IOLoop.current()
+
+    # Must be set before calling connect().
+    def setKeepAliveMgr(self, keepAliveMgr):
+        if self.__keepAliveMgr is not None:
+            raise Exception("KeepAliveMgr already set")
+        self.__keepAliveMgr = keepAliveMgr
+
+    @tornado.gen.coroutine
+    def connect(self):
+        self.__conn = yield tornado.websocket.websocket_connect(self.__url)
+        self.__connected = True
+        if self.__keepAliveMgr is not None:
+            self.__keepAliveMgr.start()
+            self.__keepAliveMgr.setAlive()
+        self.onOpened()
+
+    @tornado.gen.coroutine
+    def startClient(self):
+        while True:
+            message = yield self.__conn.read_message()
+            if message is None:
+                break
+            self.__onMessage(message)
+        self.__onClosed(self.__conn.close_code, self.__conn.close_reason)
+
+    def __onMessage(self, message):
+        try:
+            msg = json.loads(message)
+
+            if self.__keepAliveMgr is not None:
+                self.__keepAliveMgr.setAlive()
+                if self.__keepAliveMgr.handleResponse(msg):
+                    return
+
+            self.onMessage(msg)
+        except Exception as e:
+            self.onUnhandledException(e)
+
+    def __onClosed(self, code, reason):
+        wasConnected = self.__connected
+        self.__connected = False
+        if self.__keepAliveMgr:
+            self.__keepAliveMgr.stop()
+            self.__keepAliveMgr = None
+
+        if wasConnected:
+            self.onClosed(code, reason)
+
+    def isConnected(self):
+        return self.__connected
+
+    def send(self, message, binary=False):
+        self.__conn.write_message(message, binary)
+
+    def close(self):
+        if self.__conn is not None:
+            self.__conn.close()
+
+    def stopClient(self):
+        try:
+            self.close()
+        except Exception as e:
+            logger.warning("Failed to close connection: %s" % (e))
+
+    ######################################################################
+    # Overrides
+
+    def onUnhandledException(self, exception):
+        logger.critical("Unhandled exception", exc_info=exception)
+        raise
+
+    def onOpened(self):
+        pass
+
+    def onMessage(self, msg):
+        raise NotImplementedError()
+
+    def onClosed(self, code, reason):
+        pass
+
+    def onDisconnectionDetected(self):
+        pass
+
+
 # Base clase for threads that will run a WebSocketClientBase
 # Subclasses should call super(WebSocketClientThread, self).run() insinde run.
 # Check https://github.com/tornadoweb/tornado/issues/2308
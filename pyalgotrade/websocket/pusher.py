@@ -70,15 +70,19 @@ class PingKeepAliveMgr(client.KeepAliveMgr):
         return ret
 
 
-class WebSocketClient(client.WebSocketClientBase):
+# Pusher protocol handling. This is mixed with a websocket client implementation, either the one running on its own
+# thread, or the one running on a shared event loop.
+class WebSocketClientMixin(object):
+    URL = "ws://ws.pusherapp.com/app/%s?%s"
+
     def __init__(self, appKey, protocol=5, maxInactivity=120, responseTimeout=30):
         params = {
             "protocol": protocol,
             "client": "Python-PyAlgoTrade",
             "version": pyalgotrade.__version__
             }
-        url = "ws://ws.pusherapp.com/app/%s?%s" % (appKey, urlencode(params))
-        super(WebSocketClient, self).__init__(url)
+        url = self.URL % (appKey, urlencode(params))
+        super(WebSocketClientMixin, self).__init__(url)
         self.setKeepAliveMgr(PingKeepAliveMgr(self, maxInactivity, responseTimeout))
 
     def sendEvent(self, eventType, eventData):
@@ -126,3 +130,11 @@ class WebSocketClient(client.WebSocketClientBase):
 
     def onUnknownEvent(self, event):
         raise NotImplementedError()
+
+
+class WebSocketClient(WebSocketClientMixin, client.WebSocketClientBase):
+    pass
+
+
+class AsyncWebSocketClient(WebSocketClientMixin, client.AsyncWebSocketClientBase):
+    pass
@@ -24,6 +24,7 @@ from . import common
 
 from pyalgotrade import barfeed
 from pyalgotrade.barfeed import common as bfcommon
+from pyalgotrade.barfeed import membf
 from pyalgotrade import bar
 from pyalgotrade import dispatcher
 
@@ -81,6 +82,51 @@ class OptimizerBarFeedTestCase(common.TestCase):
         self.assertEquals(barFeed.barsHaveAdjClose(), False)
 
 
+class MemBarFeed(membf.BarFeed):
+    def barsHaveAdjClose(self):
+        return True
+
+
+def build_bars(dateTimes):
+    return [bar.BasicBar(dateTime, 1, 1, 1, 1, 1, 1, bar.Frequency.DAY) for dateTime in dateTimes]
+
+
+class MemBarFeedTestCase(common.TestCase):
+    def testMerge(self):
+        days = [datetime.datetime(2001, 1, day) for day in range(1, 6)]
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("a", build_bars([days[0], days[2], days[4]]))
+        barFeed.addBarsFromSequence("b", build_bars([days[3], days[1], days[2]]))
+        barFeed.addBarsFromSequence("c", build_bars([days[4]]))
+
+        expected = [
+            (days[0], ["a"]),
+            (days[1], ["b"]),
+            (days[2], ["a", "b"]),
+            (days[3], ["b"]),
+            (days[4], ["a", "c"]),
+        ]
+        for i in range(2):
+            self.assertFalse(barFeed.eof())
+            self.assertEqual(barFeed.peekDateTime(), days[0])
+            self.assertEqual(
+                [(dateTime, sorted(bars.getInstruments())) for dateTime, bars in barFeed],
+                expected
+            )
+            self.assertTrue(barFeed.eof())
+            self.assertEqual(barFeed.peekDateTime(), None)
+            self.assertEqual(barFeed.getNextBars(), None)
+            barFeed.reset()
+
+    def testDuplicateBars(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("a", build_bars([datetime.datetime(2001, 1, 1)] * 2))
+        barFeed.addBarsFromSequence("b", build_bars([datetime.datetime(2001, 1, 1)]))
+        self.assertEqual(sorted(barFeed.getNextBars().getInstruments()), ["a", "b"])
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.getNextBars()
+
+
 class CommonTestCase(common.TestCase):
     def testSanitize(self):
         self.assertEqual(bfcommon.sanitize_ohlc(10, 12, 9, 10), (10, 12, 9, 10))
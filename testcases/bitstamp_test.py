@@ -23,11 +23,15 @@ import datetime
 import time
 import threading
 import json
+import socket
 
+import six
 from six.moves import queue
+from ws4py import websocket
 
 from . import common as tc_common
 from . import test_strategy
+from . import websocket_server
 
 from pyalgotrade import broker as basebroker
 from pyalgotrade.bitstamp import barfeed
@@ -188,6 +192,87 @@ class TestingLiveBroker(broker.LiveBroker):
         return self.__httpClient
 
 
+class TestingAsyncLiveBroker(broker.AsyncLiveBroker):
+    def __init__(self, clientId, key, secret):
+        self.__httpClient = HTTPClientMock()
+        broker.AsyncLiveBroker.__init__(self, clientId, key, secret)
+
+    def buildHTTPClient(self, clientId, key, secret):
+        return self.__httpClient
+
+    def getHTTPClient(self):
+        return self.__httpClient
+
+
+# Pusher server stand-in that sends the given events once the client subscribes to the order book, and then closes
+# the connection.
+def build_websocket_server_class(events):
+    class WebSocketServerMock(websocket.WebSocket):
+        def opened(self):
+            self.send(json.dumps({
+                "event": "pusher:connection_established",
+                "data": json.dumps({"socket_id": "1.1", "activity_timeout": 120})
+            }))
+
+        def received_message(self, message):
+            msg = json.loads(message.data.decode("utf-8"))
+            if msg["event"] == "pusher:subscribe" and msg["data"]["channel"] == "order_book":
+                for event in events:
+                    self.send(json.dumps(event))
+                self.close()
+
+    return WebSocketServerMock
+
+
+def build_trade_event(tid, price, amount):
+    return {
+        "event": "trade",
+        "channel": "live_trades",
+        "data": json.dumps({"id": tid, "price": price, "amount": amount, "type": 0})
+    }
+
+
+def build_order_book_event(bid, ask):
+    return {
+        "event": "data",
+        "channel": "order_book",
+        "data": json.dumps({"bids": [[str(bid), "1"]], "asks": [[str(ask), "1"]]})
+    }
+
+
+def get_free_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    ret = sock.getsockname()[1]
+    sock.close()
+    return ret
+
+
+def wait_for_port(port):
+    for i in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except socket.error:
+            time.sleep(0.05)
+
+
+class TestingAsyncLiveTradeFeed(barfeed.AsyncLiveTradeFeed):
+    def __init__(self, port):
+        barfeed.AsyncLiveTradeFeed.__init__(self)
+        # Disable reconnections so the feed finishes when the server closes the connection.
+        self.enableReconection(False)
+        self.__port = port
+
+    def buildWebSocketClient(self, eventQueue):
+        port = self.__port
+
+        class WebSocketClient(wsclient.AsyncWebSocketClient):
+            URL = "ws://127.0.0.1:%d/app/%%s?%%s" % port
+
+        return WebSocketClient(eventQueue)
+
+
 class NonceTest(unittest.TestCase):
     def testNonceGenerator(self):
         gen = httpclient.NonceGenerator()
@@ -672,3 +757,106 @@ class WebSocketTestCase(tc_common.TestCase):
         # Check that we received both events.
         self.assertTrue(events["on_bars"])
         self.assertTrue(events["on_order_book_updated"])
+
+
+@unittest.skipIf(six.PY2, "Requires Python 3")
+class AsyncLiveTestCase(tc_common.TestCase):
+    def setUp(self):
+        super(AsyncLiveTestCase, self).setUp()
+        self.__serverThread = None
+
+    def tearDown(self):
+        if self.__serverThread is not None:
+            self.__serverThread.stop()
+            self.__serverThread.join()
+        super(AsyncLiveTestCase, self).tearDown()
+
+    def __runServer(self, events):
+        port = get_free_port()
+        self.__serverThread = websocket_server.run_websocket_server_thread(
+            "127.0.0.1", port, build_websocket_server_class(events)
+        )
+        wait_for_port(port)
+        return port
+
+    def testBarFeed(self):
+        port = self.__runServer([
+            build_order_book_event(99, 101),
+            build_trade_event(1, 100, 1),
+            build_trade_event(2, 100.5, 2),
+        ])
+
+        disp = dispatcher.Dispatcher()
+        barFeed = TestingAsyncLiveTradeFeed(port)
+        disp.addSubject(barFeed)
+
+        prices = []
+        orderBookUpdates = []
+        barFeed.getNewValuesEvent().subscribe(lambda dateTime, bars: prices.append(bars[common.btc_symbol].getPrice()))
+        barFeed.getOrderBookUpdateEvent().subscribe(orderBookUpdates.append)
+        disp.run()
+
+        self.assertEqual(prices, [100, 100.5])
+        self.assertEqual(len(orderBookUpdates), 1)
+        self.assertEqual(orderBookUpdates[0].getBidPrices(), [99])
+        self.assertEqual(orderBookUpdates[0].getAskPrices(), [101])
+        self.assertTrue(barFeed.eof())
+
+    def testInitializationFailed(self):
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(TestingAsyncLiveTradeFeed(get_free_port()))
+        with self.assertRaisesRegexp(Exception, "Initialization failed"):
+            disp.run()
+
+    def testMapUserTransactionsToOrderEvents(self):
+        class Strategy(TestStrategy):
+            def __init__(self, feed, brk):
+                TestStrategy.__init__(self, feed, brk)
+                self.barsReceived = False
+
+            def __checkStop(self):
+                if self.barsReceived and len(self.orderExecutionInfo) == 2:
+                    self.stop()
+
+            def onBars(self, bars):
+                self.barsReceived = True
+                self.__checkStop()
+
+            def onOrderUpdated(self, order):
+                TestStrategy.onOrderUpdated(self, order)
+                self.__checkStop()
+
+        port = self.__runServer([build_order_book_event(99, 101), build_trade_event(1, 100, 1)])
+        barFeed = TestingAsyncLiveTradeFeed(port)
+        brk = TestingAsyncLiveBroker(None, None, None)
+        httpClient = brk.getHTTPClient()
+        httpClient.setUSDAvailable(0)
+        httpClient.setBTCAvailable(0.1)
+
+        httpClient.addOpenOrder(1, -0.1, 578.79)
+        httpClient.addOpenOrder(2, 0.1, 567.21)
+
+        httpClient.addUserTransaction(1, -0.04557395, 26.38, 578.79, 0.14)
+        httpClient.addUserTransaction(2, 0.04601436, -26.10, 567.21, 0.14)
+
+        # Record the threads making HTTP requests.
+        httpThreads = []
+        getAccountBalance = httpClient.getAccountBalance
+
+        def getAccountBalanceMock():
+            httpThreads.append(threading.current_thread())
+            return getAccountBalance()
+
+        httpClient.getAccountBalance = getAccountBalanceMock
+
+        strat = Strategy(barFeed, brk)
+        strat.run()
+
+        # The initial requests should not block the event loop, which runs in this thread.
+        self.assertNotEqual(httpThreads[0], threading.current_thread())
+
+        self.assertEqual(strat.bid, 99)
+        self.assertEqual(strat.ask, 101)
+        self.assertEqual(len(strat.orderExecutionInfo), 2)
+        self.assertEqual(strat.orderExecutionInfo[0].getPrice(), 578.79)
+        self.assertEqual(strat.orderExecutionInfo[1].getPrice(), 567.21)
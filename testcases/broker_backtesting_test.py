@@ -19,11 +19,13 @@
 """
 
 import datetime
+import random
 
 from . import common
 
 from pyalgotrade import broker
 from pyalgotrade.broker import backtesting
+from pyalgotrade.broker import fillstrategy
 from pyalgotrade import bar
 from pyalgotrade import barfeed
 
@@ -129,6 +131,61 @@ class BarFeed(barfeed.BaseBarFeed):
         return self.__nextBars
 
 
+# A BarFeed that dispatches bars for multiple instruments.
+class MultiInstrumentBarFeed(barfeed.BaseBarFeed):
+    def __init__(self, frequency):
+        barfeed.BaseBarFeed.__init__(self, frequency)
+        self.__nextDateTime = datetime.datetime(2011, 1, 1)
+        self.__nextBars = None
+
+    def getCurrentDateTime(self):
+        return self.__nextDateTime
+
+    def start(self):
+        raise NotImplementedError()
+
+    def stop(self):
+        raise NotImplementedError()
+
+    def join(self):
+        raise NotImplementedError()
+
+    def eof(self):
+        raise NotImplementedError()
+
+    def peekDateTime(self):
+        raise NotImplementedError()
+
+    # prices maps instruments to (open, high, low, close) tuples.
+    def dispatchBars(self, prices, volume=1000):
+        bars = {}
+        for instrument, (openPrice, highPrice, lowPrice, closePrice) in prices.items():
+            bars[instrument] = bar.BasicBar(
+                self.__nextDateTime, openPrice, highPrice, lowPrice, closePrice, volume, closePrice, self.getFrequency()
+            )
+        self.__nextBars = bar.Bars(bars)
+        self.dispatch()
+        self.__nextDateTime += datetime.timedelta(minutes=1)
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def getNextBars(self):
+        return self.__nextBars
+
+
+# A fill strategy that makes the broker process every active order on every bar.
+class FullScanFillStrategy(fillstrategy.DefaultStrategy):
+    def onlyFillsTriggeredOrders(self):
+        return False
+
+
+# A fill strategy that fills limit orders at the limit price, even if the price was not penetrated.
+class AlwaysFillLimitStrategy(fillstrategy.DefaultStrategy):
+    def fillLimitOrder(self, broker_, order, bar):
+        return fillstrategy.FillInfo(order.getLimitPrice(), order.getQuantity())
+
+
 class BaseTestCase(common.TestCase):
     TestInstrument = "orcl"
 
@@ -455,6 +512,223 @@ class BrokerTestCase(BaseTestCase):
         self.assertEqual(len(brk.getActiveOrders("ins2")), 1)
         self.assertEqual(len(brk.getActiveOrders("ins3")), 0)
 
+    def testOnlyOrdersWithBarsGetProcessed(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.MINUTE)
+        brk = self.buildBroker(1000, barFeed)
+        cb = OrderUpdateCallback(brk)
+
+        order1 = brk.createLimitOrder(broker.Order.Action.BUY, "ins1", 10, 1)
+        order2 = brk.createLimitOrder(broker.Order.Action.BUY, "ins2", 10, 1)
+        brk.submitOrder(order1)
+        brk.submitOrder(order2)
+
+        barFeed.dispatchBars({"ins1": (11, 12, 11, 12)})
+        self.assertTrue(order1.isAccepted())
+        self.assertTrue(order2.isSubmitted())
+        # 2 SUBMITTED events and 1 ACCEPTED event.
+        self.assertEqual(cb.eventCount, 3)
+
+        barFeed.dispatchBars({"ins1": (10, 10, 10, 10), "ins3": (10, 10, 10, 10)})
+        self.assertTrue(order1.isFilled())
+        self.assertTrue(order2.isSubmitted())
+        self.assertEqual(brk.getActiveOrders(), [order2])
+        self.assertEqual(brk.getActiveOrders("ins1"), [])
+
+        barFeed.dispatchBars({"ins2": (11, 12, 11, 12)})
+        self.assertTrue(order2.isAccepted())
+        self.assertEqual(len(brk.getActiveOrders("ins2")), 1)
+
+    def testOrdersProcessedInSubmissionOrder(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.MINUTE)
+        brk = self.buildBroker(15, barFeed)
+
+        # There is only cash for one of these orders, so the first one submitted should get filled.
+        orders = [
+            brk.createMarketOrder(broker.Order.Action.BUY, instrument, 1)
+            for instrument in ["ins3", "ins1", "ins2"]
+        ]
+        for order in orders:
+            brk.submitOrder(order)
+        barFeed.dispatchBars({instrument: (10, 10, 10, 10) for instrument in ["ins1", "ins2", "ins3"]})
+        self.assertTrue(orders[0].isFilled())
+        self.assertTrue(orders[1].isAccepted())
+        self.assertTrue(orders[2].isAccepted())
+        self.assertEqual(brk.getShares("ins3"), 1)
+        self.assertEqual(brk.getCash(), 5)
+
+    def testSubmitOrders(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.MINUTE)
+        brk = self.buildBroker(1000, barFeed)
+        cb = OrderUpdateCallback(brk)
+
+        orders = [
+            brk.createMarketOrder(broker.Order.Action.BUY, instrument, 1)
+            for instrument in ["ins2", "ins1"]
+        ]
+        brk.submitOrders(orders)
+        self.assertTrue(all(order.isSubmitted() for order in orders))
+        self.assertEqual(orders[0].getId() + 1, orders[1].getId())
+        self.assertEqual([orderEvent.getOrder() for orderEvent in cb.events], orders)
+        self.assertEqual([orderEvent.getEventType() for orderEvent in cb.events], [broker.OrderEvent.Type.SUBMITTED]*2)
+        self.assertEqual(brk.getActiveOrders("ins1"), [orders[1]])
+
+        # Nothing gets submitted if any order was already processed.
+        order = brk.createMarketOrder(broker.Order.Action.BUY, "ins3", 1)
+        with self.assertRaisesRegexp(Exception, "The order was already processed"):
+            brk.submitOrders([order, orders[0]])
+        with self.assertRaisesRegexp(Exception, "The order was already processed"):
+            brk.submitOrders([order, order])
+        self.assertTrue(order.isInitial())
+        self.assertEqual(cb.eventCount, 2)
+
+        barFeed.dispatchBars({instrument: (10, 10, 10, 10) for instrument in ["ins1", "ins2"]})
+        self.assertTrue(all(order.isFilled() for order in orders))
+        self.assertEqual(cb.eventCount, 6)
+
+    def testSubmitOrdersEventOrder(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.MINUTE)
+        brk = self.buildBroker(1000, barFeed)
+        orders = [
+            brk.createMarketOrder(broker.Order.Action.BUY, instrument, 1)
+            for instrument in ["ins1", "ins2"]
+        ]
+        events = []
+
+        # Orders are submitted and notified one at a time, so the second order is not submitted when the first one
+        # gets canceled.
+        def onOrderEvent(broker_, orderEvent):
+            events.append((orderEvent.getOrder(), orderEvent.getEventType()))
+            if orderEvent.getOrder() is orders[0] and orderEvent.getEventType() == broker.OrderEvent.Type.SUBMITTED:
+                self.assertTrue(orders[1].isInitial())
+                brk.cancelOrder(orders[0])
+
+        brk.getOrderUpdatedEvent().subscribe(onOrderEvent)
+        brk.submitOrders(orders)
+        self.assertEqual(events, [
+            (orders[0], broker.OrderEvent.Type.SUBMITTED),
+            (orders[0], broker.OrderEvent.Type.CANCELED),
+            (orders[1], broker.OrderEvent.Type.SUBMITTED),
+        ])
+
+    def testOrderBookMatchesFullScan(self):
+        def run(fillStrategy):
+            rnd = random.Random(1234)
+            barFeed = MultiInstrumentBarFeed(bar.Frequency.DAY)
+            brk = self.buildBroker(1000000, barFeed)
+            brk.setFillStrategy(fillStrategy)
+            events = []
+            brk.getOrderUpdatedEvent().subscribe(lambda broker_, orderEvent: events.append((
+                orderEvent.getEventType(), orderEvent.getOrder().getId(), orderEvent.getOrder().getFilled(),
+                orderEvent.getOrder().getAvgFillPrice()
+            )))
+            prices = {"ins1": 100.0, "ins2": 50.0}
+            for i in range(200):
+                for instrument, price in prices.items():
+                    for j in range(rnd.randint(0, 5)):
+                        action = rnd.choice([broker.Order.Action.BUY, broker.Order.Action.SELL])
+                        limitPrice = round(price * rnd.uniform(0.9, 1.1), 2)
+                        stopPrice = round(price * rnd.uniform(0.9, 1.1), 2)
+                        quantity = rnd.randint(1, 300)
+                        order = rnd.choice([
+                            lambda: brk.createLimitOrder(action, instrument, limitPrice, quantity),
+                            lambda: brk.createStopOrder(action, instrument, stopPrice, quantity),
+                            lambda: brk.createStopLimitOrder(action, instrument, stopPrice, limitPrice, quantity),
+                            lambda: brk.createMarketOrder(action, instrument, quantity),
+                        ])()
+                        order.setGoodTillCanceled(rnd.random() < 0.9)
+                        brk.submitOrder(order)
+                activeOrders = brk.getActiveOrders()
+                if len(activeOrders) and rnd.random() < 0.3:
+                    brk.cancelOrder(rnd.choice(activeOrders))
+
+                barPrices = {}
+                for instrument, price in prices.items():
+                    if instrument == "ins1" or rnd.random() < 0.8:
+                        open_ = price * rnd.uniform(0.97, 1.03)
+                        close = price * rnd.uniform(0.97, 1.03)
+                        barPrices[instrument] = (
+                            open_, max(open_, close) * rnd.uniform(1, 1.02), min(open_, close) * rnd.uniform(0.98, 1),
+                            close
+                        )
+                        prices[instrument] = close
+                barFeed.dispatchBars(barPrices, volume=rnd.randint(100, 2000))
+            return events, brk.getCash(), brk.getPositions()
+
+        expected = run(FullScanFillStrategy())
+        self.assertGreater(len([event for event in expected[0] if event[0] == broker.OrderEvent.Type.FILLED]), 100)
+        self.assertEqual(run(fillstrategy.DefaultStrategy()), expected)
+
+    def testFillStrategySubclassGetsUntriggeredOrders(self):
+        self.assertTrue(fillstrategy.DefaultStrategy().onlyFillsTriggeredOrders())
+        self.assertFalse(AlwaysFillLimitStrategy().onlyFillsTriggeredOrders())
+
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.DAY)
+        brk = self.buildBroker(1000, barFeed)
+        brk.setFillStrategy(AlwaysFillLimitStrategy())
+        order = brk.createLimitOrder(broker.Order.Action.BUY, "ins1", 5, 1)
+        order.setGoodTillCanceled(True)
+        brk.submitOrder(order)
+        barFeed.dispatchBars({"ins1": (10, 10, 9, 10)})
+        self.assertTrue(order.isFilled())
+        self.assertEqual(order.getAvgFillPrice(), 5)
+
+    def testEquityWithMultipleInstruments(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.DAY)
+        brk = self.buildBroker(1000, barFeed)
+        brk.setShares("ins3", 2, 10)
+        self.assertEqual(brk.getEquity(), 1020)
+
+        for instrument in ["ins1", "ins2"]:
+            order = brk.createMarketOrder(broker.Order.Action.BUY, instrument, 10)
+            order.setGoodTillCanceled(True)
+            brk.submitOrder(order)
+        barFeed.dispatchBars({"ins1": (10, 12, 10, 12), "ins2": (20, 21, 20, 21)})
+        self.assertEqual(brk.getCash(), 700)
+        self.assertEqual(brk.getEquity(), 700 + 10 * 12 + 10 * 21 + 20)
+
+        # Only ins1 changes value.
+        barFeed.dispatchBars({"ins1": (12, 15, 12, 15)})
+        self.assertEqual(brk.getEquity(), 700 + 10 * 15 + 10 * 21 + 20)
+        barFeed.dispatchBars({"ins3": (12, 15, 11, 11)})
+        self.assertEqual(brk.getEquity(), 700 + 10 * 15 + 10 * 21 + 2 * 11)
+
+        brk.setCash(500)
+        self.assertEqual(brk.getEquity(), 500 + 10 * 15 + 10 * 21 + 2 * 11)
+
+        # Selling the whole position removes it from the equity.
+        brk.submitOrder(brk.createMarketOrder(broker.Order.Action.SELL, "ins2", 10))
+        barFeed.dispatchBars({"ins2": (22, 25, 22, 25)})
+        self.assertEqual(brk.getShares("ins2"), 0)
+        self.assertEqual(brk.getEquity(), 500 + 220 + 10 * 15 + 2 * 11)
+
+    def testEquityNotCalculatedOnEveryBar(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.DAY)
+        brk = self.buildBroker(800, barFeed)
+        brk.setShares("ins1", 10, 10)
+        brk.setShares("ins2", 10, 10)
+        self.assertEqual(brk.getEquity(), 1000)
+
+        # Bars for different instruments arrive while the equity is not being calculated.
+        barFeed.dispatchBars({"ins1": (20, 20, 20, 20)})
+        barFeed.dispatchBars({"ins2": (10, 10, 10, 10)})
+        self.assertEqual(brk.getEquity(), 1100)
+        barFeed.dispatchBars({"ins2": (15, 15, 15, 15)})
+        barFeed.dispatchBars({"ins1": (20, 20, 20, 20)})
+        self.assertEqual(brk.getEquity(), 1150)
+
+    def testEquityBeforeBrokerGetsBars(self):
+        barFeed = MultiInstrumentBarFeed(bar.Frequency.DAY)
+        equities = []
+        barFeed.getNewValuesEvent().subscribe(lambda dateTime, bars: equities.append(brk.getEquity()))
+        brk = self.buildBroker(800, barFeed)
+        brk.setShares("ins1", 10, 10)
+
+        barFeed.dispatchBars({"ins1": (20, 20, 20, 20)})
+        barFeed.dispatchBars({"ins2": (10, 10, 10, 10)})
+        barFeed.dispatchBars({"ins1": (15, 15, 15, 15)})
+        self.assertEqual(equities, [1000, 1000, 950])
+        self.assertEqual(brk.getEquity(), 950)
+
     def testSetShares(self):
         barFeed = self.buildBarFeed(BaseTestCase.TestInstrument, bar.Frequency.MINUTE)
         brk = self.buildBroker(1000, barFeed)
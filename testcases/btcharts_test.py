@@ -81,3 +81,23 @@ class TestCase(common.TestCase):
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getDateTime(), dt.as_utc(datetime.datetime(2012, 5, 30, 23, 49, 21)))
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getClose(), 5.14)
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getVolume(), 20)
+
+    def testLoadCSVFilesNotSupported(self):
+        feed = barfeed.CSVTradeFeed()
+        with self.assertRaisesRegexp(Exception, "loadCSVFiles is not supported by CSVTradeFeed"):
+            feed.loadCSVFiles([("BTC", common.get_data_file_path("bitstampUSD.csv"))])
+
+    def testStreamingFeed(self):
+        fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 29))
+        toDateTime = datetime.datetime(2012, 5, 31)
+        feed = barfeed.CSVTradeFeed()
+        feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), "bitstampUSD", fromDateTime=fromDateTime, toDateTime=toDateTime)
+        expected = [(dateTime, bars["bitstampUSD"].__getstate__()) for dateTime, bars in feed]
+        self.assertEquals(len(expected), 579)
+
+        for prefetchDepth in [0, 2]:
+            feed = barfeed.StreamingCSVTradeFeed(chunkSize=100, prefetchDepth=prefetchDepth)
+            feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), "bitstampUSD", fromDateTime=fromDateTime, toDateTime=toDateTime)
+            self.assertFalse(feed.barsHaveAdjClose())
+            loaded = [(dateTime, bars["bitstampUSD"].__getstate__()) for dateTime, bars in feed]
+            self.assertEquals(loaded, expected)
@@ -31,6 +31,13 @@ matplotlib.use('Agg')
 from six.moves import xrange
 
 from pyalgotrade import dataseries
+from pyalgotrade.barfeed import csvcache
+
+
+# Keep the tests, and the samples they run, from writing to the CSV cache. Tests that use the cache set their own
+# directory.
+os.environ.pop("PYALGOTRADE_CACHE_DIR", None)
+csvcache.DEFAULT_CACHE_DIR = None
 
 
 class RunResults(object):
@@ -20,6 +20,7 @@
 
 import datetime
 
+import pytz
 from six.moves import xrange
 
 from . import common
@@ -28,6 +29,7 @@ from pyalgotrade import dataseries
 from pyalgotrade.dataseries import bards
 from pyalgotrade.dataseries import aligned
 from pyalgotrade import bar
+from pyalgotrade.utils import dt
 
 
 class TestSequenceDataSeries(common.TestCase):
@@ -142,6 +144,93 @@ class TestSequenceDataSeries(common.TestCase):
         self.assertEqual(ds[0], 90)
         self.assertEqual(ds[-1], 99)
 
+    def testDateTimes(self):
+        tz = pytz.timezone("US/Eastern")
+        begin = dt.localize(datetime.datetime(2011, 3, 13), tz)
+        dateTimes = [tz.normalize(begin + datetime.timedelta(hours=i)) for i in xrange(5)]
+
+        ds = dataseries.SequenceDataSeries(maxLen=3)
+        for i, dateTime in enumerate(dateTimes):
+            ds.appendWithDateTime(dateTime, i)
+        self.assertEqual(ds.getDateTimes(), dateTimes[-3:])
+        self.assertEqual(
+            [dateTime.utcoffset() for dateTime in ds.getDateTimes()],
+            [dateTime.utcoffset() for dateTime in dateTimes[-3:]]
+        )
+        with self.assertRaisesRegexp(Exception, "Invalid datetime. It must be bigger than that last one"):
+            ds.appendWithDateTime(dateTimes[-1], 5)
+
+    def testMixedTimeZones(self):
+        utc = datetime.datetime(2000, 1, 1, tzinfo=pytz.utc)
+        dateTimes = [
+            utc,
+            dt.localize(datetime.datetime(2000, 1, 1, 1), pytz.timezone("US/Eastern")),
+            utc + datetime.timedelta(days=1),
+        ]
+        ds = dataseries.SequenceDataSeries(maxLen=2)
+        for i, dateTime in enumerate(dateTimes):
+            ds.appendWithDateTime(dateTime, i)
+        self.assertEqual(ds.getDateTimes(), dateTimes[1:])
+        self.assertEqual([dateTime.tzinfo for dateTime in ds.getDateTimes()], [dateTime.tzinfo for dateTime in dateTimes[1:]])
+
+        with self.assertRaisesRegexp(TypeError, "can't mix offset-naive and offset-aware datetimes"):
+            ds.appendWithDateTime(datetime.datetime(2001, 1, 1), 3)
+
+    def testDateTimesView(self):
+        now = datetime.datetime(2000, 1, 1)
+        ds = dataseries.SequenceDataSeries(maxLen=2)
+        dateTimes = ds.getDateTimes()
+        self.assertEqual(dateTimes, [])
+        for i in xrange(3):
+            ds.appendWithDateTime(now + datetime.timedelta(seconds=i), i)
+            self.assertEqual(dateTimes[-1], now + datetime.timedelta(seconds=i))
+        self.assertEqual(len(dateTimes), 2)
+        self.assertEqual(dateTimes[:], [now + datetime.timedelta(seconds=i) for i in (1, 2)])
+        self.assertEqual(list(dateTimes), [now + datetime.timedelta(seconds=i) for i in (1, 2)])
+        with self.assertRaises(IndexError):
+            dateTimes[2]
+
+    def testSharedDateTimes(self):
+        now = datetime.datetime(2000, 1, 1)
+        ds = dataseries.SequenceDataSeries(maxLen=4)
+        ds.appendWithDateTime(now, 0)
+
+        # Starts sharing after the first value.
+        shared = dataseries.SequenceDataSeries(maxLen=2)
+        shared._shareDateTimes(ds)
+        for i in xrange(1, 6):
+            dateTime = now + datetime.timedelta(seconds=i)
+            ds.appendWithDateTime(dateTime, i)
+            shared.appendWithDateTime(dateTime, i)
+        self.assertEqual(ds.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in xrange(2, 6)])
+        self.assertEqual(shared.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in xrange(4, 6)])
+
+        # Stops sharing once the datetimes don't match.
+        shared.appendWithDateTime(now + datetime.timedelta(seconds=10), 10)
+        ds.appendWithDateTime(now + datetime.timedelta(seconds=6), 6)
+        self.assertEqual(ds.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in xrange(3, 7)])
+        self.assertEqual(shared.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in (5, 10)])
+        with self.assertRaisesRegexp(Exception, "Invalid datetime. It must be bigger than that last one"):
+            shared.appendWithDateTime(now + datetime.timedelta(seconds=6), 6)
+
+    def testSharedDateTimesResize(self):
+        now = datetime.datetime(2000, 1, 1)
+        ds = dataseries.SequenceDataSeries(maxLen=4)
+        shared = dataseries.SequenceDataSeries(maxLen=4)
+        shared._shareDateTimes(ds)
+        for i in xrange(4):
+            ds.appendWithDateTime(now + datetime.timedelta(seconds=i), i)
+            shared.appendWithDateTime(now + datetime.timedelta(seconds=i), i)
+
+        # Shrinking the dataseries the datetimes belong to should not drop the ones other dataseries are using.
+        ds.setMaxLen(1)
+        self.assertEqual(ds.getDateTimes(), [now + datetime.timedelta(seconds=3)])
+        self.assertEqual(shared.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in xrange(4)])
+        ds.appendWithDateTime(now + datetime.timedelta(seconds=4), 4)
+        shared.appendWithDateTime(now + datetime.timedelta(seconds=4), 4)
+        self.assertEqual(ds.getDateTimes(), [now + datetime.timedelta(seconds=4)])
+        self.assertEqual(shared.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in xrange(1, 5)])
+
 
 class TestBarDataSeries(common.TestCase):
     def testEmpty(self):
@@ -214,6 +303,113 @@ class TestBarDataSeries(common.TestCase):
             self.assertEqual(ds[i].getDateTime(), ds.getDateTimes()[i])
             self.assertEqual(ds.getDateTimes()[i], firstDt + datetime.timedelta(seconds=i))
 
+    def testColumns(self):
+        ds = bards.BarDataSeries(maxLen=4)
+        now = datetime.datetime(2000, 1, 1)
+        for i in xrange(5):
+            ds.append(bar.BasicBar(now + datetime.timedelta(seconds=i), i, i + 2, i - 1, i + 1, 10, None, bar.Frequency.SECOND))
+
+        self.assertEqual(ds.getOpenDataSeries()[:], [1, 2, 3, 4])
+        self.assertEqual(ds.getHighDataSeries()[-1], 6)
+        self.assertEqual(ds.getLowDataSeries()[0], 0)
+        self.assertEqual(ds.getCloseDataSeries().asarray(3).tolist(), [3, 4, 5])
+        self.assertEqual(ds.getVolumeDataSeries().getValueAbsolute(3), 10)
+        self.assertEqual(ds.getAdjCloseDataSeries()[-1], None)
+        self.assertEqual(ds.getCloseDataSeries().getDateTimes(), ds.getDateTimes())
+
+        ds.setMaxLen(2)
+        self.assertEqual(len(ds.getCloseDataSeries()), 2)
+        self.assertEqual(ds.getCloseDataSeries()[:], [4, 5])
+
+        # Columns support the SequenceDataSeries methods, but values can only be appended through the BarDataSeries.
+        closeDS = ds.getCloseDataSeries()
+        self.assertEqual(closeDS.getMaxLen(), 2)
+        closeDS.setMaxLen(1)
+        self.assertEqual(ds.getMaxLen(), 1)
+        self.assertEqual(ds.getOpenDataSeries()[:], [4])
+        with self.assertRaisesRegexp(Exception, "Values can't be appended to a BarDataSeries column"):
+            closeDS.append(1)
+        with self.assertRaisesRegexp(Exception, "Values can't be appended to a BarDataSeries column"):
+            closeDS.appendWithDateTime(now + datetime.timedelta(seconds=5), 1)
+        self.assertEqual(closeDS[:], [5])
+
+    def testColumnEvents(self):
+        ds = bards.BarDataSeries()
+        values = []
+        ds.getCloseDataSeries().getNewValueEvent().subscribe(lambda ds, dateTime, value: values.append(value))
+        self.assertTrue(ds.getCloseDataSeries().getNewValueEvent().hasSubscribers())
+        self.assertFalse(ds.getOpenDataSeries().getNewValueEvent().hasSubscribers())
+
+        now = datetime.datetime(2000, 1, 1)
+        ds.append(bar.BasicBar(now, 1, 2, 0.5, 1.5, 10, None, bar.Frequency.SECOND))
+        self.assertEqual(values, [1.5])
+
+    def testLazyColumns(self):
+        ds = bards.BarDataSeries(maxLen=3)
+        now = datetime.datetime(2000, 1, 1)
+        for i in xrange(5):
+            extra = {"odd": i} if i % 2 else {}
+            ds.append(bar.BasicBar(now + datetime.timedelta(seconds=i), i, i, i, i, i, i, bar.Frequency.SECOND, extra))
+
+        # Columns and extra columns get filled with the values for the bars being held.
+        self.assertEqual(ds.getCloseDataSeries()[:], [2, 3, 4])
+        self.assertEqual(ds.getExtraDataSeries("odd")[:], [3])
+        self.assertEqual(ds.getExtraDataSeries("odd").getDateTimes(), [now + datetime.timedelta(seconds=3)])
+        self.assertEqual(ds.getExtraDataSeries("missing")[:], [])
+
+        ds.append(bar.BasicBar(now + datetime.timedelta(seconds=5), 5, 5, 5, 5, 5, 5, bar.Frequency.SECOND, {"odd": 5}))
+        self.assertEqual(ds.getCloseDataSeries()[:], [3, 4, 5])
+        self.assertEqual(ds.getExtraDataSeries("odd")[:], [3, 5])
+        self.assertEqual(ds.getExtraDataSeries("missing")[:], [])
+
+
+    def testSparseExtraColumn(self):
+        ds = bards.BarDataSeries(maxLen=3)
+        odd = ds.getExtraDataSeries("odd")
+        now = datetime.datetime(2000, 1, 1)
+        for i in xrange(8):
+            extra = {"odd": i} if i in (0, 1, 7) else {}
+            ds.append(bar.BasicBar(now + datetime.timedelta(seconds=i), i, i, i, i, i, i, bar.Frequency.SECOND, extra))
+            if i == 4:
+                self.assertEqual(odd.getDateTimes(), [now, now + datetime.timedelta(seconds=1)])
+
+        self.assertEqual(odd[:], [0, 1, 7])
+        self.assertEqual(odd.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in (0, 1, 7)])
+        self.assertEqual(ds.getDateTimes(), [now + datetime.timedelta(seconds=i) for i in xrange(5, 8)])
+
+
+class TestFloatDataSeries(common.TestCase):
+    def testBasicOps(self):
+        ds = dataseries.FloatDataSeries(maxLen=3)
+        self.assertEqual(len(ds), 0)
+        self.assertEqual(len(ds.asarray()), 0)
+        with self.assertRaises(IndexError):
+            ds[-1]
+
+        ds.append(1)
+        ds.append(None)
+        ds.append(3.5)
+        self.assertEqual(ds[0], 1)
+        self.assertEqual(ds[1], None)
+        self.assertEqual(ds[-1], 3.5)
+        self.assertEqual(ds[:], [1, None, 3.5])
+        self.assertEqual(ds.getValueAbsolute(1), None)
+        self.assertEqual(ds.getValueAbsolute(3), None)
+
+        ds.append(4)
+        self.assertEqual(len(ds), 3)
+        self.assertEqual(ds[:], [None, 3.5, 4])
+        self.assertEqual(ds.asarray(2).tolist(), [3.5, 4])
+        self.assertEqual(ds.asarray(100)[-2:].tolist(), [3.5, 4])
+
+    def testResize(self):
+        ds = dataseries.FloatDataSeries(maxLen=10)
+        for i in xrange(20):
+            ds.append(i)
+        ds.setMaxLen(5)
+        self.assertEqual(len(ds.getDateTimes()), 5)
+        self.assertEqual(ds.asarray().tolist(), [15, 16, 17, 18, 19])
+
 
 class TestDateAlignedDataSeries(common.TestCase):
     def testNotAligned(self):
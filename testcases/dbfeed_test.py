@@ -18,6 +18,7 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
 import os
 
 from six.moves import xrange
@@ -127,3 +128,98 @@ class SQLiteFeedTestCase(common.TestCase):
             self.assertEqual(len(barDS.getHighDataSeries()), 2)
             self.assertEqual(len(barDS.getLowDataSeries()), 2)
             self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
+
+    def testStreamingFeed(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            # Load bars using a Yahoo! feed.
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"), marketsession.USEquities.timezone)
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"), marketsession.USEquities.timezone)
+
+            # Fill the database using the bars from the Yahoo! feed.
+            sqliteFeed = tmpFeed.getFeed()
+            sqliteFeed.getDatabase().addBarsFromFeed(yahooFeed)
+
+            for prefetchDepth in [0, 1, 3]:
+                streamingFeed = sqlitefeed.StreamingFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY, chunkSize=50, prefetchDepth=prefetchDepth)
+                streamingFeed.loadBars("orcl", marketsession.USEquities.timezone)
+                streamingFeed.loadAll()
+
+                # Check that both dataseries have the same bars.
+                yahooDS = yahooFeed["orcl"]
+                streamingDS = streamingFeed["orcl"]
+                self.assertEqual(len(yahooDS), len(streamingDS))
+                for i in xrange(len(yahooDS)):
+                    self.assertEqual(yahooDS[i].getDateTime(), streamingDS[i].getDateTime())
+                    self.assertEqual(yahooDS[i].getClose(), streamingDS[i].getClose())
+                    self.assertEqual(yahooDS[i].getAdjClose(), streamingDS[i].getAdjClose())
+                streamingFeed.getDatabase().disconnect()
+
+    def testAppendBars(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            yahooFeed.loadAll()
+            bars = list(yahooFeed["orcl"])
+
+            db = tmpFeed.getFeed().getDatabase()
+            self.assertEqual(db.setJournalMode("wal"), "WAL")
+            db.setSynchronous("normal")
+            db.appendBars("orcl", bar.Frequency.DAY, bars[:100])
+            # Overlapping bars get replaced.
+            updated = bar.BasicBar(bars[99].getDateTime(), 1, 2, 0.5, 1.5, 10, 1.5, bar.Frequency.DAY)
+            db.appendBars("orcl", bar.Frequency.DAY, [updated] + bars[100:])
+
+            dbBars = db.getBars("orcl", bar.Frequency.DAY)
+            self.assertEqual(len(dbBars), len(bars))
+            self.assertEqual(dbBars[99].getClose(), 1.5)
+            self.assertEqual(dbBars[-1].getDateTime().replace(tzinfo=None), bars[-1].getDateTime())
+            self.assertEqual(dbBars[-1].getClose(), bars[-1].getClose())
+
+            with self.assertRaisesRegexp(Exception, "Invalid journal mode"):
+                db.setJournalMode("wal; drop table bar")
+            with self.assertRaisesRegexp(Exception, "Invalid synchronous level"):
+                db.setSynchronous("fast")
+
+    def testMultiInstrumentStreamingFeed(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2010-yahoofinance.csv"))
+            yahooFeed.addBarsFromCSV("nikkei", common.get_data_file_path("nikkei-2010-yahoofinance.csv"))
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            tmpFeed.getFeed().getDatabase().addBarsFromFeed(yahooFeed)
+
+            fromDateTime = datetime.datetime(2010, 3, 1)
+            expected = sqlitefeed.Feed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+            expected.loadBars("spy", marketsession.USEquities.timezone)
+            expected.loadBars("nikkei", marketsession.TSE.timezone, fromDateTime)
+            expected = [
+                (dateTime, sorted((instrument, bar_.getDateTime(), bar_.__getstate__()) for instrument, bar_ in bars.items()))
+                for dateTime, bars in expected
+            ]
+            self.assertEqual(len(expected), 258)
+
+            streamingFeed = sqlitefeed.MultiInstrumentStreamingFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY, chunkSize=7)
+            streamingFeed.loadBars("spy", marketsession.USEquities.timezone)
+            streamingFeed.loadBars("nikkei", marketsession.TSE.timezone, fromDateTime)
+            streamingFeed.loadBars("missing")
+            with self.assertRaisesRegexp(Exception, "Bars for spy were already loaded"):
+                streamingFeed.loadBars("spy")
+            self.assertEqual(sorted(streamingFeed.getRegisteredInstruments()), ["missing", "nikkei", "spy"])
+            self.assertTrue(streamingFeed.barsHaveAdjClose())
+            self.assertEqual(streamingFeed.peekDateTime(), expected[0][0])
+            actual = [
+                (dateTime, sorted((instrument, bar_.getDateTime(), bar_.__getstate__()) for instrument, bar_ in bars.items()))
+                for dateTime, bars in streamingFeed
+            ]
+            self.assertEqual(actual, expected)
+            self.assertEqual(streamingFeed.getCurrentDateTime(), expected[-1][0])
+            self.assertEqual(streamingFeed["nikkei"][0].getDateTime().tzinfo.zone, "Asia/Tokyo")
+
+            streamingFeed.reset()
+            streamingFeed.loadAll()
+            self.assertEqual(len(streamingFeed["spy"]), 252)
+            streamingFeed.getDatabase().disconnect()
@@ -131,3 +131,23 @@ class DefaultStrategyTestCase(BaseTestCase):
             self.strategy.onOrderFilled(None, self.__getFilledMarketOrder(25, 11))
         self.assertEquals(self.strategy.getVolumeLeft()[BaseTestCase.TestInstrument], 1)
         self.assertEquals(self.strategy.getVolumeUsed()[BaseTestCase.TestInstrument], 24)
+
+    def testVolumeWithMultipleInstruments(self):
+        dateTime = datetime.datetime(2011, 1, 1)
+        bars = bar.Bars({
+            instrument: bar.BasicBar(dateTime, 10, 10, 10, 10, volume, None, bar.Frequency.MINUTE)
+            for instrument, volume in [("ins1", 100), ("ins2", 200)]
+        })
+        order = backtesting.MarketOrder(broker.Order.Action.BUY, "ins1", 10, False, broker.IntegerTraits())
+        order.setState(broker.Order.State.ACCEPTED)
+        self.strategy.onBars(None, bars)
+        order.addExecutionInfo(broker.OrderExecutionInfo(10, 10, 0, dateTime))
+        self.strategy.onOrderFilled(None, order)
+        self.assertEquals(self.strategy.getVolumeLeft(), {"ins1": 15, "ins2": 50})
+        self.assertEquals(self.strategy.getVolumeUsed(), {"ins1": 10, "ins2": 0})
+
+        # The volume used is kept for instruments without bars.
+        dateTime += datetime.timedelta(minutes=1)
+        self.strategy.onBars(None, bar.Bars({"ins2": bar.BasicBar(dateTime, 10, 10, 10, 10, 40, None, bar.Frequency.MINUTE)}))
+        self.assertEquals(self.strategy.getVolumeLeft(), {"ins2": 10})
+        self.assertEquals(self.strategy.getVolumeUsed(), {"ins1": 10, "ins2": 0})
@@ -0,0 +1,203 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import pytz
+
+from . import common
+from . import feed_test
+
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import mmapfeed
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+
+
+def load_yahoo_feed(files={"orcl": ["orcl-2000-yahoofinance.csv", "orcl-2001-yahoofinance.csv"]}, maxLen=None):
+    ret = yahoofeed.Feed(maxLen=maxLen)
+    for instrument, fileNames in files.items():
+        for fileName in fileNames:
+            ret.addBarsFromCSV(instrument, common.get_data_file_path(fileName), marketsession.USEquities.timezone)
+    return ret
+
+
+class MMapFeedTestCase(common.TestCase):
+    def testBaseFeedInterface(self):
+        with common.TmpDir() as tmpPath:
+            mmapFeed = mmapfeed.Feed(tmpPath, bar.Frequency.DAY)
+            mmapFeed.getDatabase().addBarsFromFeed(load_yahoo_feed())
+            mmapFeed.loadBars("orcl")
+            feed_test.tstBaseFeedInterface(self, mmapFeed)
+
+    def testLoadDailyBars(self):
+        with common.TmpDir() as tmpPath:
+            yahooFeed = load_yahoo_feed()
+            mmapFeed = mmapfeed.Feed(tmpPath, bar.Frequency.DAY)
+            mmapFeed.getDatabase().addBarsFromFeed(yahooFeed)
+            mmapFeed.loadBars("orcl", marketsession.USEquities.timezone)
+            mmapFeed.loadAll()
+
+            yahooDS = yahooFeed["orcl"]
+            mmapDS = mmapFeed["orcl"]
+            self.assertEqual(len(yahooDS), 500)
+            self.assertEqual(len(yahooDS), len(mmapDS))
+            for yahooBar, mmapBar in zip(yahooDS, mmapDS):
+                self.assertEqual(yahooBar.getDateTime(), mmapBar.getDateTime())
+                self.assertEqual(str(mmapBar.getDateTime().tzinfo), str(yahooBar.getDateTime().tzinfo))
+                self.assertEqual(yahooBar.getOpen(), mmapBar.getOpen())
+                self.assertEqual(yahooBar.getHigh(), mmapBar.getHigh())
+                self.assertEqual(yahooBar.getLow(), mmapBar.getLow())
+                self.assertEqual(yahooBar.getClose(), mmapBar.getClose())
+                self.assertEqual(yahooBar.getVolume(), mmapBar.getVolume())
+                self.assertEqual(yahooBar.getAdjClose(), mmapBar.getAdjClose())
+
+    def testMultipleInstruments(self):
+        with common.TmpDir() as tmpPath:
+            yahooFeed = load_yahoo_feed({
+                "orcl": ["orcl-2000-yahoofinance.csv", "orcl-2001-yahoofinance.csv"],
+                "orcl2001": ["orcl-2001-yahoofinance.csv"],
+            })
+            db = mmapfeed.Database(tmpPath)
+            db.addBarsFromFeed(yahooFeed)
+            yahooFeed.reset()
+
+            mmapFeed = mmapfeed.Feed(tmpPath, bar.Frequency.DAY)
+            mmapFeed.loadBars("orcl", marketsession.USEquities.timezone)
+            mmapFeed.loadBars("orcl2001", marketsession.USEquities.timezone)
+            for (yahooDateTime, yahooBars), (mmapDateTime, mmapBars) in zip(yahooFeed, mmapFeed):
+                self.assertEqual(yahooDateTime, mmapDateTime)
+                self.assertEqual(sorted(yahooBars.getInstruments()), sorted(mmapBars.getInstruments()))
+                for instrument in yahooBars.getInstruments():
+                    self.assertEqual(yahooBars[instrument].getClose(), mmapBars[instrument].getClose())
+            self.assertTrue(mmapFeed.eof())
+            self.assertEqual(len(mmapFeed["orcl"]), len(yahooFeed["orcl"]))
+            self.assertEqual(len(mmapFeed["orcl2001"]), len(yahooFeed["orcl2001"]))
+
+    def testDateRange(self):
+        with common.TmpDir() as tmpPath:
+            db = mmapfeed.Database(tmpPath)
+            db.addBarsFromFeed(load_yahoo_feed())
+
+            fromDateTime = marketsession.USEquities.timezone.localize(datetime.datetime(2001, 1, 1))
+            toDateTime = marketsession.USEquities.timezone.localize(datetime.datetime(2001, 1, 31))
+            columns = db.getColumns("orcl", bar.Frequency.DAY, fromDateTime, toDateTime)
+            bars = db.getBars("orcl", bar.Frequency.DAY, marketsession.USEquities.timezone, fromDateTime, toDateTime)
+            self.assertEqual(len(columns["close"]), 21)
+            self.assertEqual(len(bars), 21)
+            self.assertEqual(bars[0].getDateTime(), fromDateTime + datetime.timedelta(days=1))
+            self.assertEqual(bars[-1].getDateTime(), toDateTime)
+            self.assertEqual(list(columns["close"]), [bar_.getClose() for bar_ in bars])
+
+            mmapFeed = mmapfeed.Feed(tmpPath, bar.Frequency.DAY)
+            mmapFeed.loadBars("orcl", fromDateTime=fromDateTime, toDateTime=toDateTime)
+            mmapFeed.loadAll()
+            self.assertEqual(len(mmapFeed["orcl"]), 21)
+
+    def testAppendAndReplace(self):
+        def build_bar(day, close, adjClose=None):
+            dateTime = datetime.datetime(2013, 1, day)
+            return bar.BasicBar(dateTime, close, close, close, close, 10, adjClose, bar.Frequency.DAY)
+
+        with common.TmpDir() as tmpPath:
+            db = mmapfeed.Database(tmpPath)
+            db.appendBars("btc/usd", bar.Frequency.DAY, [build_bar(1, 10), build_bar(2, 11, 11)])
+            db.appendBars("btc/usd", bar.Frequency.DAY, [build_bar(3, 12)])
+            db.addBar("btc/usd", build_bar(4, 13), bar.Frequency.DAY)
+            # Replace one bar and insert a missing one.
+            db.appendBars("btc/usd", bar.Frequency.DAY, [build_bar(2, 20), build_bar(6, 15), build_bar(5, 14)])
+
+            bars = db.getBars("BTC/USD", bar.Frequency.DAY)
+            self.assertEqual([bar_.getDateTime() for bar_ in bars], [
+                datetime.datetime(2013, 1, day, tzinfo=pytz.utc) for day in range(1, 7)
+            ])
+            self.assertEqual([bar_.getClose() for bar_ in bars], [10, 20, 12, 13, 14, 15])
+            self.assertEqual([bar_.getAdjClose() for bar_ in bars], [None] * 6)
+            self.assertEqual(db.getBars("btc/usd", bar.Frequency.MINUTE), [])
+
+    def testInterruptedWrite(self):
+        with common.TmpDir() as tmpPath:
+            db = mmapfeed.Database(tmpPath)
+            db.addBarsFromFeed(load_yahoo_feed())
+            # Simulate an append that stopped before the manifest was updated.
+            path = os.path.join(tmpPath, "ORCL", str(bar.Frequency.DAY), "gen-0", "close.bin")
+            with open(path, "ab") as f:
+                f.write(b"\x00" * 8)
+            self.assertEqual(len(db.getBars("orcl", bar.Frequency.DAY)), 500)
+            newBar = bar.BasicBar(datetime.datetime(2002, 1, 2), 1, 1, 1, 1, 1, 1, bar.Frequency.DAY)
+            db.addBar("orcl", newBar, bar.Frequency.DAY)
+            bars = db.getBars("orcl", bar.Frequency.DAY)
+            self.assertEqual(len(bars), 501)
+            self.assertEqual(bars[-1].getClose(), 1)
+
+    def testInterruptedRewrite(self):
+        with common.TmpDir() as tmpPath:
+            db = mmapfeed.Database(tmpPath)
+            db.addBarsFromFeed(load_yahoo_feed())
+            expected = [bar_.__getstate__() for bar_ in db.getBars("orcl", bar.Frequency.DAY)]
+            # Simulate a rewrite that stopped before the manifest was updated.
+            path = os.path.join(tmpPath, "ORCL", str(bar.Frequency.DAY), "gen-1")
+            os.makedirs(path)
+            with open(os.path.join(path, "close.bin"), "wb") as f:
+                f.write(b"\x00" * 8)
+            self.assertEqual([bar_.__getstate__() for bar_ in db.getBars("orcl", bar.Frequency.DAY)], expected)
+
+            # Rewrite all the values by inserting a bar before the others.
+            newBar = bar.BasicBar(datetime.datetime(1999, 1, 4), 1, 1, 1, 1, 1, 1, bar.Frequency.DAY)
+            db.addBar("orcl", newBar, bar.Frequency.DAY)
+            bars = db.getBars("orcl", bar.Frequency.DAY)
+            self.assertEqual(len(bars), 501)
+            self.assertEqual(bars[0].getClose(), 1)
+            self.assertEqual([bar_.__getstate__() for bar_ in bars[1:]], expected)
+            self.assertEqual(sorted(os.listdir(os.path.dirname(path))), ["gen-1", "manifest.json"])
+
+    def testMissingValues(self):
+        with common.TmpDir() as tmpPath:
+            db = mmapfeed.Database(tmpPath)
+            db.addBarsFromFeed(load_yahoo_feed())
+            path = os.path.join(tmpPath, "ORCL", str(bar.Frequency.DAY), "gen-0", "volume.bin")
+            with open(path, "r+b") as f:
+                f.truncate(8 * 499)
+            with self.assertRaisesRegexp(Exception, "Column volume in .* has 499 values but 500 were expected"):
+                db.getBars("orcl", bar.Frequency.DAY)
+
+    def testBounded(self):
+        with common.TmpDir() as tmpPath:
+            mmapFeed = mmapfeed.Feed(tmpPath, bar.Frequency.DAY, maxLen=2)
+            mmapFeed.getDatabase().addBarsFromFeed(load_yahoo_feed(maxLen=1))
+            mmapFeed.loadBars("orcl")
+            mmapFeed.loadAll()
+
+            barDS = mmapFeed["orcl"]
+            self.assertEqual(len(barDS), 2)
+            self.assertEqual(len(barDS.getCloseDataSeries()), 2)
+
+    def testReset(self):
+        with common.TmpDir() as tmpPath:
+            mmapFeed = mmapfeed.Feed(tmpPath, bar.Frequency.DAY)
+            mmapFeed.getDatabase().addBarsFromFeed(load_yahoo_feed())
+            mmapFeed.loadBars("orcl")
+            mmapFeed.loadAll()
+            lastDateTime = mmapFeed.getCurrentDateTime()
+            mmapFeed.reset()
+            self.assertFalse(mmapFeed.eof())
+            mmapFeed.loadAll()
+            self.assertEqual(mmapFeed.getCurrentDateTime(), lastDateTime)
@@ -20,8 +20,14 @@
 
 import datetime
 import copy
+import threading
+import time
+import unittest
 
+import six
 from six.moves import xrange
+if six.PY3:
+    import asyncio
 
 from . import common
 
@@ -97,6 +103,102 @@ class RealtimeFeed(observer.Subject):
         return self.__priority
 
 
+# A realtime subject that receives events from another thread.
+class QueueFeed(observer.Subject):
+    def __init__(self):
+        super(QueueFeed, self).__init__()
+        self.__queue = dispatcher.WakeUpQueue()
+        self.__event = observer.Event()
+        self.__eof = False
+
+    def getQueue(self):
+        return self.__queue
+
+    def getEvent(self):
+        return self.__event
+
+    def start(self):
+        super(QueueFeed, self).start()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__eof
+
+    def dispatch(self):
+        ret = False
+        while not self.__queue.empty():
+            value = self.__queue.get(False)
+            if value is None:
+                self.__eof = True
+            else:
+                self.__event.emit(value)
+                ret = True
+        return ret
+
+    def peekDateTime(self):
+        return None
+
+    def onDispatcherRegistered(self, dispatcher):
+        super(QueueFeed, self).onDispatcherRegistered(dispatcher)
+        self.__queue.setDispatcher(dispatcher)
+
+    def notifiesDispatcher(self):
+        return True
+
+
+# A QueueFeed that gets its events from callbacks scheduled on the dispatcher's event loop.
+class EventLoopFeed(QueueFeed):
+    def __init__(self, count):
+        super(EventLoopFeed, self).__init__()
+        self.__count = count
+
+    def runsOnEventLoop(self):
+        return True
+
+    def startAsync(self):
+        loop = asyncio.get_event_loop()
+        for i in xrange(self.__count):
+            loop.call_later(0.01 * (i + 1), self.getQueue().put, i)
+        loop.call_later(0.01 * (self.__count + 1), self.getQueue().put, None)
+        return asyncio.sleep(0)
+
+    def joinAsync(self):
+        return asyncio.sleep(0)
+
+
+# A non realtime subject that skips some of its events, without dispatching them, after the first one is peeked.
+class SkippingFeed(NonRealtimeFeed):
+    def __init__(self, datetimes, skip):
+        super(SkippingFeed, self).__init__(datetimes)
+        self.__datetimes = datetimes
+        self.__skip = skip
+
+    def peekDateTime(self):
+        ret = super(SkippingFeed, self).peekDateTime()
+        if self.__skip:
+            self.__skip -= 1
+            self.__datetimes.pop(0)
+        return ret
+
+
+# A realtime subject that doesn't notify the dispatcher, and hits eof after some time without generating events.
+class PollingFeed(RealtimeFeed):
+    def __init__(self, duration):
+        super(PollingFeed, self).__init__([])
+        self.__deadline = time.time() + duration
+
+    def eof(self):
+        return time.time() >= self.__deadline
+
+    def dispatch(self):
+        return False
+
+
 class DispatcherTestCase(common.TestCase):
     def test1NrtFeed(self):
         values = []
@@ -224,6 +326,108 @@ class DispatcherTestCase(common.TestCase):
         # Check that although feed2 is realtime, feed1 was dispatched before.
         self.assertTrue(values[0] < values[1])
 
+    def testManyNrtFeeds(self):
+        values = []
+        now = datetime.datetime.now()
+        disp = dispatcher.Dispatcher()
+        for i in reversed(xrange(10)):
+            datetimes = [now + datetime.timedelta(seconds=j) for j in xrange(i, 30, i + 1)]
+            feed = NonRealtimeFeed(datetimes)
+            feed.getEvent().subscribe(lambda x, i=i: values.append((x, i)))
+            disp.addSubject(feed)
+        disp.run()
+
+        # Events with the same datetime are dispatched following the subjects order.
+        expected = sorted(
+            [(now + datetime.timedelta(seconds=j), i) for i in xrange(10) for j in xrange(i, 30, i + 1)],
+            key=lambda value: (value[0], 9 - value[1])
+        )
+        self.assertEqual(values, expected)
+
+    def testNextDateTimeMovesLater(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes = [now + datetime.timedelta(seconds=i) for i in xrange(5)]
+        disp = dispatcher.Dispatcher()
+        skippingFeed = SkippingFeed(list(datetimes), 2)
+        skippingFeed.getEvent().subscribe(lambda x: values.append((x, 0)))
+        disp.addSubject(skippingFeed)
+        feed = NonRealtimeFeed(list(datetimes))
+        feed.getEvent().subscribe(lambda x: values.append((x, 1)))
+        disp.addSubject(feed)
+        disp.run()
+
+        # The first two events from the skipping feed never get dispatched, and the rest are still in order.
+        expected = [(dateTime, 1) for dateTime in datetimes[:2]]
+        for dateTime in datetimes[2:]:
+            expected.extend([(dateTime, 0), (dateTime, 1)])
+        self.assertEqual(values, expected)
+
+    def testWakeUp(self):
+        values = []
+        idleEvents = []
+        feed = QueueFeed()
+        feed.getEvent().subscribe(values.append)
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed)
+        disp.getIdleEvent().subscribe(lambda: idleEvents.append(1))
+
+        def produce():
+            for i in range(5):
+                time.sleep(0.05)
+                feed.getQueue().put(i)
+            feed.getQueue().put(None)
+
+        producer = threading.Thread(target=produce)
+        begin = time.time()
+        producer.start()
+        disp.run()
+        producer.join()
+
+        self.assertEqual(values, list(range(5)))
+        # The dispatcher should sleep while idle instead of polling the feed, and get woken up by the producer.
+        self.assertLess(len(idleEvents), 20)
+        self.assertLess(time.time() - begin, 1)
+
+    @unittest.skipIf(six.PY2, "Requires Python 3")
+    def testEventLoop(self):
+        values = []
+        feed = EventLoopFeed(5)
+        feed.getEvent().subscribe(values.append)
+        nrtValues = []
+        now = datetime.datetime.now()
+        nrtFeed = NonRealtimeFeed([now + datetime.timedelta(seconds=i) for i in xrange(3)])
+        nrtFeed.getEvent().subscribe(nrtValues.append)
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed)
+        disp.addSubject(nrtFeed)
+        disp.run()
+        self.assertEqual(values, list(range(5)))
+        self.assertEqual(len(nrtValues), 3)
+
+    @unittest.skipIf(six.PY2, "Requires Python 3")
+    def testEventLoopPollingSubject(self):
+        idleEvents = []
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(EventLoopFeed(0))
+        disp.addSubject(PollingFeed(0.3))
+        disp.getIdleEvent().subscribe(lambda: idleEvents.append(1))
+        disp.run()
+        # Subjects that don't notify the dispatcher should be polled every now and then, not continuously.
+        self.assertLess(len(idleEvents), 20)
+
+    @unittest.skipIf(six.PY2, "Requires Python 3")
+    def testEventLoopException(self):
+        def handler(value):
+            raise Exception("Handler failed")
+
+        feed = EventLoopFeed(5)
+        feed.getEvent().subscribe(handler)
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed)
+        with self.assertRaisesRegexp(Exception, "Handler failed"):
+            disp.run()
+
 
 class EventTestCase(common.TestCase):
     def testEmitOrder(self):
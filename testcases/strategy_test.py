@@ -216,6 +216,49 @@ class StrategyOrderTestCase(StrategyTestCase):
         self.assertEqual(o.getExecutionInfo().getDateTime(), datetime.datetime(2000, 1, 10))
 
 
+class RebalanceTestCase(StrategyTestCase):
+    def testRebalance(self):
+        strat = self.createStrategy()
+        strat.getBroker().setShares("orcl", 3, 10)
+        strat.getBroker().setShares("msft", 1, 10)
+
+        orders = strat.rebalance({"orcl": 1, "msft": 1, StrategyTestCase.TestInstrument: 2}, goodTillCanceled=True)
+        self.assertEqual(len(orders), 2)
+        # Sell orders go first.
+        self.assertEqual(orders[0].getInstrument(), "orcl")
+        self.assertEqual(orders[0].getAction(), broker.Order.Action.SELL)
+        self.assertEqual(orders[0].getQuantity(), 2)
+        self.assertEqual(orders[1].getInstrument(), StrategyTestCase.TestInstrument)
+        self.assertEqual(orders[1].getAction(), broker.Order.Action.BUY)
+        self.assertEqual(orders[1].getQuantity(), 2)
+        self.assertTrue(all(order.isSubmitted() and order.getGoodTillCanceled() for order in orders))
+        self.assertEqual(strat.orderUpdatedCalls, 2)
+        self.assertEqual(strat.rebalance({"msft": 1}), [])
+
+    def testRebalanceRoundsQuantities(self):
+        strat = self.createStrategy()
+        strat.getBroker().setShares("orcl", 0.1 + 0.2, 10)
+
+        # Differences smaller than what the instrument supports don't generate orders.
+        self.assertEqual(strat.rebalance({"orcl": 0.3}), [])
+        orders = strat.rebalance({"orcl": 2.8})
+        self.assertEqual(len(orders), 1)
+        self.assertEqual(orders[0].getQuantity(), 2)
+
+    def testSubmitOrders(self):
+        strat = self.createStrategy()
+
+        orders = [
+            strat.getBroker().createMarketOrder(broker.Order.Action.BUY, StrategyTestCase.TestInstrument, quantity)
+            for quantity in [1, 2]
+        ]
+        strat.submitOrders(orders)
+        strat.run()
+        self.assertTrue(all(order.isFilled() for order in orders))
+        self.assertEqual(strat.getBroker().getShares(StrategyTestCase.TestInstrument), 3)
+        self.assertEqual(strat.orderUpdatedCalls, 6)
+
+
 class OptionalOverridesTestCase(StrategyTestCase):
     def testOnStartIdleFinish(self):
         strat = self.createStrategy()
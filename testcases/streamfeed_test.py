@@ -0,0 +1,234 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2018 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+from . import common
+from . import barfeed_test
+from . import feed_test
+
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import streamfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+
+
+def build_streaming_feed(files, chunkSize=10, timezone=None):
+    ret = csvfeed.StreamingBarFeed(bar.Frequency.DAY, chunkSize=chunkSize)
+    for instrument, fileNames in files:
+        for fileName in fileNames:
+            rowParser = yahoofeed.RowParser(ret.getDailyBarTime(), bar.Frequency.DAY, timezone)
+            ret.addBarsFromCSV(instrument, common.get_data_file_path(fileName), rowParser)
+    return ret
+
+
+def build_yahoo_feed(files, timezone=None):
+    ret = yahoofeed.Feed()
+    for instrument, fileNames in files:
+        for fileName in fileNames:
+            ret.addBarsFromCSV(instrument, common.get_data_file_path(fileName), timezone)
+    return ret
+
+
+class StreamingBarFeedTestCase(common.TestCase):
+    def __writeCSV(self, path, lines):
+        with open(path, "w") as f:
+            f.write("\n".join(lines))
+
+    def __getValues(self, barFeed):
+        ret = []
+        for dateTime, bars in barFeed:
+            ret.append((dateTime, sorted((instrument, bars[instrument].__getstate__()) for instrument in bars.keys())))
+        return ret
+
+    def testBaseFeedInterface(self):
+        barFeed = build_streaming_feed([("orcl", ["orcl-2000-yahoofinance.csv"])])
+        feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testBaseBarFeed(self):
+        barFeed = build_streaming_feed([("orcl", ["orcl-2000-yahoofinance.csv"])])
+        barfeed_test.check_base_barfeed(self, barFeed, True)
+
+    def testSameBarsAsYahooFeed(self):
+        files = [
+            ("orcl", ["orcl-2000-yahoofinance.csv", "orcl-2001-yahoofinance.csv"]),
+            ("orcl2001", ["orcl-2001-yahoofinance.csv"]),
+        ]
+        timezone = marketsession.USEquities.getTimezone()
+        for chunkSize in [1, 7, 1000]:
+            expected = self.__getValues(build_yahoo_feed(files, timezone))
+            barFeed = build_streaming_feed(files, chunkSize, timezone)
+            self.assertEqual(self.__getValues(barFeed), expected)
+            self.assertEqual(len(barFeed["orcl"]), 500)
+            self.assertEqual(len(barFeed["orcl2001"]), 248)
+
+    def testPeekDateTime(self):
+        barFeed = build_streaming_feed([
+            ("orcl", ["orcl-2001-yahoofinance.csv"]),
+            ("orcl2000", ["orcl-2000-yahoofinance.csv"]),
+        ])
+        self.assertEqual(barFeed.peekDateTime(), datetime.datetime(2000, 1, 3))
+        self.assertFalse(barFeed.eof())
+        barFeed.start()
+        dateTime, bars = barFeed.getNextValuesAndUpdateDS()
+        self.assertEqual(dateTime, datetime.datetime(2000, 1, 3))
+        self.assertEqual(bars.getInstruments(), ["orcl2000"])
+        self.assertEqual(barFeed.peekDateTime(), datetime.datetime(2000, 1, 4))
+        barFeed.stop()
+        barFeed.join()
+
+    def testReset(self):
+        barFeed = build_streaming_feed([("orcl", ["orcl-2000-yahoofinance.csv"])])
+        barFeed.loadAll()
+        self.assertTrue(barFeed.eof())
+        lastDateTime = barFeed.getCurrentDateTime()
+        barFeed.reset()
+        self.assertFalse(barFeed.eof())
+        barFeed.loadAll()
+        self.assertEqual(barFeed.getCurrentDateTime(), lastDateTime)
+        self.assertEqual(len(barFeed["orcl"]), 252)
+
+    def testDuplicateBars(self):
+        barFeed = build_streaming_feed([("orcl", ["orcl-2000-yahoofinance.csv", "orcl-2000-yahoofinance.csv"])])
+        with self.assertRaisesRegexp(Exception, "Bar date times are not in order.*"):
+            barFeed.loadAll()
+
+    def testBarsNotInOrder(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            # The first two bars are in ascending order, so the file is not reversed.
+            self.__writeCSV(path, [
+                "Date,Open,High,Low,Close,Volume,Adj Close",
+                "2013-01-01,10,12,9,11,100,11",
+                "2013-01-03,10,12,9,11,100,11",
+                "2013-01-02,10,12,9,11,100,11",
+            ])
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY, chunkSize=10)
+            rowParser = yahoofeed.RowParser(barFeed.getDailyBarTime(), bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path, rowParser)
+            with self.assertRaisesRegexp(Exception, "Bar date times are not in order for orcl.*"):
+                barFeed.loadAll()
+
+    def testBarFilterAndMalformedBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            self.__writeCSV(path, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close",
+                "2013-01-01 00:00:00,10,12,9,11,100,",
+                "2013-01-02 00:00:00,10,12,9,a,100,",
+                "",
+                "2013-01-03 00:00:00,10,12,9,11,100,",
+                "2013-01-04 00:00:00,10,12,9,11,100,",
+            ])
+            barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY, chunkSize=2)
+            barFeed.setBarFilter(csvfeed.DateRangeFilter(toDate=datetime.datetime(2013, 1, 3)))
+            rowParser = csvfeed.GenericRowParser(
+                {
+                    "datetime": "Date Time", "open": "Open", "high": "High", "low": "Low", "close": "Close",
+                    "volume": "Volume", "adj_close": "Adj Close"
+                },
+                "%Y-%m-%d %H:%M:%S", None, bar.Frequency.DAY, None
+            )
+            barFeed.addBarsFromCSV("orcl", path, rowParser, skipMalformedBars=True)
+            self.assertFalse(barFeed.barsHaveAdjClose())
+            barFeed.loadAll()
+
+        self.assertEqual(
+            [bar_.getDateTime() for bar_ in barFeed["orcl"]],
+            [datetime.datetime(2013, 1, 1), datetime.datetime(2013, 1, 3)]
+        )
+
+    def testPrefetch(self):
+        files = [
+            ("orcl", ["orcl-2000-yahoofinance.csv", "orcl-2001-yahoofinance.csv"]),
+            ("orcl2001", ["orcl-2001-yahoofinance.csv"]),
+        ]
+        expected = self.__getValues(build_yahoo_feed(files))
+        barFeed = csvfeed.StreamingBarFeed(bar.Frequency.DAY, chunkSize=7, prefetchDepth=2)
+        for instrument, fileNames in files:
+            for fileName in fileNames:
+                rowParser = yahoofeed.RowParser(barFeed.getDailyBarTime(), bar.Frequency.DAY)
+                barFeed.addBarsFromCSV(instrument, common.get_data_file_path(fileName), rowParser)
+        self.assertEqual(self.__getValues(barFeed), expected)
+        barFeed.reset()
+        self.assertEqual(self.__getValues(barFeed), expected)
+
+    def testPrefetchIterator(self):
+        values = list(range(100))
+        self.assertEqual(list(streamfeed.PrefetchIterator(iter(values), 1)), values)
+        self.assertEqual(list(streamfeed.PrefetchIterator(iter(values), 10)), values)
+        self.assertEqual(list(streamfeed.PrefetchIterator(iter([]), 10)), [])
+
+    def testPrefetchIteratorError(self):
+        def values():
+            yield 1
+            yield 2
+            raise Exception("Failed")
+
+        iterator = streamfeed.PrefetchIterator(values(), 1)
+        self.assertEqual(next(iterator), 1)
+        self.assertEqual(next(iterator), 2)
+        with self.assertRaisesRegexp(Exception, "Failed"):
+            next(iterator)
+        with self.assertRaises(StopIteration):
+            next(iterator)
+
+    def testPrefetchIteratorClose(self):
+        state = {"closed": False}
+
+        def values():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                state["closed"] = True
+
+        iterator = streamfeed.PrefetchIterator(values(), 2)
+        self.assertEqual(next(iterator), 0)
+        iterator.close()
+        self.assertTrue(state["closed"])
+        with self.assertRaises(StopIteration):
+            next(iterator)
+
+    def testBoundedMemory(self):
+        class Source(object):
+            def __init__(self, count):
+                self.count = count
+                self.maxPending = 0
+
+            def __call__(self):
+                for i in range(self.count):
+                    self.maxPending = max(self.maxPending, i - self.consumed)
+                    dateTime = datetime.datetime(2000, 1, 1) + datetime.timedelta(days=i)
+                    yield [bar.BasicBar(dateTime, 1, 1, 1, 1, 1, None, bar.Frequency.DAY)]
+
+        source = Source(100)
+        barFeed = streamfeed.BarFeed(bar.Frequency.DAY)
+        barFeed.addBarSource("orcl", source)
+        source.consumed = 0
+        for dateTime, bars in barFeed:
+            source.consumed += 1
+        self.assertEqual(source.consumed, 100)
+        # Only one bar was read ahead of the one being processed.
+        self.assertEqual(source.maxPending, 1)
@@ -19,7 +19,9 @@
 """
 
 import datetime
+import pickle
 
+import pytz
 from six.moves import xrange
 
 from . import common
@@ -301,6 +303,23 @@ class NumPyDequeTestCase(CollectionTestCaseBase):
             d.append(i)
         self.assertEqual(d[0:3].sum(), 3)
 
+    def testWrapAround(self):
+        d = collections.NumPyDeque(3)
+
+        for i in xrange(10):
+            d.append(i)
+            self.assertEqual(len(d), min(i + 1, 3))
+            self.assertEqual(d[-1], i)
+            self.assertEqual(list(d.data()), list(range(max(0, i - 2), i + 1)))
+
+        d.resize(5)
+        d.append(10)
+        d.append(11)
+        self.assertEqual(list(d.data()), [7, 8, 9, 10, 11])
+        d.append(12)
+        self.assertEqual(list(d.data()), [8, 9, 10, 11, 12])
+        self.assertEqual(d[0], 8)
+
 
 class ListDequeTestCase(CollectionTestCaseBase):
     def buildCollection(self, maxLen):
@@ -315,6 +334,28 @@ class ListDequeTestCase(CollectionTestCaseBase):
     def testResizeEmpty(self):
         CollectionTestCaseBase._testResizeEmptyImpl(self)
 
+    def testManyAppends(self):
+        d = collections.ListDeque(4)
+
+        for i in xrange(20):
+            d.append(i)
+            expected = list(range(max(0, i - 3), i + 1))
+            self.assertEqual(len(d), len(expected))
+            self.assertEqual(d[0], expected[0])
+            self.assertEqual(d[-1], expected[-1])
+            self.assertEqual(d[1:], expected[1:])
+            self.assertEqual(d[-2:], expected[-2:])
+            self.assertEqual(d[::-1], expected[::-1])
+            with self.assertRaises(IndexError):
+                d[len(expected)]
+            with self.assertRaises(IndexError):
+                d[-len(expected) - 1]
+        self.assertEqual(d.data(), [16, 17, 18, 19])
+
+        d.append(20)
+        d.resize(2)
+        self.assertEqual(d.data(), [19, 20])
+
 
 class DateTimeTestCase(common.TestCase):
     def testTimeStampConversions(self):
@@ -338,3 +379,62 @@ class DateTimeTestCase(common.TestCase):
     def testGetLastMonday(self):
         self.assertEquals(dt.get_last_monday(2010), datetime.date(2010, 12, 27))
         self.assertEquals(dt.get_last_monday(2011), datetime.date(2011, 12, 26))
+
+    def testParseDateTimes(self):
+        self.assertEqual(
+            dt.parse_datetimes(["2011-01-03 09:30:00", "2012-02-29 23:59:59"], "%Y-%m-%d %H:%M:%S"),
+            [datetime.datetime(2011, 1, 3, 9, 30), datetime.datetime(2012, 2, 29, 23, 59, 59)]
+        )
+        self.assertEqual(dt.parse_datetimes(["20110103 093000"], "%Y%m%d %H%M%S"), [datetime.datetime(2011, 1, 3, 9, 30)])
+        self.assertEqual(dt.parse_datetimes([], "%Y%m%d"), [])
+
+    def testParseDateTimesInvalid(self):
+        with self.assertRaisesRegexp(ValueError, "Unsupported format"):
+            dt.parse_datetimes(["3-Dec-05"], "%d-%b-%y")
+        for value in ["2011-1-03", "2011-01-033", "2011/01/03", "2011-01-0a"]:
+            with self.assertRaisesRegexp(ValueError, "Values don't match"):
+                dt.parse_datetimes(["2011-01-02", value], "%Y-%m-%d")
+        for value in ["2011-02-29", "2011-13-01", "2011-01-00", "0000-01-01"]:
+            with self.assertRaisesRegexp(ValueError, "Values out of range"):
+                dt.parse_datetimes([value], "%Y-%m-%d")
+        with self.assertRaisesRegexp(ValueError, "Values out of range"):
+            dt.parse_datetimes(["2011-01-01 24:00:00"], "%Y-%m-%d %H:%M:%S")
+
+    def testDateTimeParser(self):
+        for dateTimeFormat, value in [
+            ("%Y-%m-%d %H:%M:%S", "2011-01-03 09:30:59"),
+            ("%Y%m%d", "20110103"),
+            ("%d/%m/%Y %H:%M", "03/01/2011 09:30"),
+            ("%d-%b-%y", "03-Jan-11"),
+            # These don't match the fixed width format so strptime is used.
+            ("%Y-%m-%d %H:%M:%S", "2011-1-3 9:30:59"),
+            ("%Y-%m-%d %H:%M:%S", "2011-01-03  09:30:59"),
+        ]:
+            parser = dt.datetime_parser(dateTimeFormat)
+            self.assertEqual(parser(value), datetime.datetime.strptime(value, dateTimeFormat))
+            self.assertEqual(pickle.loads(pickle.dumps(parser))(value), parser(value))
+
+        parser = dt.datetime_parser("%Y-%m-%d")
+        with self.assertRaisesRegexp(ValueError, "day is out of range for month"):
+            parser("2011-02-29")
+        with self.assertRaisesRegexp(ValueError, "unconverted data remains"):
+            parser("2011-02-01 ")
+
+    def testLocalizer(self):
+        for timeZone in [pytz.timezone("US/Eastern"), pytz.timezone("Europe/London"), pytz.utc]:
+            localizer = dt.Localizer(timeZone)
+            # Go through the DST changes twice to hit the cache.
+            for _ in range(2):
+                dateTime = datetime.datetime(2011, 3, 12)
+                while dateTime < datetime.datetime(2011, 11, 8):
+                    for value in [dateTime, dt.as_utc(dateTime)]:
+                        localized = localizer.localize(value)
+                        expected = dt.localize(value, timeZone)
+                        self.assertEqual(localized, expected)
+                        self.assertEqual(localized.utcoffset(), expected.utcoffset())
+                        self.assertEqual(localized.tzinfo, expected.tzinfo)
+                    dateTime += datetime.timedelta(minutes=17)
+
+        localizer = dt.Localizer(pytz.timezone("US/Eastern"))
+        dateTime = dt.localize(datetime.datetime(2011, 1, 1), pytz.timezone("Asia/Tokyo"))
+        self.assertEqual(localizer.localize(dateTime), dt.localize(dateTime, pytz.timezone("US/Eastern")))
@@ -29,6 +29,8 @@ class WebSocketServerThread(threading.Thread):
 
     def stop(self):
         self.__server.shutdown()
+        # Close the websockets and stop the manager thread.
+        self.__server.server_close()
 
 
 # webSocketServerClass should be a subclass of ws4py.websocket.WebSocket
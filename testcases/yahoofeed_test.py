@@ -19,12 +19,14 @@
 """
 
 import datetime
+import os
 
 from . import common
 from . import barfeed_test
 from . import feed_test
 
 from pyalgotrade.utils import dt
+from pyalgotrade.utils import csvutils
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import csvfeed
 from pyalgotrade import bar
@@ -258,3 +260,265 @@ class FeedTestCase(common.TestCase):
         for i in range(len(ds)):
             self.assertEqual(ds[i].getDateTime(), reloadedDs[i].getDateTime())
             self.assertEqual(ds[i].getClose(), reloadedDs[i].getClose())
+
+
+class BulkLoadTestCase(common.TestCase):
+    def __writeCSV(self, path, lines):
+        with open(path, "w") as f:
+            f.write("\n".join(lines))
+
+    def testSameBarsAsRowByRow(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        timezone = marketsession.USEquities.getTimezone()
+        rowParser = yahoofeed.RowParser(datetime.time(23, 59), bar.Frequency.DAY, timezone)
+        with open(path) as f:
+            expected = [rowParser.parseBar(row) for row in csvutils.FastDictReader(f)]
+        bars = csvfeed.parse_csv_file(path, rowParser)
+
+        self.assertEqual(len(bars), len(expected))
+        for bar_, expectedBar in zip(bars, expected):
+            self.assertEqual(bar_.getDateTime(), expectedBar.getDateTime())
+            self.assertEqual(bar_.getDateTime().tzinfo, expectedBar.getDateTime().tzinfo)
+            self.assertEqual(bar_.__getstate__(), expectedBar.__getstate__())
+
+    def testGenericExtraColumnsAndAdjClose(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            self.__writeCSV(path, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close,Notes",
+                "2013-01-01 13:59:00,10,12,9,11,100,,hello",
+                "",
+                "2013-01-01 14:00:00,11,13,10,12,200,12,1.5",
+            ])
+            barFeed = csvfeed.GenericBarFeed(bar.Frequency.MINUTE)
+            barFeed.addBarsFromCSV("orcl", path)
+
+        self.assertTrue(barFeed.barsHaveAdjClose())
+        ds = barFeed.getDataSeries("orcl")
+        barFeed.loadAll()
+        self.assertEqual(len(ds), 2)
+        self.assertEqual(ds[0].getDateTime(), datetime.datetime(2013, 1, 1, 13, 59))
+        self.assertEqual(ds[0].getAdjClose(), None)
+        self.assertEqual(ds[0].getExtraColumns(), {"Notes": "hello"})
+        self.assertEqual(ds[1].getAdjClose(), 12)
+        self.assertEqual(ds[1].getExtraColumns(), {"Notes": 1.5})
+
+    def testGenericMalformedBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            self.__writeCSV(path, [
+                "Date,Open,High,Low,Close,Volume",
+                "2013-01-01,10,12,9,11,100",
+                "2013-01-02,10,12,9,xx,100",
+                "2013-02-30,10,12,9,11,100",
+                "2013-01-04,10,12,9,11,100",
+            ])
+            barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+            barFeed.setDateTimeFormat("%Y-%m-%d")
+            barFeed.setColumnName("datetime", "Date")
+            barFeed.setNoAdjClose()
+            with self.assertRaisesRegexp(ValueError, "could not convert string to float"):
+                barFeed.addBarsFromCSV("orcl", path)
+            barFeed.addBarsFromCSV("orcl", path, skipMalformedBars=True)
+
+        ds = barFeed.getDataSeries("orcl")
+        barFeed.loadAll()
+        self.assertEqual(
+            [bar_.getDateTime() for bar_ in ds], [datetime.datetime(2013, 1, 1), datetime.datetime(2013, 1, 4)]
+        )
+
+    def testGenericNonFixedWidthFormatAndFilter(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            self.__writeCSV(path, [
+                "Date,Open,High,Low,Close,Volume",
+                "1/2/2013,10,12,9,11,100",
+                "2/2/2013,10,12,9,11,100",
+                "3/2/2013,10,12,9,11,100",
+            ])
+            barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+            barFeed.setDateTimeFormat("%d/%m/%Y")
+            barFeed.setColumnName("datetime", "Date")
+            barFeed.setNoAdjClose()
+            barFeed.setBarFilter(csvfeed.DateRangeFilter(datetime.datetime(2013, 2, 2)))
+            barFeed.addBarsFromCSV("orcl", path)
+
+        ds = barFeed.getDataSeries("orcl")
+        barFeed.loadAll()
+        self.assertEqual(
+            [bar_.getDateTime() for bar_ in ds], [datetime.datetime(2013, 2, 2), datetime.datetime(2013, 2, 3)]
+        )
+
+
+class CacheTestCase(common.TestCase):
+    def __writeCSV(self, path, lines):
+        with open(path, "w") as f:
+            f.write("\n".join(lines))
+
+    def __getBars(self, barFeed, instrument):
+        ds = barFeed.getDataSeries(instrument)
+        barFeed.loadAll()
+        return [(bar_.getDateTime(), str(bar_.getDateTime().tzinfo), bar_.__getstate__()) for bar_ in ds]
+
+    def testYahooBarsFromCache(self):
+        timezone = marketsession.USEquities.getTimezone()
+        with common.TmpDir() as cacheDir:
+            results = []
+            for i in range(2):
+                barFeed = yahoofeed.Feed(timezone=timezone)
+                barFeed.setCacheDir(cacheDir)
+                barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+                results.append(self.__getBars(barFeed, "orcl"))
+                self.assertEqual(len(os.listdir(cacheDir)), 1)
+
+        self.assertEqual(len(results[0]), 252)
+        self.assertEqual(results[0], results[1])
+
+    def testGenericBarsFromCache(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            self.__writeCSV(path, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close,Notes,Bid",
+                "2013-01-01 13:59:00,10,12,9,11,100,,hello,9.5",
+                "2013-01-01 14:00:00,11,13,10,12,200,12,1.5,10.5",
+            ])
+            cacheDir = os.path.join(tmpPath, "cache")
+            results = []
+            for i in range(2):
+                barFeed = csvfeed.GenericBarFeed(bar.Frequency.MINUTE)
+                barFeed.setCacheDir(cacheDir)
+                barFeed.addBarsFromCSV("orcl", path)
+                self.assertTrue(barFeed.barsHaveAdjClose())
+                results.append(self.__getBars(barFeed, "orcl"))
+            self.assertEqual(len(os.listdir(cacheDir)), 1)
+
+            # Using a different timezone should not use the cached bars.
+            barFeed = csvfeed.GenericBarFeed(bar.Frequency.MINUTE, timezone=marketsession.USEquities.getTimezone())
+            barFeed.setCacheDir(cacheDir)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(len(os.listdir(cacheDir)), 2)
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0][2][6], None)
+        self.assertEqual(results[1][1][2][6], 12)
+        ds = [state[-1] for _, _, state in results[1]]
+        self.assertEqual(ds, [{"Notes": "hello", "Bid": 9.5}, {"Notes": 1.5, "Bid": 10.5}])
+
+    def testCacheInvalidatedWhenFileChanges(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            lines = [
+                "Date,Open,High,Low,Close,Volume",
+                "2013-01-01,10,12,9,11,100",
+            ]
+            self.__writeCSV(path, lines)
+            cacheDir = os.path.join(tmpPath, "cache")
+            for expected in [1, 2]:
+                barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+                barFeed.setDateTimeFormat("%Y-%m-%d")
+                barFeed.setColumnName("datetime", "Date")
+                barFeed.setNoAdjClose()
+                barFeed.setCacheDir(cacheDir)
+                barFeed.addBarsFromCSV("orcl", path)
+                self.assertEqual(len(self.__getBars(barFeed, "orcl")), expected)
+                # The cache file for the previous version of the CSV file gets replaced.
+                self.assertEqual(len(os.listdir(cacheDir)), 1)
+                lines.append("2013-01-02,10,12,9,11,100")
+                self.__writeCSV(path, lines)
+
+    def testCorruptCacheFile(self):
+        with common.TmpDir() as cacheDir:
+            csvPath = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+            barFeed = yahoofeed.Feed()
+            barFeed.setCacheDir(cacheDir)
+            barFeed.addBarsFromCSV("orcl", csvPath)
+            expected = self.__getBars(barFeed, "orcl")
+
+            cachePath = os.path.join(cacheDir, os.listdir(cacheDir)[0])
+            size = os.path.getsize(cachePath)
+            with open(cachePath, "r+b") as f:
+                f.truncate(size - 100)
+
+            # The CSV file gets parsed again, and the cache file gets written again.
+            barFeed = yahoofeed.Feed()
+            barFeed.setCacheDir(cacheDir)
+            barFeed.addBarsFromCSV("orcl", csvPath)
+            self.assertEqual(self.__getBars(barFeed, "orcl"), expected)
+            self.assertEqual(os.path.getsize(cachePath), size)
+
+    def testCacheDisabled(self):
+        # The cache is disabled by default.
+        self.assertEqual(yahoofeed.Feed().getCacheDir(), None)
+        barFeed = yahoofeed.Feed()
+        barFeed.setCacheDir(None)
+        self.assertEqual(barFeed.getCacheDir(), None)
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        self.assertEqual(len(self.__getBars(barFeed, "orcl")), 252)
+
+
+class LoadCSVFilesTestCase(common.TestCase):
+    def __getBars(self, barFeed):
+        return [
+            (dateTime, sorted((instrument, bar_.__getstate__()) for instrument, bar_ in bars.items()))
+            for dateTime, bars in barFeed
+        ]
+
+    def __loadSerially(self, files):
+        barFeed = yahoofeed.Feed(timezone=marketsession.USEquities.getTimezone())
+        barFeed.setCacheDir(None)
+        for instrument, path in files:
+            barFeed.addBarsFromCSV(instrument, path)
+        return self.__getBars(barFeed)
+
+    def testSameBarsAsSerial(self):
+        files = [
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+            ("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2011-yahoofinance.csv")),
+        ]
+        expected = self.__loadSerially(files)
+        for workers in [1, 2]:
+            barFeed = yahoofeed.Feed(timezone=marketsession.USEquities.getTimezone())
+            barFeed.setCacheDir(None)
+            barFeed.loadCSVFiles(files, workers=workers)
+            self.assertEqual(self.__getBars(barFeed), expected)
+
+    def testDictAndCache(self):
+        files = {
+            "orcl": [
+                common.get_data_file_path("orcl-2000-yahoofinance.csv"),
+                common.get_data_file_path("orcl-2001-yahoofinance.csv"),
+            ],
+            "goog": common.get_data_file_path("goog-2011-yahoofinance.csv"),
+        }
+        with common.TmpDir() as cacheDir:
+            results = []
+            for i in range(2):
+                barFeed = yahoofeed.Feed(timezone=marketsession.USEquities.getTimezone())
+                barFeed.setCacheDir(cacheDir)
+                barFeed.loadCSVFiles(files, workers=2)
+                self.assertEqual(len(os.listdir(cacheDir)), 3)
+                self.assertEqual(len(barFeed.getRegisteredInstruments()), 2)
+                results.append(self.__getBars(barFeed))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(results[0]), 752)
+
+    def testDuplicateBars(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        barFeed = yahoofeed.Feed()
+        barFeed.setCacheDir(None)
+        barFeed.loadCSVFiles([("orcl", path), ("orcl", path)], workers=2)
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.loadAll()
+
+    def testErrorsInOrder(self):
+        barFeed = yahoofeed.Feed()
+        barFeed.setCacheDir(None)
+        with self.assertRaises(IOError):
+            barFeed.loadCSVFiles([
+                ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+                ("orcl", common.get_data_file_path("missing-yahoofinance.csv")),
+            ], workers=2)
+        # Files are added in order until the failing one.
+        self.assertEqual(barFeed.getRegisteredInstruments(), ["orcl"])